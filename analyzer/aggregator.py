@@ -4,6 +4,8 @@ Provides functions to load, aggregate, and classify patch analysis results
 into final decision categories based on per-file classifications.
 """
 
+from collections import Counter
+from functools import lru_cache
 from typing import List, Dict, Any
 import pickle
 import operator
@@ -21,9 +23,24 @@ CLASS_OTHER_EXT = 'OTHER EXT'
 ALL_CLASSIFICATIONS = [CLASS_PATCH_APPLIED, CLASS_PATCH_NOT_APPLIED, CLASS_NOT_EXISTING,
                        CLASS_CANNOT_CLASSIFY, CLASS_ERROR]
 
+# Per-file patchClass values -> the total they count towards; unknown values
+# are not counted. PatchTrack.classify labels missing files 'NOT EXISTING'.
+_COUNTED_CLASS = {
+    CLASS_PATCH_APPLIED: CLASS_PATCH_APPLIED,
+    CLASS_PATCH_NOT_APPLIED: CLASS_PATCH_NOT_APPLIED,
+    CLASS_NOT_EXISTING: CLASS_NOT_EXISTING,
+    'NOT EXISTING': CLASS_NOT_EXISTING,
+    CLASS_CANNOT_CLASSIFY: CLASS_CANNOT_CLASSIFY,
+    CLASS_OTHER_EXT: CLASS_CANNOT_CLASSIFY,
+    CLASS_ERROR: CLASS_ERROR,
+}
+
 # Totals directory
 TOTALS_DIR = 'Repos_totals'
 
+# Number of loaded totals files kept in memory
+TOTALS_CACHE_SIZE = 32
+
 
 def read_totals(repo_file: str, mainline: str) -> Dict[str, Any]:
     """Load aggregated analysis results for a repository.
@@ -33,10 +50,27 @@ def read_totals(repo_file: str, mainline: str) -> Dict[str, Any]:
         mainline: Branch specification in 'owner/repo' format.
 
     Returns:
-        Dictionary containing aggregated analysis totals.
+        Dictionary containing aggregated analysis totals (shared between
+        calls; do not mutate).
     """
     owner, repo = mainline.split('/')
     file_path = os.path.join(TOTALS_DIR, f"{repo_file}_{owner}_{repo}_totals.pkl")
+    return _load_totals(file_path, os.stat(file_path).st_mtime_ns)
+
+
+@lru_cache(maxsize=TOTALS_CACHE_SIZE)
+def _load_totals(file_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Unpickle a totals file, memoized until the file is modified.
+
+    Repeated reads return the same object, so callers must not mutate it.
+
+    Args:
+        file_path: Path to the totals pickle.
+        mtime_ns: Modification time of the file, part of the cache key.
+
+    Returns:
+        Dictionary containing aggregated analysis totals.
+    """
     with open(file_path, 'rb') as f:
         return pickle.load(f)
 
@@ -110,23 +144,17 @@ def final_class(result_dict: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         counts = _initialize_classification_counts()
         project = ''
 
-        for file_name, file_result in files_data.items():
+        # Items without a patchClass count as errors
+        class_counts = Counter()
+        for file_result in files_data.values():
             for item in file_result['result']:
-                project = item['project']
-                try:
-                    patch_class = item['patchClass']
-                    if patch_class == CLASS_OTHER_EXT or patch_class == CLASS_CANNOT_CLASSIFY:
-                        counts[CLASS_CANNOT_CLASSIFY] += 1
-                    elif patch_class == CLASS_NOT_EXISTING:
-                        counts[CLASS_NOT_EXISTING] += 1
-                    elif patch_class == CLASS_PATCH_APPLIED:
-                        counts[CLASS_PATCH_APPLIED] += 1
-                    elif patch_class == CLASS_PATCH_NOT_APPLIED:
-                        counts[CLASS_PATCH_NOT_APPLIED] += 1
-                    elif patch_class == CLASS_ERROR:
-                        counts[CLASS_ERROR] += 1
-                except (KeyError, ValueError):
-                    counts[CLASS_ERROR] += 1
+                project = item.get('project', project)
+                class_counts[item.get('patchClass', CLASS_ERROR)] += 1
+
+        for patch_class, count in class_counts.items():
+            counted_class = _COUNTED_CLASS.get(patch_class)
+            if counted_class is not None:
+                counts[counted_class] += count
 
         ultimate_class = _determine_ultimate_class(counts)
 
@@ -155,19 +183,11 @@ def count_all_classifications(pr_classes: List[Dict[str, Any]]) -> Dict[str, int
     Returns:
         Dictionary with counts for each classification type.
     """
-    class_counts = {
-        CLASS_PATCH_APPLIED: 0,
-        CLASS_CANNOT_CLASSIFY: 0,
-        CLASS_PATCH_NOT_APPLIED: 0,
-        CLASS_NOT_EXISTING: 0,
-        CLASS_ERROR: 0
+    final_classes = Counter(
+        pr_data.get('class') for pr_result in pr_classes for pr_data in pr_result.values()
+    )
+    return {
+        patch_class: final_classes[patch_class]
+        for patch_class in (CLASS_PATCH_APPLIED, CLASS_CANNOT_CLASSIFY, CLASS_PATCH_NOT_APPLIED,
+                            CLASS_NOT_EXISTING, CLASS_ERROR)
     }
-
-    for pr_result in pr_classes:
-        pr_id, pr_data = next(iter(pr_result.items()))
-        final_classification = pr_data.get('class')
-
-        if final_classification in class_counts:
-            class_counts[final_classification] += 1
-
-    return class_counts
@@ -36,7 +36,8 @@ def process_patch(patch_path: str, dst_path: str, type_patch: str, file_ext: str
     except Exception as e:
         print("Error traversing patch:....", e)
 
-    source = source_loader.SourceLoader()
+    # The hunk matching and similarity ratio consume the source n-grams
+    source = source_loader.SourceLoader(record_source_hashes=True)
     try:
         _ = source.traverse(dst_path, patch, file_ext)
     except Exception as e:
@@ -7,12 +7,23 @@ Modified by Daniel Ogenrwot, 2023
 
 import pickle
 import re
-from typing import Any, Optional
-from collections import namedtuple
+from functools import lru_cache
+from itertools import accumulate
+from typing import Any, ClassVar, List, Optional, Tuple
+from dataclasses import dataclass
+from enum import IntEnum, unique
+
+import numpy as np
 
 from . import constant
 from . import helpers
 
+try:
+    import numba
+except ImportError:
+    # numba is optional; rolling hashes fall back to pure Python without it
+    numba = None
+
 
 # Global configuration variables (mirrors values from `analyzer.constant`)
 ngram_size: int = constant.NGRAM_SIZE
@@ -21,24 +32,64 @@ verbose_mode: bool = constant.VERBOSE_MODE
 magic_cookie = constant.MAGIC_COOKIE
 bloomfilter_size: int = constant.BLOOMFILTER_SIZE
 min_mn_ratio: int = constant.MIN_MN_RATIO
+record_source_hashes: bool = constant.RECORD_SOURCE_HASHES
 
-# Named tuples for data structures
-PatchInfo = namedtuple(
-    'PatchInfo',
-    ['file_path', 'file_ext', 'orig_lines', 'norm_lines', 'hash_list', 'patch_hashes', 'ngram_size']
-)
-SourceInfo = namedtuple(
-    'SourceInfo',
-    ['file_path', 'file_ext', 'orig_lines', 'norm_lines']
-)
-ContextInfo = namedtuple(
-    'ContextInfo',
-    ['source_id', 'prev_context_line', 'start_line', 'end_line', 'next_context_line']
-)
+
+# Record types for data structures; `_fields` mirrors the namedtuple API
+@dataclass(frozen=True, slots=True)
+class PatchInfo:
+    """A processed patch hunk and its n-gram hashes."""
+
+    file_path: str
+    file_ext: int
+    orig_lines: str
+    norm_lines: Any
+    hash_list: Any
+    patch_hashes: Any
+    ngram_size: int
+    # Hashes re-checked against each full Bloom filter batch of a long source
+    old_norm_lines: Any = ()
+
+    _fields: ClassVar[Tuple[str, ...]] = (
+        'file_path', 'file_ext', 'orig_lines', 'norm_lines', 'hash_list', 'patch_hashes', 'ngram_size',
+        'old_norm_lines'
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class SourceInfo:
+    """A normalized source file."""
+
+    file_path: str
+    file_ext: int
+    orig_lines: str
+    norm_lines: Any
+
+    _fields: ClassVar[Tuple[str, ...]] = ('file_path', 'file_ext', 'orig_lines', 'norm_lines')
 
 
-class FileExt:
-    """Index for file types supported by the tool."""
+@dataclass(frozen=True, slots=True)
+class ContextInfo:
+    """Location of a match in a source, with its surrounding context lines."""
+
+    source_id: int
+    prev_context_line: Any
+    start_line: int
+    end_line: int
+    next_context_line: Any
+
+    _fields: ClassVar[Tuple[str, ...]] = (
+        'source_id', 'prev_context_line', 'start_line', 'end_line', 'next_context_line'
+    )
+
+
+@unique
+class FileExt(IntEnum):
+    """Index for file types supported by the tool.
+
+    Members compare equal to their int values, so they can be used wherever a
+    plain file type index is expected.
+    """
 
     NonText = 0
     Text = 1
@@ -90,6 +141,9 @@ HTML_ESCAPE_DICT = {
     '\'': '&apos;'
 }
 
+# Translate table applying HTML_ESCAPE_DICT in a single pass
+HTML_ESCAPE_TABLE = str.maketrans(HTML_ESCAPE_DICT)
+
 
 # Regular expressions for comment detection
 # C, Java, Go style comments
@@ -167,13 +221,12 @@ YAML_REGEX = re.compile(
 )
 YAML_DOUBLE_QUOTE_REGEX = re.compile(r'["]+')
 YAML_SINGLE_QUOTE_REGEX = re.compile(r"[']+")
+# Translate table deleting both quote characters in a single pass
+YAML_QUOTE_TABLE = str.maketrans('', '', '"\'')
 
 # JavaScript, Scala, C++, Kotlin, Gradle, C#, Vue, JSX style comments
-JS_REGEX = re.compile(
-    r'(?P<comment>//.*?$|[{}]+)|(?P<multilinecomment>/\*.*?\*/)|'
-    r'(?P<noncomment>\'(\\.|[^\\\'])*\'|"(\\.|[^\\"])*"|.[^/\'"]*)' ,
-    re.DOTALL | re.MULTILINE
-)
+# (same grammar as C_REGEX, so both share one compiled pattern)
+JS_REGEX = C_REGEX
 JS_PARTIAL_COMMENT_REGEX = re.compile(
     r'(?P<comment>/\*.*?$|^.*?\*/)|(?P<noncomment>\'(\\.|[^\\\'])*\'|"(\\.|[^\\"])*"|.[^/\'"{}]*)' ,
     re.DOTALL
@@ -189,7 +242,7 @@ PY_MULTILINE_1_REGEX = re.compile(
     re.DOTALL | re.MULTILINE
 )
 PY_MULTILINE_2_REGEX = re.compile(
-    r"(?P<multilinecomment>'''.*?''')|(?P<noncomment>'(\\.|[^\\'])*'|\"(\\.|[^\"])*\"|.[^/'\"]*)' ,",
+    r"(?P<multilinecomment>'''.*?''')|(?P<noncomment>'(\\.|[^\\'])*'|\"(\\.|[^\"])*\"|.[^/'\"]*)",
     re.DOTALL | re.MULTILINE
 )
 
@@ -215,8 +268,17 @@ VB_REGEX = re.compile(
 # Regular expression for whitespace (excluding newlines)
 WHITESPACE_REGEX = re.compile(r'[\t\x0b\x0c\r ]+')
 
+# Translate table deleting the characters matched by WHITESPACE_REGEX
+WHITESPACE_TABLE = str.maketrans('', '', '\t\x0b\x0c\r ')
+
+
+# Number of strings whose hashes each hash function memoizes; normalized
+# tokens and n-grams repeat heavily across a patch corpus
+HASH_CACHE_SIZE = 1 << 17
+
 
 # Hash functions
+@lru_cache(maxsize=HASH_CACHE_SIZE)
 def fnv1a_hash(string):
     """
     FNV-1a 32-bit hash (http://isthe.com/chongo/tech/comp/fnv/).
@@ -228,13 +290,13 @@ def fnv1a_hash(string):
         int: The hash value.
     """
     hash_value = 2166136261
-    for c in string:
-        hash_value ^= ord(c)
-        hash_value *= 16777619
-        hash_value &= 0xFFFFFFFF
+    # Iterating ASCII bytes yields the code points without a call to ord()
+    for code in string.encode('ascii') if string.isascii() else map(ord, string):
+        hash_value = ((hash_value ^ code) * 16777619) & 0xFFFFFFFF
     return hash_value
 
 
+@lru_cache(maxsize=HASH_CACHE_SIZE)
 def djb2_hash(string: str) -> int:
     """
     djb2 hash (http://www.cse.yorku.ca/~oz/hash.html).
@@ -246,12 +308,13 @@ def djb2_hash(string: str) -> int:
         int: The hash value.
     """
     hash_value = 5381
-    for c in string:
-        hash_value = ((hash_value << 5) + hash_value) + ord(c)
-        hash_value &= 0xFFFFFFFF
+    # (h << 5) + h == h * 33; ASCII strings are iterated as bytes
+    for code in string.encode('ascii') if string.isascii() else map(ord, string):
+        hash_value = (hash_value * 33 + code) & 0xFFFFFFFF
     return hash_value
 
 
+@lru_cache(maxsize=HASH_CACHE_SIZE)
 def sdbm_hash(string: str) -> int:
     """
     sdbm hash (http://www.cse.yorku.ca/~oz/hash.html).
@@ -263,12 +326,245 @@ def sdbm_hash(string: str) -> int:
         int: The hash value.
     """
     hash_value = 0
-    for c in string:
-        hash_value = ord(c) + (hash_value << 6) + (hash_value << 16) - hash_value
-        hash_value &= 0xFFFFFFFF
+    # (h << 6) + (h << 16) - h == h * 65599; ASCII strings are iterated as bytes
+    for code in string.encode('ascii') if string.isascii() else map(ord, string):
+        hash_value = (code + hash_value * 65599) & 0xFFFFFFFF
     return hash_value
 
 
+def _fnv1a_columns(codes: np.ndarray, offsets: np.ndarray, out: np.ndarray) -> None:
+    """
+    Fill out[i] with the FNV-1a hash of string i of a concatenated batch.
+
+    Hashes code points like `fnv1a_hash`, so results are identical to it.
+    Written against uint64 arrays only so it compiles under numba.
+
+    Args:
+        codes (ndarray): uint64 code points of all strings, concatenated.
+        offsets (ndarray): int64 start of each string in codes, plus the end.
+        out (ndarray): uint64 output with one entry per string.
+    """
+    prime = np.uint64(16777619)
+    mask = np.uint64(0xFFFFFFFF)
+    for i in range(out.shape[0]):
+        hash_value = np.uint64(2166136261)
+        for j in range(offsets[i], offsets[i + 1]):
+            hash_value = ((hash_value ^ codes[j]) * prime) & mask
+        out[i] = hash_value
+
+
+# Compiled batch FNV-1a kernel, or None when numba is unavailable
+_fnv1a_kernel = numba.njit(cache=True)(_fnv1a_columns) if numba is not None else None
+
+
+# Bloom filters are packed into uint64 words of BLOOM_WORD_BITS bits;
+# BLOOM_WORD_SHIFT converts a bit index to its word index
+BLOOM_WORD_BITS = 64
+BLOOM_WORD_SHIFT = 6
+
+
+# (base, prime modulus) of the three polynomial rolling n-gram hashes
+ROLLING_HASH_PARAMS = ((257, 2147483647), (263, 4294967291), (65599, 4294967279))
+
+
+def _rolling_hash_columns(values: np.ndarray, ngram_size: int, params: np.ndarray, out: np.ndarray) -> None:
+    """
+    Fill out[i, k] with rolling hash k of the n-gram starting at token i.
+
+    Written against uint64 arrays only (no Python int literals) so it
+    compiles under numba without float promotion. All intermediate products
+    stay below 2**64 because the moduli are below 2**32.
+
+    Args:
+        values (ndarray): uint64 FNV-1a hash of each token.
+        ngram_size (int): Number of tokens per n-gram.
+        params (ndarray): uint64 array of (base, modulus) rows.
+        out (ndarray): uint64 output of shape (num_ngram, len(params)).
+    """
+    num_ngram = out.shape[0]
+    for k in range(params.shape[0]):
+        base = params[k, 0]
+        modulus = params[k, 1]
+        high = np.uint64(1)
+        for _ in range(ngram_size - 1):
+            high = high * base % modulus
+        hash_value = np.uint64(0)
+        for j in range(ngram_size):
+            hash_value = (hash_value * base + values[j]) % modulus
+        out[0, k] = hash_value
+        for i in range(1, num_ngram):
+            dropped = values[i - 1] * high % modulus
+            hash_value = ((hash_value + modulus - dropped) % modulus * base + values[i + ngram_size - 1]) % modulus
+            out[i, k] = hash_value
+
+
+# Compiled rolling hash kernel, or None when numba is unavailable
+_rolling_hash_kernel = numba.njit(cache=True)(_rolling_hash_columns) if numba is not None else None
+
+
+def rolling_ngram_hashes(tokens: List[str], ngram_size: int) -> List[Tuple[int, int, int]]:
+    """
+    Hash every n-gram of a token list with three polynomial rolling hashes.
+
+    Each distinct token is hashed once with FNV-1a; sliding the window then
+    costs O(1) per hash instead of re-joining and rehashing the n-gram.
+
+    Args:
+        tokens (list): Normalized tokens.
+        ngram_size (int): Number of tokens per n-gram.
+
+    Returns:
+        list: One (hash1, hash2, hash3) tuple per n-gram, in token order.
+    """
+    num_ngram = len(tokens) - ngram_size + 1
+    if num_ngram <= 0:
+        return []
+    if ngram_size <= 0:
+        # Empty n-grams all hash to zero
+        return [(0, 0, 0)] * num_ngram
+
+    if _rolling_hash_kernel is not None:
+        # Hash the distinct tokens in one compiled call over their code points
+        distinct = {token: i for i, token in enumerate(dict.fromkeys(tokens))}
+        codes = np.frombuffer(''.join(distinct).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        offsets = np.fromiter(accumulate(map(len, distinct), initial=0), dtype=np.int64, count=len(distinct) + 1)
+        token_values = np.empty(len(distinct), dtype=np.uint64)
+        _fnv1a_kernel(codes.astype(np.uint64), offsets, token_values)
+
+        out = np.empty((num_ngram, len(ROLLING_HASH_PARAMS)), dtype=np.uint64)
+        _rolling_hash_kernel(
+            token_values[[distinct[token] for token in tokens]], ngram_size,
+            np.array(ROLLING_HASH_PARAMS, dtype=np.uint64), out
+        )
+        return [tuple(row) for row in out.tolist()]
+
+    token_hashes = {}
+    values = []
+    for token in tokens:
+        value = token_hashes.get(token)
+        if value is None:
+            value = token_hashes[token] = fnv1a_hash(token)
+        values.append(value)
+
+    columns = []
+    for base, modulus in ROLLING_HASH_PARAMS:
+        high = pow(base, ngram_size - 1, modulus)
+        hash_value = 0
+        for value in values[:ngram_size]:
+            hash_value = (hash_value * base + value) % modulus
+        column = [hash_value]
+        for i in range(ngram_size, len(values)):
+            hash_value = ((hash_value - values[i - ngram_size] * high) * base + values[i]) % modulus
+            column.append(hash_value)
+        columns.append(column)
+    return list(zip(*columns))
+
+
+def ngram_texts(tokens: List[str], ngram_size: int, sep: str = '') -> List[str]:
+    """
+    Build the text of every n-gram of a token list.
+
+    The tokens are joined once and each n-gram is cut out of the joined
+    string with a single slice, instead of slicing and re-joining the token
+    list per n-gram.
+
+    Args:
+        tokens (list): Normalized tokens.
+        ngram_size (int): Number of tokens per n-gram.
+        sep (str): Separator placed between the tokens of an n-gram.
+
+    Returns:
+        list: One string per n-gram, equal to sep.join(tokens[i:i + ngram_size]).
+    """
+    num_ngram = len(tokens) - ngram_size + 1
+    if num_ngram <= 0:
+        return []
+    if ngram_size <= 0:
+        return [''] * num_ngram
+
+    text = sep.join(tokens)
+    step = len(sep)
+    # starts[i] is the offset of tokens[i] in text; the extra entry lets the
+    # last n-gram end at len(text)
+    starts = list(accumulate((len(token) + step for token in tokens), initial=0))
+    return [text[starts[i]:starts[i + ngram_size] - step] for i in range(num_ngram)]
+
+
+def bloom_probe_batch(hashes: Any, bit_vector: np.ndarray) -> np.ndarray:
+    """
+    Test Bloom filter membership for a batch of hashes in one vectorized pass.
+
+    The filter is packed into uint64 words: bit i lives in word
+    i >> BLOOM_WORD_SHIFT at position i & (BLOOM_WORD_BITS - 1). Hashes are
+    masked to the filter size, so unmasked hashes can be passed directly.
+
+    Args:
+        hashes: Sequence or array of non-negative hash values.
+        bit_vector (ndarray): uint64 words of a filter whose size in bits is a power of two.
+
+    Returns:
+        ndarray: Boolean array, True where the hash's bit is set.
+    """
+    indices = np.asarray(hashes, dtype=np.int64) & (bit_vector.size * BLOOM_WORD_BITS - 1)
+    words = bit_vector[indices >> BLOOM_WORD_SHIFT]
+    return ((words >> (indices & (BLOOM_WORD_BITS - 1)).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+
+def html_escape(string: str) -> str:
+    """
+    Escape the characters of HTML_ESCAPE_DICT in one pass.
+
+    Args:
+        string (str): The text to escape.
+
+    Returns:
+        str: The escaped text.
+    """
+    return string.translate(HTML_ESCAPE_TABLE)
+
+
+# Substrings without which `helpers.remove_comment` returns a source unchanged,
+# per file type; other file types always go through the regexes
+COMMENT_MARKERS = {
+    FileExt.C: ('//', '/*', '{', '}'),
+    FileExt.Java: ('//', '/*', '{', '}'),
+    FileExt.goland: ('//', '/*', '{', '}'),
+    FileExt.CSS: ('//', '/*', '{', '}'),
+    FileExt.Scala: ('//', '/*', '*/', '{', '}'),
+    FileExt.JavaScript: ('//', '/*', '*/', '{', '}'),
+    FileExt.TypeScript: ('//', '/*', '*/', '{', '}'),
+    FileExt.Kotlin: ('//', '/*', '*/', '{', '}'),
+    FileExt.gradle: ('//', '/*', '*/', '{', '}'),
+    FileExt.svelte: ('//', '/*', '*/', '{', '}'),
+    FileExt.ShellScript: ('#',),
+    FileExt.Perl: ('#', '{', '}'),
+    FileExt.PHP: ('#', '//', '/*', '{', '}'),
+    FileExt.Ruby: ('#', '=begin'),
+    FileExt.GEMFILE: ('#', '=begin'),
+    FileExt.SQL: ('--', '/*'),
+    FileExt.RUST: ('//', '/*', '*/'),
+    FileExt.TSX: ('//', '/*', '*/'),
+    FileExt.SOLIDITY: ('//', '/*', '*/'),
+    FileExt.yaml: ('#', '"', "'"),
+    FileExt.Xml: ('<!--',),
+    FileExt.markdown: ('<!--',),
+    FileExt.html: ('<!--',),
+}
+
+
+def strip_ws(string: str) -> str:
+    """
+    Delete whitespace except newlines; same as WHITESPACE_REGEX.sub('', string).
+
+    Args:
+        string (str): The text to strip.
+
+    Returns:
+        str: The text without spaces, tabs, vertical tabs, form feeds or carriage returns.
+    """
+    return string.translate(WHITESPACE_TABLE)
+
+
 def file_type(file_path: str) -> Any:
     """Get the file type of the given file path.
 
@@ -277,13 +573,33 @@ def file_type(file_path: str) -> Any:
     return helpers.get_file_type(file_path)
 
 
-def verbose_print(text: str) -> None:
-    """Print text when `verbose_mode` is set.
+def _verbose_print(text: str) -> None:
+    """Print text; bound to `verbose_print` while verbose mode is on."""
+    print(text)
+
+
+def _quiet_print(text: str) -> None:
+    """Discard text; bound to `verbose_print` while verbose mode is off."""
+
 
-    Kept as a small helper for compatibility with existing call sites.
+def set_verbose(mode: bool) -> None:
+    """Set `verbose_mode` and rebind `verbose_print` to match it.
+
+    Call sites look up `common.verbose_print` on every call, so when verbose
+    mode is off they reach a no-op instead of testing the flag. Assigning
+    `verbose_mode` directly does not rebind; use this function instead.
+
+    Args:
+        mode (bool): Whether verbose output is enabled.
     """
-    if verbose_mode:
-        print(text)
+    global verbose_mode, verbose_print
+    verbose_mode = mode
+    verbose_print = _verbose_print if mode else _quiet_print
+
+
+# Print text when `verbose_mode` is set; rebound by set_verbose()
+verbose_print = _quiet_print
+set_verbose(verbose_mode)
 
 
 # Pickle file I/O functions
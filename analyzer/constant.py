@@ -8,10 +8,11 @@ Small helpers are provided to normalize and lookup file extensions from
 language identifiers or filenames.
 """
 
-from typing import Dict, Optional
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
 
 # Public API
-__all__ = [
+__all__ = (
     "GITHUB_API_BASE_URL",
     "GITHUB_BASE_URL",
     "GITHUB_RAW_URL",
@@ -21,9 +22,13 @@ __all__ = [
     "MAGIC_COOKIE",
     "BLOOMFILTER_SIZE",
     "MIN_MN_RATIO",
+    "RECORD_SOURCE_HASHES",
     "EXTENSIONS",
     "get_extension",
-]
+)
+
+# Set view of __all__ for O(1) membership checks
+_ALL_SET = frozenset(__all__)
 
 # GitHub endpoints
 GITHUB_API_BASE_URL: str = "https://api.github.com/repos/"
@@ -37,11 +42,13 @@ VERBOSE_MODE: bool = False
 MAGIC_COOKIE = None
 BLOOMFILTER_SIZE: int = 2_097_152
 MIN_MN_RATIO: int = 32
+RECORD_SOURCE_HASHES: bool = False  # keep (ngram, hashes) per source n-gram
 
 # Mapping from language or file-type identifiers to preferred file extensions.
 # Keys are common identifiers encountered in metadata; values are normalized
-# extension strings used across the codebase (no leading dot).
-EXTENSIONS: Dict[str, str] = {
+# extension strings used across the codebase (no leading dot). Exposed
+# read-only through EXTENSIONS below.
+_EXTENSIONS: Dict[str, str] = {
     "bash": "sh",
     "c": "c",
     "csharp": "cs",
@@ -83,6 +90,11 @@ EXTENSIONS: Dict[str, str] = {
     "regex": "regex",
     "nginx": "conf",
 }
+EXTENSIONS: Mapping[str, str] = MappingProxyType(_EXTENSIONS)
+
+# Lookup table for identifiers that need no normalization: every EXTENSIONS
+# key, bare and with a leading dot
+_EXT_TABLE: Dict[str, str] = {**EXTENSIONS, **{f".{key}": value for key, value in EXTENSIONS.items()}}
 
 
 def get_extension(name: str) -> Optional[str]:
@@ -100,6 +112,11 @@ def get_extension(name: str) -> Optional[str]:
     if not name:
         return None
 
+    # Already-normalized identifiers resolve with a single lookup
+    extension = _EXT_TABLE.get(name)
+    if extension is not None:
+        return extension
+
     key = name.strip().lower()
 
     # If a filename or dotted extension is provided, extract the suffix
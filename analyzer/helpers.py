@@ -5,21 +5,45 @@ and type detection across multiple programming languages.
 """
 
 from typing import List, Optional, Dict, Any
-from functools import wraps
-from time import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from time import perf_counter_ns, time, sleep
+import io
 import json
+import logging
+import math
 import os
 import sys
-import re
+import sqlite3
+import threading
+import tokenize
+from itertools import accumulate
 
-import pandas as pd
 import requests
 from dateutil import parser
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 
 from . import constant
 from . import common
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on simultaneous GitHub API requests
+MAX_CONCURRENT_REQUESTS = 16
+# Upper bound on simultaneous patch file writes
+MAX_CONCURRENT_WRITES = 8
+# Bytes read per chunk when counting lines
+LOC_READ_CHUNK = 1 << 20
+# Number of distinct paths whose file_name/file_dir results are memoized
+PATH_CACHE_SIZE = 8192
+# Number of distinct paths whose get_file_type result is memoized
+FILE_TYPE_CACHE_SIZE = 4096
+# Retries for throttled (403/429) and server-error (5xx) responses
+MAX_REQUEST_RETRIES = 3
+# Base delay in seconds for exponential backoff between retries
+BACKOFF_BASE = 1.0
+
 def unique(items: List) -> List:
     """Get unique items from a list while preserving order.
 
@@ -29,8 +53,7 @@ def unique(items: List) -> List:
     Returns:
         List with duplicate entries removed.
     """
-    unique_list = pd.Series(items).drop_duplicates().to_list()
-    return unique_list
+    return list(dict.fromkeys(items))
 
 def api_request(url: str, token: str) -> Any:
     """Make an authenticated API request to GitHub.
@@ -75,6 +98,296 @@ def get_response(url: str, token_list: List[str], ct: int) -> tuple:
 
     return json_data, ct
 
+class TokenPool:
+    """Thread-safe pool of GitHub tokens that tracks each token's rate-limit budget.
+
+    The budget is read from the `X-RateLimit-Remaining` and `X-RateLimit-Reset`
+    headers of every response, so requests go to the token with the most
+    remaining calls and block only when all tokens are exhausted.
+    """
+
+    def __init__(self, tokens: List[str]) -> None:
+        """Initialize the pool.
+
+        Args:
+            tokens: GitHub API tokens; their budgets are unknown until first use.
+        """
+        self._lock = threading.Lock()
+        self._budget: Dict[str, List[float]] = {token: [math.inf, 0.0] for token in tokens}
+
+    def pick_best(self) -> Optional[str]:
+        """Return the token with the highest remaining budget.
+
+        A token whose reset time has passed counts as having a full budget.
+
+        Returns:
+            The best token, or None if the pool is empty.
+        """
+        with self._lock:
+            return self._pick_best(time())[0]
+
+    def _pick_best(self, now: float) -> tuple:
+        best, best_remaining, wait = None, -1.0, math.inf
+        for token, (remaining, reset) in self._budget.items():
+            if reset <= now:
+                remaining = math.inf
+            if remaining > best_remaining:
+                best, best_remaining = token, remaining
+            if remaining <= 0:
+                wait = min(wait, reset - now)
+        return best, best_remaining, wait
+
+    def acquire(self) -> str:
+        """Reserve one request on the best token, sleeping until a budget resets.
+
+        Returns:
+            Token to authenticate the next request with.
+        """
+        while True:
+            with self._lock:
+                now = time()
+                token, remaining, wait = self._pick_best(now)
+                if token is None:
+                    raise ValueError("TokenPool has no tokens")
+                if remaining > 0:
+                    budget = self._budget[token]
+                    if budget[1] <= now:
+                        budget[0] = math.inf
+                    budget[0] -= 1
+                    return token
+            sleep(max(wait, 0.0))
+
+    def update(self, token: str, headers: Dict[str, str]) -> None:
+        """Record the rate-limit budget reported by a response.
+
+        Args:
+            token: Token the request was made with.
+            headers: Response headers.
+        """
+        try:
+            remaining = float(headers['X-RateLimit-Remaining'])
+            reset = float(headers['X-RateLimit-Reset'])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._lock:
+            self._budget[token] = [remaining, reset]
+
+    def block(self, token: str, seconds: float) -> None:
+        """Take a token out of rotation for the given number of seconds.
+
+        Args:
+            token: Token to block.
+            seconds: Duration, e.g. from a `Retry-After` header.
+        """
+        with self._lock:
+            self._budget[token] = [0.0, time() + seconds]
+
+class ResponseCache:
+    """SQLite store of GitHub API responses keyed by URL and revalidated by ETag.
+
+    The database is opened on first use, so creating a cache touches no files.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize the cache.
+
+        Args:
+            path: SQLite database file.
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS cache('
+                               'url TEXT PRIMARY KEY, etag TEXT, body BLOB, fetched_at INT)')
+        return self._conn
+
+    def get(self, url: str) -> Optional[tuple]:
+        """Look up a cached response.
+
+        Args:
+            url: Request URL.
+
+        Returns:
+            Tuple of (etag, body), or None if the URL is not cached.
+        """
+        with self._lock:
+            return self._connect().execute(
+                'SELECT etag, body FROM cache WHERE url = ?', (url,)).fetchone()
+
+    def set(self, url: str, etag: str, body: bytes) -> None:
+        """Store a response body under its URL and ETag.
+
+        Args:
+            url: Request URL.
+            etag: `ETag` header of the response.
+            body: Raw response body.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                         (url, etag, body, int(time())))
+            conn.commit()
+
+    def close(self) -> None:
+        """Close the database connection if it is open."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def _retry_after_seconds(value: str) -> Optional[float]:
+    """Parse a `Retry-After` header given in seconds or as an HTTP-date.
+
+    Args:
+        value: Header value.
+
+    Returns:
+        Seconds to wait, or None if the value cannot be parsed.
+    """
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(retry_at.timestamp() - time(), 0.0)
+
+def pooled_request(url: str, pool: TokenPool, cache: Optional[ResponseCache] = None,
+                   max_retries: int = MAX_REQUEST_RETRIES) -> Any:
+    """Make a rate-limited, authenticated API request to GitHub.
+
+    Throttled (403/429) and server-error (5xx) responses are retried, honoring
+    `Retry-After` when present and backing off exponentially otherwise. With a
+    cache, known URLs are revalidated with `If-None-Match`; a `304 Not Modified`
+    reuses the stored body and does not count against the rate limit.
+
+    Args:
+        url: The URL endpoint to request.
+        pool: Token pool to draw the authentication token from.
+        cache: Optional response cache.
+        max_retries: Number of retries before the last response is returned.
+
+    Returns:
+        Parsed JSON response.
+    """
+    cached = cache.get(url) if cache is not None else None
+    for attempt in range(max_retries + 1):
+        token = pool.acquire()
+        headers = {'Authorization': f'token {token}'}
+        if cached is not None:
+            headers['If-None-Match'] = cached[0]
+        response = requests.get(url, headers=headers)
+        pool.update(token, response.headers)
+
+        status = response.status_code
+        if status == 304 and cached is not None:
+            return json.loads(cached[1])
+        if attempt < max_retries and (status in (403, 429) or status >= 500):
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                retry_after = _retry_after_seconds(retry_after)
+            if retry_after is not None:
+                pool.block(token, retry_after)
+            elif response.headers.get('X-RateLimit-Remaining') != '0':
+                # Secondary limits and server errors carry no reset time
+                sleep(BACKOFF_BASE * 2 ** attempt)
+            continue
+
+        json_response = json.loads(response.content)
+        etag = response.headers.get('ETag')
+        if cache is not None and status == 200 and etag:
+            cache.set(url, etag, response.content)
+        return json_response
+
+def api_requests(urls: List[str], pool: TokenPool, cache: Optional[ResponseCache] = None,
+                 max_workers: int = MAX_CONCURRENT_REQUESTS) -> List[Any]:
+    """Make rate-limited API requests to GitHub concurrently.
+
+    Requests are I/O bound, so they are dispatched on a thread pool.
+
+    Args:
+        urls: The URL endpoints to request.
+        pool: Token pool shared by all requests.
+        cache: Optional response cache shared by all requests.
+        max_workers: Maximum number of requests in flight.
+
+    Returns:
+        Responses in the order of `urls`; a request that raised yields the exception.
+    """
+    def _request(url: str) -> Any:
+        try:
+            return pooled_request(url, pool, cache)
+        except Exception as e:
+            return e
+
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        return list(executor.map(_request, urls))
+
+def _write_file(path: str, content: str) -> Optional[Exception]:
+    try:
+        with open(path, 'wb') as f:
+            f.write(content.encode('utf-8'))
+    except Exception as e:
+        return e
+    return None
+
+def write_files(files: List[tuple], max_workers: int = MAX_CONCURRENT_WRITES) -> List[Optional[Exception]]:
+    """Write UTF-8 text files concurrently.
+
+    Writes are dispatched on a thread pool so slow storage (NFS, CI caches)
+    does not serialize them.
+
+    Args:
+        files: (path, content) pairs; parent directories must exist.
+        max_workers: Maximum number of writes in flight.
+
+    Returns:
+        Per file, in order, None on success or the exception raised.
+    """
+    if not files:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+        return list(executor.map(lambda item: _write_file(*item), files))
+
+def iter_files(root: str):
+    """Yield the paths of all files under a directory, recursively.
+
+    Uses `os.scandir` so file/directory checks reuse the directory entry
+    instead of issuing a stat per path. Order matches a top-down `os.walk`:
+    a directory's files first, then its subdirectories; symlinked
+    directories are not followed.
+
+    Args:
+        root: Directory to walk.
+
+    Yields:
+        File paths joined onto `root`.
+    """
+    subdirs = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    subdirs.append(entry.path)
+            else:
+                yield entry.path
+    for subdir in subdirs:
+        yield from iter_files(subdir)
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
 def file_name(name: str) -> str:
     """Extract the file name from a file path.
 
@@ -86,12 +399,10 @@ def file_name(name: str) -> str:
     """
     if name.startswith('.'):
         return name[1:]
-    elif '/' in name:
-        return name.split('/')[-1]
-    else:
-        return name
+    return name.rpartition('/')[2]
 
 
+@lru_cache(maxsize=PATH_CACHE_SIZE)
 def file_dir(name: str) -> str:
     """Extract the directory path from a file path.
 
@@ -103,11 +414,8 @@ def file_dir(name: str) -> str:
     """
     if name.startswith('.'):
         return name[1]
-    elif '/' in name:
-        return '/'.join(name.split('/')[:-1])
-    else:
-        return ''
-    
+    return name.rpartition('/')[0]
+
 
 def save_file(file: bytes, storage_dir: str, file_name: str) -> None:
     """Save binary file to specified directory.
@@ -175,9 +483,11 @@ def _get_extension_map():
         }
     return _EXTENSION_MAP
 
-_SPECIAL_FILES = {'requirements.txt', 'requirement.txt'}
+# Base names detected as requirements files regardless of extension
+_SPECIAL_FILES = frozenset({'requirements.txt', 'requirement.txt'})
 
 
+@lru_cache(maxsize=FILE_TYPE_CACHE_SIZE)
 def get_file_type(file_path: str) -> int:
     """Detect file type based on extension.
 
@@ -187,12 +497,16 @@ def get_file_type(file_path: str) -> int:
     Returns:
         FileExt enum value indicating the file type.
     """
-    name = file_name(file_path)
+    base = file_path.rpartition('/')[2].lower()
 
-    if name.lower() in _SPECIAL_FILES:
+    if base in _SPECIAL_FILES:
         return common.FileExt.REQ_TXT
 
-    ext = file_path.split('.')[-1].lower()
+    return _ext_file_type(base.rpartition('.')[2])
+
+@lru_cache(maxsize=None)
+def _ext_file_type(ext: str) -> int:
+    """Map a lowercase extension to its FileExt value, memoized per extension."""
     return _get_extension_map().get(ext, common.FileExt.Text)
 
 def _preserve_newlines(match_text: str) -> str:
@@ -240,6 +554,125 @@ def _extract_noncomments_with_newlines(source: str, regex_pattern) -> str:
     return ''.join(lines)
 
 
+def _delete_matches(source: str, regex_pattern) -> str:
+    """Delete every match of regex_pattern from source."""
+    return regex_pattern.sub('', source)
+
+
+def _translate(source: str, table) -> str:
+    """Apply a str.translate table to source."""
+    return source.translate(table)
+
+
+# Token types that never start or end a Python statement
+_PY_NON_CODE_TOKENS = frozenset({tokenize.COMMENT, tokenize.NL})
+# Token types after which a string literal starts a new statement
+_PY_STATEMENT_START_TOKENS = frozenset({tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT})
+
+
+def _strip_python_comments(source: str, regex_pattern=None) -> str:
+    """Remove comments and docstrings from Python source in one tokenizer pass.
+
+    `#` comments and string literals that form a statement on their own
+    (docstrings and other bare strings) are deleted; `#` inside ordinary
+    strings is kept. Source the tokenizer rejects, such as a lone diff line
+    with an unclosed bracket, falls back to the Python comment regexes.
+
+    Args:
+        source: Python source text.
+        regex_pattern: Unused; accepted so this can be a comment removal step.
+
+    Returns:
+        Source with comments and docstrings removed.
+    """
+    lines = io.StringIO(source).readlines()
+    try:
+        tokens = list(tokenize.generate_tokens(iter(lines).__next__))
+    except (tokenize.TokenError, SyntaxError):
+        source = _extract_noncomments(source, common.PY_REGEX)
+        source = _extract_noncomments(source, common.PY_MULTILINE_1_REGEX)
+        return _extract_noncomments(source, common.PY_MULTILINE_2_REGEX)
+
+    line_starts = list(accumulate(map(len, lines), initial=0))
+    code_tokens = [tok for tok in tokens if tok.type not in _PY_NON_CODE_TOKENS]
+    spans = [tok for tok in tokens if tok.type == tokenize.COMMENT]
+    for i, tok in enumerate(code_tokens):
+        if tok.type != tokenize.STRING:
+            continue
+        prev_type = code_tokens[i - 1].type if i else tokenize.NEWLINE
+        next_type = code_tokens[i + 1].type if i + 1 < len(code_tokens) else tokenize.ENDMARKER
+        if prev_type in _PY_STATEMENT_START_TOKENS and next_type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+            spans.append(tok)
+
+    pieces = []
+    offset = 0
+    for tok in sorted(spans, key=lambda t: t.start):
+        start = line_starts[tok.start[0] - 1] + tok.start[1]
+        pieces.append(source[offset:start])
+        offset = line_starts[tok.end[0] - 1] + tok.end[1]
+    pieces.append(source[offset:])
+    return ''.join(pieces)
+
+
+# Comment removal steps per file type, applied in order as step(source, pattern)
+# (lazy initialized to avoid circular import)
+_COMMENT_PATTERNS = None
+
+def _get_comment_patterns():
+    """Get comment removal steps, initializing on first use to avoid circular imports."""
+    global _COMMENT_PATTERNS
+    if _COMMENT_PATTERNS is None:
+        py_steps = (
+            (_extract_noncomments, common.PY_REGEX),
+            (_extract_noncomments, common.PY_MULTILINE_1_REGEX),
+            (_extract_noncomments, common.PY_MULTILINE_2_REGEX),
+        )
+        c_steps = ((_extract_noncomments_with_newlines, common.C_REGEX),)
+        js_steps = (
+            (_extract_noncomments, common.JS_REGEX),
+            (_extract_noncomments, common.JS_PARTIAL_COMMENT_REGEX),
+        )
+        ruby_steps = ((_extract_noncomments_with_newlines, common.RUBY_REGEX),)
+        xml_steps = ((_extract_noncomments, common.XML_REGEX),)
+        _COMMENT_PATTERNS = {
+            # C-like languages (C, Java, Go, CSS)
+            common.FileExt.C: c_steps,
+            common.FileExt.Java: c_steps,
+            common.FileExt.goland: c_steps,
+            common.FileExt.CSS: c_steps,
+            # Python, and config files with Python-style comments
+            common.FileExt.Python: ((_strip_python_comments, None),),
+            common.FileExt.conf: py_steps,
+            common.FileExt.ShellScript: ((_extract_noncomments, common.SHELLSCRIPT_REGEX),),
+            common.FileExt.Perl: ((_extract_noncomments, common.PERL_REGEX),),
+            common.FileExt.SQL: ((_extract_noncomments, common.SQL_REGEX),),
+            common.FileExt.RUST: ((_extract_noncomments, common.RUST_REGEX),),
+            common.FileExt.TSX: ((_extract_noncomments, common.TSX_REGEX),),
+            common.FileExt.SOLIDITY: ((_extract_noncomments, common.SOLIDITY_REGEX),),
+            common.FileExt.VB: ((_extract_noncomments, common.VB_REGEX),),
+            common.FileExt.PHP: ((_extract_noncomments_with_newlines, common.PHP_REGEX),),
+            common.FileExt.Ruby: ruby_steps,
+            common.FileExt.GEMFILE: ruby_steps,
+            # JavaScript-like languages
+            common.FileExt.Scala: js_steps,
+            common.FileExt.JavaScript: js_steps,
+            common.FileExt.TypeScript: js_steps,
+            common.FileExt.Kotlin: js_steps,
+            common.FileExt.gradle: js_steps,
+            common.FileExt.svelte: js_steps,
+            # YAML comments, then quotes
+            common.FileExt.yaml: (
+                (_extract_noncomments, common.YAML_REGEX),
+                (_translate, common.YAML_QUOTE_TABLE),
+            ),
+            # XML-like languages
+            common.FileExt.Xml: xml_steps,
+            common.FileExt.markdown: xml_steps,
+            common.FileExt.html: xml_steps,
+        }
+    return _COMMENT_PATTERNS
+
+
 def remove_comment(source: str, file_ext: int) -> str:
     """Remove comments from source code based on file type.
 
@@ -250,66 +683,8 @@ def remove_comment(source: str, file_ext: int) -> str:
     Returns:
         Source code with comments removed.
     """
-    # C-like languages (C, Java, Go, CSS)
-    if file_ext in [common.FileExt.C, common.FileExt.Java, common.FileExt.goland, common.FileExt.CSS]:
-        source = _extract_noncomments_with_newlines(source, common.C_REGEX)
-
-    # Python and config files
-    elif file_ext in [common.FileExt.Python, common.FileExt.conf]:
-        source = _extract_noncomments(source, common.PY_REGEX)
-        source = _extract_noncomments(source, common.PY_MULTILINE_1_REGEX)
-        source = _extract_noncomments(source, common.PY_MULTILINE_2_REGEX)
-
-    # Shell scripts
-    elif file_ext == common.FileExt.ShellScript:
-        source = _extract_noncomments(source, common.SHELLSCRIPT_REGEX)
-
-    # Perl
-    elif file_ext == common.FileExt.Perl:
-        source = _extract_noncomments(source, common.PERL_REGEX)
-
-    # SQL
-    elif file_ext == common.FileExt.SQL:
-        source = _extract_noncomments(source, common.SQL_REGEX)
-
-    # Rust
-    elif file_ext == common.FileExt.RUST:
-        source = _extract_noncomments(source, common.RUST_REGEX)
-
-    # TypeScript/TSX
-    elif file_ext == common.FileExt.TSX:
-        source = _extract_noncomments(source, common.TSX_REGEX)
-
-    # Solidity
-    elif file_ext == common.FileExt.SOLIDITY:
-        source = _extract_noncomments(source, common.SOLIDITY_REGEX)
-
-    # Visual Basic
-    elif file_ext == common.FileExt.VB:
-        source = _extract_noncomments(source, common.VB_REGEX)
-
-    # PHP
-    elif file_ext == common.FileExt.PHP:
-        source = _extract_noncomments_with_newlines(source, common.PHP_REGEX)
-
-    # Ruby
-    elif file_ext in [common.FileExt.Ruby, common.FileExt.GEMFILE]:
-        source = _extract_noncomments_with_newlines(source, common.RUBY_REGEX)
-
-    # JavaScript-like languages
-    elif file_ext in [common.FileExt.Scala, common.FileExt.JavaScript, common.FileExt.TypeScript,
-                      common.FileExt.Kotlin, common.FileExt.gradle, common.FileExt.svelte]:
-        source = _extract_noncomments(source, common.JS_REGEX)
-        source = _extract_noncomments(source, common.JS_PARTIAL_COMMENT_REGEX)
-
-    # YAML
-    elif file_ext == common.FileExt.yaml:
-        source = _extract_noncomments(source, common.YAML_REGEX)
-        source = re.sub(common.YAML_DOUBLE_QUOTE_REGEX, "", source)
-        source = re.sub(common.YAML_SINGLE_QUOTE_REGEX, "", source)
-
-    # Jupyter Notebook
-    elif file_ext == common.FileExt.ipynb:
+    # Jupyter Notebook: strip the code cells as Python
+    if file_ext == common.FileExt.ipynb:
         json_data = json.loads(source)
         python_code = ''
 
@@ -317,19 +692,20 @@ def remove_comment(source: str, file_ext: int) -> str:
             for line in cell['source']:
                 python_code += line if line.endswith('\n') else line + '\n'
 
-        source = _extract_noncomments(python_code, common.PY_REGEX)
-        source = _extract_noncomments(source, common.PY_MULTILINE_1_REGEX)
-        source = _extract_noncomments(source, common.PY_MULTILINE_2_REGEX)
+        source = python_code
+        file_ext = common.FileExt.Python
 
     # JSON
     elif file_ext == common.FileExt.JSON:
-        source = common.WHITESPACE_REGEX.sub("", source)
-        source = source.lower()
+        return common.strip_ws(source).lower()
 
-    # XML-like languages
-    elif file_ext in [common.FileExt.Xml, common.FileExt.markdown, common.FileExt.html]:
-        source = _extract_noncomments(source, common.XML_REGEX)
+    # Sources without any comment marker come through the regexes unchanged
+    markers = common.COMMENT_MARKERS.get(file_ext)
+    if markers is not None and not any(marker in source for marker in markers):
+        return source
 
+    for step, regex_pattern in _get_comment_patterns().get(file_ext, ()):
+        source = step(source, regex_pattern)
     return source
 
 
@@ -339,7 +715,10 @@ def remove_comments(source: str, file_ext: int) -> str:
     return remove_comment(source, file_ext)
 
 def timing(func):
-    """Decorator to measure and print function execution time.
+    """Decorator to measure function execution time.
+
+    The elapsed time is logged at DEBUG level; the message is only
+    formatted when that level is enabled.
 
     Args:
         func: Function to decorate.
@@ -349,11 +728,12 @@ def timing(func):
     """
     @wraps(func)
     def wrap(*args, **kwargs):
-        start_time = time()
+        start_ns = perf_counter_ns()
         result = func(*args, **kwargs)
-        end_time = time()
-        elapsed = end_time - start_time
-        print(f'func: {func.__name__} args: [{args}, {kwargs}] took: {elapsed:.4f} sec')
+        if logger.isEnabledFor(logging.DEBUG):
+            elapsed_ns = perf_counter_ns() - start_ns
+            logger.debug('func: %s args: [%r, %r] took: %.4f sec',
+                         func.__name__, args, kwargs, elapsed_ns / 1e9)
         return result
 
     return wrap
@@ -368,5 +748,13 @@ def count_loc(file_path: str) -> int:
     Returns:
         Total number of lines in the file.
     """
-    with open(file_path, 'r') as f:
-        return sum(1 for _ in f)
\ No newline at end of file
+    total = 0
+    last = b''
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(LOC_READ_CHUNK):
+            total += chunk.count(b'\n')
+            last = chunk[-1:]
+    # A last line without a trailing newline still counts
+    if last and last != b'\n':
+        total += 1
+    return total
\ No newline at end of file
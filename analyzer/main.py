@@ -26,23 +26,50 @@ import json
 import logging
 import os
 import time
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from itertools import chain, repeat
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
 
-import pandas as pd
+try:
+    import ijson
+except ImportError:  # optional; fall back to loading each file whole
+    ijson = None
+
+try:
+    import orjson
+except ImportError:  # optional; fall back to the stdlib parser
+    orjson = None
+
+try:
+    from rapidfuzz.distance import Indel
+except ImportError:  # optional; fall back to difflib
+    Indel = None
 
 from . import aggregator
-from . import analysis
 from . import classifier
 from . import common
 from . import constant
 from . import helpers
 
+if TYPE_CHECKING:
+    # pandas and matplotlib (via analysis) are imported where they are used,
+    # keeping `import analyzer.main` and PatchTrack([]) cheap
+    import pandas as pd
+
 # Directory and path constants
 DEFAULT_DATA_DIR = 'data/'
 DEFAULT_RESULTS_DIR = 'data/classified/'
 DEFAULT_PATCHES_DIR = 'data/patches/'
+DEFAULT_CACHE_PATH = 'data/github_cache.sqlite'
 JSON_PATTERN = '*_pr_sharings.json'
+# Patch file name -> GitHub file status, stored in the PR directory beside github/
+# so the patch directory holds only patches
+PATCH_STATUS_FILE = 'github_status.json'
+# Fields of each 'Sources' record used downstream
+SOURCE_FIELDS = ('URL', 'State', 'MergedAt', 'CreatedAt', 'RepoName', 'Number', 'ChatgptSharing')
 
 # Classification constants
 CLASS_PATCH_APPLIED = 'PA'
@@ -57,12 +84,57 @@ GITHUB_API_BASE = 'https://api.github.com'
 GITHUB_WEB_BASE = 'https://github.com'
 PR_COMMITS_PER_PAGE = 100
 PR_FILES_PER_PAGE = 100
+# GitHub lists at most 3000 files per pull request
+MAX_PR_FILE_PAGES = 30
 MIN_COMMITS_THRESHOLD = 100
 MIN_REVIEWS_THRESHOLD = 1
 
 # Similarity and processing constants
 DEFAULT_NGRAM_SIZE = 4
 MIN_EXT_THRESHOLD = 1
+SIMILARITY_THRESHOLD = 0.5
+# PRs handed to a worker process per task in classify
+PR_CHUNKSIZE = 8
+# Threads listing owner directories in build_pr_project_pairs
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Result DataFrame layout; low-cardinality text columns are stored as categories
+FILE_COLUMNS = ['GitHub', 'ChatGPT', 'Pull Request', 'File Path', 'PR Link',
+                'ChatGPT LOC', 'GitHub Patch Path', 'GitHub LOC', 'Operation',
+                'Similarity (%)', 'File Classification', 'Interesting']
+FILE_DTYPES = {'GitHub': 'category', 'ChatGPT': 'category', 'Operation': 'category',
+               'File Classification': 'category', 'Interesting': 'int8'}
+PATCH_COLUMNS = ['GitHub', 'ChatGPT', 'Pull Request', 'PR Link',
+                 'Patch Classification', 'Interesting']
+PATCH_DTYPES = {'GitHub': 'category', 'ChatGPT': 'category',
+                'Patch Classification': 'category', 'Interesting': 'int8'}
+
+
+# A pull request parsed once from its URL: project is 'owner/repo', number is the PR number
+PullRequestRef = namedtuple('PullRequestRef', ['project', 'number', 'url'])
+
+
+def _extension_sort_key(file_name: str) -> Tuple[str, str]:
+    """Sort key grouping file names by extension, then by name."""
+    return os.path.splitext(file_name)[1], file_name
+
+
+def _iter_sources(f) -> Iterator[Dict[str, Any]]:
+    """Yield the 'Sources' records of a PR sharing file, streaming when ijson is available."""
+    if ijson is not None:
+        yield from ijson.items(f, 'Sources.item', use_float=True)
+    elif orjson is not None:
+        # orjson parses the raw bytes directly, without a decode pass
+        yield from orjson.loads(f.read()).get('Sources', [])
+    else:
+        yield from json.load(f).get('Sources', [])
+
+
+def _classify_one_pr(pr_nr: str, project: str, repo_dir_files: str) -> Tuple[str, Dict[str, Any]]:
+    """Classify one PR in a worker process; module level so it can be pickled."""
+    tracker = PatchTrack([])
+    tracker.repo_dir_files = repo_dir_files
+    return pr_nr, tracker._classify_pr(pr_nr, project)
 
 
 class PatchTrack:
@@ -73,7 +145,8 @@ class PatchTrack:
             token_list: List of GitHub API tokens.
         """
         self.token_list = token_list
-        self.token_counter = 0
+        self.token_pool = helpers.TokenPool(token_list)
+        self.response_cache = helpers.ResponseCache(DEFAULT_CACHE_PATH)
 
         # Metadata
         self.main_line = "GitHub"
@@ -91,9 +164,9 @@ class PatchTrack:
         self.repo_dir_files = DEFAULT_PATCHES_DIR
 
         # DataFrame results
-        self.df_files_classes: Optional[pd.DataFrame] = None
-        self.df_patch_classes: Optional[pd.DataFrame] = None
-        self.df_patches: Optional[pd.DataFrame] = None
+        self.df_files_classes: Optional['pd.DataFrame'] = None
+        self.df_patch_classes: Optional['pd.DataFrame'] = None
+        self.df_patches: Optional['pd.DataFrame'] = None
 
         # Logging configuration
         self.logger = logging.getLogger(__name__)
@@ -107,6 +180,11 @@ class PatchTrack:
         """Set directory for patch files."""
         self.repo_dir_files = directory
 
+    def set_cache_path(self, path: str) -> None:
+        """Set SQLite file for cached GitHub API responses."""
+        self.response_cache.close()
+        self.response_cache = helpers.ResponseCache(path)
+
     def set_prs(self, prs: List[int]) -> None:
         """Set list of PR numbers to process."""
         self.prs = [str(pr) for pr in prs]
@@ -120,7 +198,7 @@ class PatchTrack:
         level = logging.INFO if mode else logging.WARNING
         self.logger.setLevel(level)
 
-    def get_df_patches(self, num_rows: int = -1) -> Optional[pd.DataFrame]:
+    def get_df_patches(self, num_rows: int = -1) -> Optional['pd.DataFrame']:
         """Get patches dataframe, optionally limited to num_rows."""
         if self.df_patches is None:
             return None
@@ -130,7 +208,7 @@ class PatchTrack:
             print(f'DataFrame contains only {self.df_patches.shape[0]} rows.')
         return self.df_patches.head(num_rows)
 
-    def get_df_file_classes(self, num_rows: int = -1) -> Optional[pd.DataFrame]:
+    def get_df_file_classes(self, num_rows: int = -1) -> Optional['pd.DataFrame']:
         """Get file classifications dataframe, optionally limited to num_rows."""
         if self.df_files_classes is None:
             return None
@@ -140,7 +218,7 @@ class PatchTrack:
             print(f'DataFrame contains only {self.df_files_classes.shape[0]} rows.')
         return self.df_files_classes.head(num_rows)
 
-    def get_df_patch_classes(self, num_rows: int = -1) -> Optional[pd.DataFrame]:
+    def get_df_patch_classes(self, num_rows: int = -1) -> Optional['pd.DataFrame']:
         """Get patch classifications dataframe, optionally limited to num_rows."""
         if self.df_patch_classes is None:
             return None
@@ -161,7 +239,7 @@ class PatchTrack:
             df, projects, merged_prs = self._get_projects()
             project_filter, projects_clean, prs_clean = self._filter_projects(projects, merged_prs)
             chatgpt_skip_prs = self._fetch_chatgpt_data(df, prs_clean)
-            pr_project_pair, pair_project = self._fetch_github_data(prs_clean, chatgpt_skip_prs, self.token_list, self.token_counter)
+            pr_project_pair, pair_project = self._fetch_github_data(prs_clean, chatgpt_skip_prs, self.token_pool)
 
             self.logger.info("Preparing data......COMPLETED!")
             return pr_project_pair, pair_project
@@ -169,36 +247,35 @@ class PatchTrack:
             self.logger.error(f"Error preparing data: {e}")
             raise
 
-    def _get_projects(self) -> Tuple[pd.DataFrame, List[str], List[str]]:
+    def _get_projects(self) -> Tuple['pd.DataFrame', List[str], List[str]]:
         """Retrieve projects and merged PR URLs from JSON files.
 
         Returns:
-            Tuple of (dataframe, project_list, merged_pr_urls).
+            Tuple of (sources_dataframe, project_list, merged_pr_urls).
         """
         self.logger.info("Retrieving project details....")
         json_pattern = os.path.join(self.data_dir, JSON_PATTERN)
-        file_list = glob.glob(json_pattern)
-
-        dfs = []
-        for file in file_list:
-            with open(file) as f:
-                json_data = pd.json_normalize(json.loads(f.read()))
-                json_data['site'] = file.rsplit("/", 1)[-1]
-            dfs.append(json_data)
-        df = pd.concat(dfs)
-
-        merged_prs = []
-        for item in df['Sources']:
-            for source in item:
-                if source['State'] == 'MERGED':
-                    merged_prs.append(source['URL'])
-
-        projects = helpers.unique([pr.split('/pull/')[0] for pr in merged_prs])
+        records = []
+        for file in sorted(glob.iglob(json_pattern)):
+            site = file.rsplit("/", 1)[-1]
+            with open(file, 'rb') as f:
+                for source in _iter_sources(f):
+                    record = {field: source.get(field) for field in SOURCE_FIELDS}
+                    record['site'] = site
+                    records.append(record)
+        import pandas as pd
+
+        # One row per source, so the filters below run as pandas column operations
+        df = pd.DataFrame.from_records(records, columns=[*SOURCE_FIELDS, 'site'])
+
+        merged = df.loc[df['State'].eq('MERGED'), 'URL']
+        merged_prs = merged.tolist()
+        projects = merged.str.split('/pull/', n=1).str[0].unique().tolist()
 
         self.logger.info("Retrieving project details....COMPLETED!")
         return df, projects, merged_prs
 
-    def _filter_projects(self, projects: List[str], merged_prs: List[str]) -> Tuple[List[str], List[str], List[str]]:
+    def _filter_projects(self, projects: List[str], merged_prs: List[str]) -> Tuple[List[str], List[str], List[PullRequestRef]]:
         """Filter projects by commit and review thresholds.
 
         Args:
@@ -211,90 +288,120 @@ class PatchTrack:
         self.logger.info(f"Filter projects....criteria: {MIN_COMMITS_THRESHOLD} commits, {MIN_REVIEWS_THRESHOLD} review")
         
         project_filter = []
+        commit_requests = []
         for project in projects:
             part = project.split('github.com/')
             try:
-                commits_url = f'{part[0]}api.github.com/repos/{part[1]}/commits?per_page={PR_COMMITS_PER_PAGE}'
-                fetch_commits = helpers.api_request(commits_url, self.token_list[0])
+                commit_requests.append(
+                    (project, f'{part[0]}api.github.com/repos/{part[1]}/commits?per_page={PR_COMMITS_PER_PAGE}'))
+            except Exception as e:
+                self.logger.warning(f"Skipping project: {e}")
+
+        commit_responses = helpers.api_requests([url for _, url in commit_requests], self.token_pool, self.response_cache)
+        for (project, _), fetch_commits in zip(commit_requests, commit_responses):
+            try:
+                if isinstance(fetch_commits, Exception):
+                    raise fetch_commits
                 if len(fetch_commits) >= MIN_COMMITS_THRESHOLD:
                     project_filter.append(project)
             except Exception as e:
                 self.logger.warning(f"Skipping project: {e}")
 
-        prs_clean = []
+        prs_by_project = defaultdict(list)
+        for pr in merged_prs:
+            pr_part = pr.split('/pull/', 1)
+            if len(pr_part) == 2:
+                prs_by_project[pr_part[0]].append((pr, pr_part[1]))
+
+        review_requests = []
         for project in project_filter:
-            for pr in merged_prs:
-                pr_part = pr.split('/pull/')
-                if project == pr_part[0]:
-                    project_part = project.split('github.com/')
-                    try:
-                        comments_url = f"{GITHUB_API_BASE}/repos/{project_part[1]}/pulls/{pr_part[1]}/reviews"
-                        fetch_comments = helpers.api_request(comments_url, self.token_list[0])
-                        if len(fetch_comments) >= MIN_REVIEWS_THRESHOLD:
-                            prs_clean.append(pr)
-                    except Exception as e:
-                        self.logger.warning(f"Skipping PR: {e}")
-
-        prs_clean = helpers.unique(prs_clean)
-        projects_clean = helpers.unique([pr.split('/pull/')[0] for pr in prs_clean])
+            project_part = project.split('github.com/', 1)
+            if len(project_part) != 2:
+                self.logger.warning(f"Skipping PR: invalid project URL {project}")
+                continue
+            for pr, pr_nr in prs_by_project.get(project, ()):
+                review_requests.append((project, PullRequestRef(project_part[1], pr_nr, pr),
+                                        f"{GITHUB_API_BASE}/repos/{project_part[1]}/pulls/{pr_nr}/reviews"))
+
+        prs_clean = []
+        # Every clean PR comes from a filtered project, so its project is recorded as it passes
+        projects_clean: Dict[str, None] = {}
+        review_responses = helpers.api_requests([url for *_, url in review_requests], self.token_pool, self.response_cache)
+        for (project, pr, _), fetch_comments in zip(review_requests, review_responses):
+            try:
+                if isinstance(fetch_comments, Exception):
+                    raise fetch_comments
+                if len(fetch_comments) >= MIN_REVIEWS_THRESHOLD:
+                    prs_clean.append(pr)
+                    projects_clean[project] = None
+            except Exception as e:
+                self.logger.warning(f"Skipping PR: {e}")
+
+        prs_clean = list(dict.fromkeys(prs_clean))
+        projects_clean = list(projects_clean)
 
         self.logger.info("Filter projects....COMPLETED")
         return project_filter, projects_clean, prs_clean
     
-    def _fetch_chatgpt_data(self, df: pd.DataFrame, prs_clean: List[str]) -> List[str]:
+    def _fetch_chatgpt_data(self, df: 'pd.DataFrame', prs_clean: List[PullRequestRef]) -> List[str]:
         """Fetch ChatGPT conversation patches and store locally.
 
         Args:
-            df: DataFrame containing source data.
-            prs_clean: List of clean PR URLs to process.
+            df: DataFrame with one row per PR source.
+            prs_clean: Clean PRs to process.
 
         Returns:
             List of ChatGPT PR URLs with 404 errors (to skip).
         """
         self.logger.info("Fetching ChatGPT data.......")
         chatgpt_skip_prs = []
-        
-        for sources in df['Sources']:
-            for source in sources:
-                if source['URL'] not in prs_clean or source['State'] != 'MERGED':
+        # Patches written so far per storage directory; numbering restarts each run so reruns overwrite
+        patch_counts: Dict[str, int] = {}
+        # (PR URL, patch path, content) written together once all patches are collected
+        pending: List[Tuple[str, str, str]] = []
+
+        merged = df[df['State'].eq('MERGED') & df['URL'].isin([pr.url for pr in prs_clean])]
+        for source in merged.to_dict('records'):
+            try:
+                if not source.get('ChatgptSharing'):
                     continue
 
-                try:
-                    if not source.get('ChatgptSharing'):
-                        continue
+                storage_dir = f'{self.repo_dir_files}{source["RepoName"]}/{source["Number"]}/chatgpt/'
+                for chat_sharing in source['ChatgptSharing']:
+                    for prompt in chat_sharing.get('Conversations', []):
+                        for code_item in prompt.get('ListOfCode', []):
+                            if not code_item.get('Content'):
+                                continue
 
-                    for chat_sharing in source['ChatgptSharing']:
-                        for prompt in chat_sharing.get('Conversations', []):
-                            for code_item in prompt.get('ListOfCode', []):
-                                if not code_item.get('Content'):
-                                    continue
+                            if storage_dir not in patch_counts:
+                                os.makedirs(storage_dir, exist_ok=True)
+                                patch_counts[storage_dir] = 0
+                            patch_counts[storage_dir] += 1
 
-                                extension = constant.EXTENSIONS.get(code_item['Type'], 'txt')
-                                repo_name = source['RepoName']
-                                storage_dir = f'{self.repo_dir_files}{repo_name}/{source["Number"]}/chatgpt/'
+                            extension = constant.EXTENSIONS.get(code_item['Type'], 'txt')
+                            patch_path = f'{storage_dir}patch-{patch_counts[storage_dir]}.{extension}'
+                            pending.append((source['URL'], patch_path, code_item['Content']))
 
-                                os.makedirs(storage_dir, exist_ok=True)
-                                
-                                count = len([f for f in os.listdir(storage_dir) if f.startswith('patch-')]) + 1
-                                patch_path = f'{storage_dir}patch-{count}.{extension}'
-                                with open(patch_path, 'w') as f:
-                                    f.write(code_item['Content'])
+            except Exception as e:
+                chatgpt_skip_prs.append(source['URL'])
+                self.logger.warning(f"Skipping ChatGPT data: {e} - {source['URL']}")
 
-                except Exception as e:
-                    chatgpt_skip_prs.append(source['URL'])
-                    self.logger.warning(f"Skipping ChatGPT data: {e} - {source['URL']}")
+        errors = helpers.write_files([(path, content) for _, path, content in pending])
+        for (url, _, _), error in zip(pending, errors):
+            if error is not None:
+                chatgpt_skip_prs.append(url)
+                self.logger.warning(f"Skipping ChatGPT data: {error} - {url}")
 
         self.logger.info("Fetching ChatGPT data.......COMPLETED!")
         return chatgpt_skip_prs
 
-    def _fetch_github_data(self, prs_clean: List[str], skip_prs: List[str], token_list: List[str], token_idx: int) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    def _fetch_github_data(self, prs_clean: List[PullRequestRef], skip_prs: List[str], token_pool: helpers.TokenPool) -> Tuple[Dict[str, Any], Dict[str, str]]:
         """Fetch GitHub patch files for PRs.
 
         Args:
-            prs_clean: List of PR URLs to process.
+            prs_clean: Clean PRs to process.
             skip_prs: List of PR URLs to skip.
-            token_list: List of GitHub API tokens.
-            token_idx: Current token index.
+            token_pool: Rate-limited pool of GitHub API tokens.
 
         Returns:
             Tuple of (pr_project_pair, pair_project) mappings.
@@ -303,55 +410,111 @@ class PatchTrack:
         pr_project_pair: Dict[str, Any] = {}
         pair_project: Dict[str, str] = {}
 
-        token_length = len(token_list)
-
-        for pr_url in prs_clean:
+        skip_prs = set(skip_prs)
+        pr_requests = []
+        for project, pr_nr, pr_url in prs_clean:
             if pr_url in skip_prs:
                 continue
 
-            repo_parts = pr_url.split('https://github.com/')[1].split('/pull/')
-            project = repo_parts[0]
-            pr_nr = repo_parts[1]
-
             pr_project_pair[pr_nr] = {}
             pair_project[pr_nr] = project
 
-            try:
-                if token_idx >= token_length:
-                    token_idx = 0
+            # Patches from an earlier run are reused without any HTTP
+            storage_dir = f'{self.repo_dir_files}{project}/{pr_nr}/github/'
+            if os.path.exists(f'{storage_dir}patch-1.patch'):
+                patch_files = [f for f in os.listdir(storage_dir)
+                               if f.startswith('patch-') and f.endswith('.patch')]
+                patch_files.sort(key=lambda f: int(f[len('patch-'):-len('.patch')]))
+                try:
+                    with open(f'{self.repo_dir_files}{project}/{pr_nr}/{PATCH_STATUS_FILE}') as status_file:
+                        statuses = json.load(status_file)
+                except (OSError, ValueError):
+                    # Written by a run that did not store statuses
+                    statuses = {}
+                pr_project_pair[pr_nr][project] = [
+                    {'filepath': f'{storage_dir}{f}', 'status': statuses.get(f, '')} for f in patch_files]
+                continue
+
+            pr_requests.append((pr_url, project, pr_nr))
 
-                files_url = f'{GITHUB_API_BASE}/repos/{project}/pulls/{pr_nr}/files?page=1&per_page={PR_FILES_PER_PAGE}'
-                pr_files, token_idx = helpers.get_response(files_url, token_list, token_idx)
-                token_idx += 1
+        responses = self._fetch_pr_files(pr_requests, token_pool)
+
+        # (pr_nr, project, patch path, content, status) written together after all responses arrive
+        pending: List[Tuple[str, str, str, str, str]] = []
+        for (pr_url, project, pr_nr), pr_files in zip(pr_requests, responses):
+            try:
+                if isinstance(pr_files, Exception):
+                    raise pr_files
+                storage_dir = f'{self.repo_dir_files}{project}/{pr_nr}/github/'
+                os.makedirs(storage_dir, exist_ok=True)
 
-                pr_data = []
+                pr_project_pair[pr_nr][project] = []
                 for idx, file in enumerate(pr_files, 1):
-                    try:
-                        patch_content = file.get('patch', '')
-                        status = file.get('status', '')
-                        storage_dir = f'{self.repo_dir_files}{project}/{pr_nr}/github/'
-
-                        os.makedirs(storage_dir, exist_ok=True)
-                        patch_path = f'{storage_dir}patch-{idx}.patch'
-                        
-                        with open(patch_path, 'w') as f:
-                            f.write(patch_content)
-
-                        pr_data.append({
-                            'filepath': patch_path,
-                            'status': status
-                        })
-                    except Exception as e:
-                        self.logger.warning(f"Skipping patch: {e}")
-
-                pr_project_pair[pr_nr][project] = pr_data
+                    pending.append((pr_nr, project, f'{storage_dir}patch-{idx}.patch',
+                                    file.get('patch', ''), file.get('status', '')))
 
             except Exception as e:
                 self.logger.error(f"Error fetching PR data: {pr_url} - {e}")
 
+        errors = helpers.write_files([(path, content) for _, _, path, content, _ in pending])
+        statuses: Dict[str, Dict[str, str]] = defaultdict(dict)
+        for (pr_nr, project, patch_path, _, status), error in zip(pending, errors):
+            if error is not None:
+                self.logger.warning(f"Skipping patch: {error}")
+                continue
+            pr_project_pair[pr_nr][project].append({
+                'filepath': patch_path,
+                'status': status
+            })
+            statuses[f'{self.repo_dir_files}{project}/{pr_nr}/'][os.path.basename(patch_path)] = status
+
+        status_files = [(f'{pr_dir}{PATCH_STATUS_FILE}', json.dumps(pr_statuses))
+                        for pr_dir, pr_statuses in statuses.items()]
+        for (status_path, _), error in zip(status_files, helpers.write_files(status_files)):
+            if error is not None:
+                self.logger.warning(f"Could not store patch statuses: {status_path} - {error}")
+
         self.logger.info("Fetching GITHUB data.......COMPLETED!")
         return pr_project_pair, pair_project
     
+    def _fetch_pr_files(self, pr_requests: List[Tuple[str, str, str]], token_pool: helpers.TokenPool) -> List[Any]:
+        """Fetch the changed files of several PRs, following pagination.
+
+        Every PR's first page is requested concurrently. A full page may be followed
+        by another, so the next page of all such PRs is requested in the following
+        round until each PR returns a short page.
+
+        Args:
+            pr_requests: (pr_url, project, pr_nr) tuples.
+            token_pool: Rate-limited pool of GitHub API tokens.
+
+        Returns:
+            Per PR, in order, the list of file objects or the exception raised.
+        """
+        def files_url(project: str, pr_nr: str, page: int) -> str:
+            return f'{GITHUB_API_BASE}/repos/{project}/pulls/{pr_nr}/files?page={page}&per_page={PR_FILES_PER_PAGE}'
+
+        responses = helpers.api_requests([files_url(project, pr_nr, 1) for _, project, pr_nr in pr_requests],
+                                         token_pool, self.response_cache)
+        full = [i for i, files in enumerate(responses) if isinstance(files, list) and len(files) == PR_FILES_PER_PAGE]
+
+        page = 2
+        while full and page <= MAX_PR_FILE_PAGES:
+            pages = helpers.api_requests([files_url(*pr_requests[i][1:], page) for i in full],
+                                         token_pool, self.response_cache)
+            next_full = []
+            for i, files in zip(full, pages):
+                if not isinstance(files, list):
+                    self.logger.warning(f"Incomplete file list: {pr_requests[i][0]} page {page} - {files}")
+                    continue
+                responses[i].extend(files)
+                if len(files) == PR_FILES_PER_PAGE:
+                    next_full.append(i)
+            full = next_full
+            page += 1
+
+        return responses
+
     def build_pr_project_pairs(self) -> List[Dict[str, str]]:
         """Build PR to project mappings from directory structure.
 
@@ -360,18 +523,42 @@ class PatchTrack:
         """
         self.logger.info("Building PR <> Project Pair...")
         result = []
-        
-        for root, dirs, _ in os.walk(self.repo_dir_files):
-            depth = root[len(self.repo_dir_files):].count(os.sep)
-            if depth == 1:
-                for dir_name in dirs:
-                    full_path = os.path.join(root, dir_name)
-                    parts = full_path.split('/')
-                    result.append({parts[-1]: f'{parts[-3]}/{parts[-2]}'})
+        if not os.path.isdir(self.repo_dir_files):
+            self.logger.info("Building PR <> Project Pair......COMPLETED!")
+            return result
+
+        # Only the owner/repo/PR directory levels are read; patch files are never visited
+        with os.scandir(self.repo_dir_files) as owners:
+            owner_dirs = [owner for owner in owners if owner.is_dir()]
+
+        # Directory reads release the GIL, so owners are listed concurrently
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+            result = list(chain.from_iterable(executor.map(self._scan_owner_dir, owner_dirs)))
 
         self.logger.info("Building PR <> Project Pair......COMPLETED!")
         return result
 
+    @staticmethod
+    def _scan_owner_dir(owner: os.DirEntry) -> List[Dict[str, str]]:
+        """List the PR directories below one owner directory.
+
+        Args:
+            owner: Directory entry of an owner below repo_dir_files.
+
+        Returns:
+            List of {pr: 'owner/repo'} dicts in directory order.
+        """
+        pairs = []
+        with os.scandir(owner.path) as repos:
+            for repo in repos:
+                if not repo.is_dir():
+                    continue
+                with os.scandir(repo.path) as prs:
+                    for pr in prs:
+                        if pr.is_dir():
+                            pairs.append({pr.name: f'{owner.name}/{repo.name}'})
+        return pairs
+
     def read_file(self, file_path: str) -> str:
         """Read file contents with latin-1 encoding.
 
@@ -381,27 +568,50 @@ class PatchTrack:
         Returns:
             File contents as string.
         """
-        with open(file_path, 'r', encoding='latin-1') as file:
-            return file.read()
+        text = Path(file_path).read_bytes().decode('latin-1')
+        # Same newline translation as reading in text mode
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def compare_text_with_patch(self, text: str, patch_content: str,
+                                threshold: float = SIMILARITY_THRESHOLD, use_fast: bool = True) -> float:
+        """Calculate similarity between text and patch.
 
-    def compare_text_with_patch(self, text: str, patch_content: str) -> float:
-        """Calculate similarity between text and patch using SequenceMatcher.
+        The ratio can never exceed ``2*min(|a|,|b|)/(|a|+|b|)``. When that
+        bound is already below ``threshold`` the bound is returned without
+        running the (quadratic) matcher. With ``use_fast`` and RapidFuzz
+        installed the ratio is the normalized Indel (LCS) similarity, which
+        may be slightly higher than difflib's Ratcliff-Obershelp ratio.
 
         Args:
             text: Original text content.
             patch_content: Patch content to compare.
+            threshold: Decision threshold below which the exact ratio is not needed.
+            use_fast: Use RapidFuzz when available instead of SequenceMatcher.
 
         Returns:
             Similarity ratio (0-1).
         """
+        total = len(text) + len(patch_content)
+        if total:
+            upper = 2 * min(len(text), len(patch_content)) / total
+            if upper < threshold:
+                return upper
+        if use_fast and Indel is not None:
+            return Indel.normalized_similarity(text, patch_content)
         return difflib.SequenceMatcher(None, text, patch_content).ratio()
 
-    def _process_missing_chatgpt_dir(self, pr_nr: str, project: str, patch_file_path: str) -> List[Dict[str, Any]]:
+    def _process_missing_chatgpt_dir(self, pr_nr: str, project: str, patch_file_path: str,
+                                     pr_link: Optional[str] = None) -> List[Dict[str, Any]]:
         """Handle case when ChatGPT directory does not exist.
 
+        Args:
+            pr_link: Precomputed PR URL; built from project and pr_nr when omitted.
+
         Returns:
             List with single result dict for NOT EXISTING classification.
         """
+        if pr_link is None:
+            pr_link = f'{GITHUB_WEB_BASE}/{project}/pull/{pr_nr}'
         result: List[Dict[str, Any]] = []
         result_item = {
             'similarityRatio': 0.0,
@@ -410,20 +620,31 @@ class PatchTrack:
             'patchPath': patch_file_path,
             'destLOC': 0,
             'patchLOC': 0,
-            'PrLink': f'{GITHUB_WEB_BASE}/{project}/pull/{pr_nr}'
+            'PrLink': pr_link
         }
         result.append(result_item)
         return result
 
-    def _process_patch_pair(self, text_file_path: str, patch_file_path: str, file_ext: int, pr_nr: str, project: str) -> Optional[Dict[str, Any]]:
+    def _process_patch_pair(self, text_file_path: str, patch_file_path: str, file_ext: int, pr_nr: str, project: str,
+                            pr_link: Optional[str] = None, text_loc: Optional[int] = None,
+                            patch_loc: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """Process a single patch-text file pair.
 
+        Args:
+            pr_link: Precomputed PR URL; built from project and pr_nr when omitted.
+            text_loc: Precomputed line count of the text file; counted when omitted.
+            patch_loc: Precomputed line count of the patch file; counted when omitted.
+
         Returns:
             Result dict or None on error.
         """
+        if pr_link is None:
+            pr_link = f'{GITHUB_WEB_BASE}/{project}/pull/{pr_nr}'
         try:
-            text_loc = helpers.count_loc(text_file_path)
-            patch_loc = helpers.count_loc(patch_file_path)
+            if text_loc is None:
+                text_loc = helpers.count_loc(text_file_path)
+            if patch_loc is None:
+                patch_loc = helpers.count_loc(patch_file_path)
 
             if file_ext <= MIN_EXT_THRESHOLD:
                 return {
@@ -433,7 +654,7 @@ class PatchTrack:
                     'destLOC': text_loc,
                     'patchPath': patch_file_path,
                     'patchLOC': patch_loc,
-                    'PrLink': f'{GITHUB_WEB_BASE}/{project}/pull/{pr_nr}',
+                    'PrLink': pr_link,
                     'type': 'N/A'
                 }
 
@@ -447,10 +668,7 @@ class PatchTrack:
             hunk_matches = classifier.find_hunk_matches_w_important_hash(match_items, CLASS_PATCH_APPLIED, added, source_hashes)
             similarity_ratio = classifier.cal_similarity_ratio(source_hashes, added)
 
-            hunk_classes = []
-            for _ in hunk_matches:
-                hunk_class = classifier.classify_hunk('', hunk_matches[_]['class'])
-                hunk_classes.append(hunk_class)
+            hunk_classes = [classifier.classify_hunk('', match['class']) for match in hunk_matches.values()]
 
             return {
                 'type': 'ADDED',
@@ -458,7 +676,7 @@ class PatchTrack:
                 'destLOC': text_loc,
                 'patchPath': patch_file_path,
                 'patchLOC': patch_loc,
-                'PrLink': f'{GITHUB_WEB_BASE}/{project}/pull/{pr_nr}',
+                'PrLink': pr_link,
                 'similarityRatio': round(similarity_ratio, 2),
                 'hunkMatches': hunk_matches,
                 'patchClass': classifier.classify_patch(hunk_classes)
@@ -468,71 +686,155 @@ class PatchTrack:
             self.logger.error(f'Error processing patch pair: {e}')
             return None
 
-    def classify(self, pr_project_pair: Dict[str, str]) -> None:
-        """Classify patches for all PRs.
+    def _classify_pr(self, pr_nr: str, project: str) -> Dict[str, Any]:
+        """Classify the patches of a single PR.
 
         Args:
-            pr_project_pair: Mapping of PR numbers to projects.
+            pr_nr: PR number.
+            project: Project the PR belongs to.
+
+        Returns:
+            Result entry mapping file paths to their classification results.
         """
-        self.logger.info(f'Starting classification for {self.main_line} -> {self.variant}...')
-        start_time = time.time()
+        root_directory = f'{self.repo_dir_files}{project}/'
+        chatgpt_dir = f'{root_directory}{pr_nr}/chatgpt/'
+        github_dir = f'{root_directory}{pr_nr}/github/'
+        pr_link = f'{GITHUB_WEB_BASE}/{project}/pull/{pr_nr}'
+
+        pr_result: Dict[str, Any] = {}
+
+        if not os.path.exists(chatgpt_dir):
+            github_files = [f for f in os.listdir(github_dir) if not f.startswith('.')]
+            patch_path = f'{github_dir}{github_files[0]}'
+            pr_result[patch_path] = {
+                'result': self._process_missing_chatgpt_dir(pr_nr, project, patch_path, pr_link)
+            }
+            return pr_result
+
+        try:
+            # Cluster same-extension files so consecutive pairs share classifier code paths
+            chatgpt_files = sorted((f for f in os.listdir(chatgpt_dir) if not f.startswith('.')),
+                                   key=_extension_sort_key)
+            github_files = sorted((f for f in os.listdir(github_dir) if not f.startswith('.')),
+                                  key=_extension_sort_key)
+            patch_paths = [os.path.join(github_dir, patch_file) for patch_file in github_files]
+            patch_locs: Optional[Dict[str, int]] = None
+
+            for text_file in chatgpt_files:
+                text_path = os.path.join(chatgpt_dir, text_file)
+                file_ext = helpers.get_file_type(text_path)
+                text_loc = helpers.count_loc(text_path)
+
+                if file_ext <= MIN_EXT_THRESHOLD:
+                    # Unsupported languages are never compared, so one row stands for every patch
+                    pr_result[text_path] = {'result': [{
+                        'similarityRatio': 0.0,
+                        'patchClass': CLASS_OTHER_EXT,
+                        'destPath': text_path,
+                        'destLOC': text_loc,
+                        'patchPath': '',
+                        'patchLOC': 0,
+                        'PrLink': pr_link,
+                        'type': 'N/A'
+                    }]}
+                    continue
 
-        for pr_nr, project in pr_project_pair.items():
-            root_directory = f'{self.repo_dir_files}{project}/'
-            chatgpt_dir = f'{root_directory}{pr_nr}/chatgpt/'
-            github_dir = f'{root_directory}{pr_nr}/github/'
+                if patch_locs is None:
+                    # Each patch is paired with every text file, so its LOC is counted once
+                    patch_locs = {patch_path: helpers.count_loc(patch_path) for patch_path in patch_paths}
+                pr_result[text_path] = {}
+                result_list: List[Dict[str, Any]] = []
+
+                for patch_path in patch_paths:
+                    result = self._process_patch_pair(text_path, patch_path, file_ext, pr_nr, project, pr_link,
+                                                      text_loc, patch_locs[patch_path])
+
+                    if result is None:
+                        result = {
+                            'similarityRatio': 0.0,
+                            'patchClass': CLASS_ERROR,
+                            'destPath': text_path,
+                            'destLOC': text_loc,
+                            'patchPath': patch_path,
+                            'patchLOC': patch_locs[patch_path],
+                            'PrLink': pr_link
+                        }
+                    result_list.append(result)
+
+                pr_result[text_path]['result'] = result_list
 
-            self.result_dict[pr_nr] = {}
+        except Exception as e:
+            self.logger.error(f"Error processing PR {pr_nr}: {e}")
 
-            if not os.path.exists(chatgpt_dir):
-                github_files = [f for f in os.listdir(github_dir) if not f.startswith('.')]
-                patch_path = f'{github_dir}{github_files[0]}'
-                self.result_dict[pr_nr][patch_path] = {
-                    'result': self._process_missing_chatgpt_dir(pr_nr, project, patch_path)
-                }
-                continue
+        return pr_result
 
-            try:
-                chatgpt_files = [f for f in os.listdir(chatgpt_dir) if not f.startswith('.')]
-                github_files = [f for f in os.listdir(github_dir) if not f.startswith('.')]
-
-                for text_file in chatgpt_files:
-                    text_path = os.path.join(chatgpt_dir, text_file)
-                    file_ext = helpers.get_file_type(text_path)
-                    self.result_dict[pr_nr][text_path] = {}
-                    result_list: List[Dict[str, Any]] = []
-
-                    for patch_file in github_files:
-                        patch_path = os.path.join(github_dir, patch_file)
-                        result = self._process_patch_pair(text_path, patch_path, file_ext, pr_nr, project)
-                        
-                        if result is None:
-                            result = {
-                                'similarityRatio': 0.0,
-                                'patchClass': CLASS_ERROR,
-                                'destPath': text_path,
-                                'destLOC': helpers.count_loc(text_path),
-                                'patchPath': patch_path,
-                                'patchLOC': helpers.count_loc(patch_path),
-                                'PrLink': f'{GITHUB_WEB_BASE}/{project}/pull/{pr_nr}'
-                            }
-                        result_list.append(result)
-
-                    self.result_dict[pr_nr][text_path]['result'] = result_list
+    def classify(self, pr_project_pair: Dict[str, str], max_workers: Optional[int] = None,
+                 legacy_pickle: bool = False) -> None:
+        """Classify patches for all PRs.
 
-            except Exception as e:
-                self.logger.error(f"Error processing PR {pr_nr}: {e}")
+        Args:
+            pr_project_pair: Mapping of PR numbers to projects.
+            max_workers: Worker processes; defaults to the CPU count, 1 classifies in-process.
+            legacy_pickle: Persist results as a pickle instead of Parquet.
+        """
+        self.logger.info(f'Starting classification for {self.main_line} -> {self.variant}...')
+        start_time = time.time()
 
-        self.pr_classifications = aggregator.final_class(self.result_dict)
-        _ = aggregator.count_all_classifications(self.pr_classifications)
+        items = list(pr_project_pair.items())
+        if max_workers == 1 or len(items) <= 1:
+            for pr_nr, project in items:
+                self.result_dict[pr_nr] = self._classify_pr(pr_nr, project)
+        else:
+            # PRs are independent and CPU bound, so they are spread over processes
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for pr_nr, entry in executor.map(_classify_one_pr, [pr for pr, _ in items],
+                                                 [project for _, project in items],
+                                                 repeat(self.repo_dir_files), chunksize=PR_CHUNKSIZE):
+                    self.result_dict[pr_nr] = entry
+
+        pr_classes = aggregator.final_class([{pr_nr: entry} for pr_nr, entry in self.result_dict.items()])
+        all_counts = aggregator.count_all_classifications(pr_classes)
+        self.pr_classifications = {pr_nr: data for pr_class in pr_classes for pr_nr, data in pr_class.items()}
 
         duration = time.time() - start_time
         self.logger.info(f'Classification finished.')
         self.logger.info(f'Classification Runtime: {duration:.2f}s')
 
-        common.pickleFile(f"{self.main_dir_results}_{self.main_line}_results", 
-                         [self.result_dict, self.pr_classifications, _, duration])
-            
+        self.save_results(all_counts, duration, legacy_pickle)
+
+    def save_results(self, all_counts: Dict[str, int], duration: float, legacy_pickle: bool = False) -> None:
+        """Persist classification results to the results directory.
+
+        The file and PR tables are written as zstd-compressed Parquet with a
+        JSON sidecar holding the PR classifications, totals and runtime. With
+        `legacy_pickle`, or when pyarrow is not installed, the raw results are
+        pickled into a single file as before.
+
+        Args:
+            all_counts: Number of PRs per classification.
+            duration: Classification runtime in seconds.
+            legacy_pickle: Write the pickle instead of Parquet.
+        """
+        base_path = f"{self.main_dir_results}_{self.main_line}_results"
+        if self.main_dir_results:
+            os.makedirs(self.main_dir_results, exist_ok=True)
+
+        if not legacy_pickle:
+            self.create_dataframes()
+            try:
+                self.df_files_classes.to_parquet(f'{base_path}_files.parquet', compression='zstd')
+                self.df_patch_classes.to_parquet(f'{base_path}_patches.parquet', compression='zstd')
+            except ImportError as e:
+                self.logger.warning(f"Parquet unavailable, pickling results instead: {e}")
+                legacy_pickle = True
+            else:
+                with open(f'{base_path}.json', 'w') as f:
+                    json.dump({'pr_classifications': self.pr_classifications,
+                               'counts': all_counts,
+                               'duration': duration}, f)
+
+        if legacy_pickle:
+            common.pickle_file(base_path, [self.result_dict, self.pr_classifications, all_counts, duration])
 
     def run_classification(self, pr_project_pairs: Dict[str, str]) -> None:
         """Run full classification pipeline.
@@ -541,63 +843,59 @@ class PatchTrack:
             pr_project_pairs: Mapping of PR numbers to projects.
         """
         print('=' * 70)
+        # classify() builds the DataFrames while saving the results
         self.classify(pr_project_pairs)
-        self.create_dataframes()
         print('=' * 70)
         self.visualize_results()
 
     def create_dataframes(self) -> None:
         """Create DataFrames from classification results."""
-        file_results: List[List[Any]] = []
-        patch_results: List[List[Any]] = []
+        import pandas as pd
+
+        # Rows are plain tuples in FILE_COLUMNS / PATCH_COLUMNS order
+        file_results: List[Tuple[Any, ...]] = []
+        patch_results: List[Tuple[Any, ...]] = []
+        main_line = self.main_line
+        variant = self.variant
 
         for pr, files_dict in self.result_dict.items():
             for file_path, file_data in files_dict.items():
                 for item in file_data['result']:
-                    is_interesting = 1 if item.get('patchClass') == CLASS_PATCH_APPLIED else 0
-                    patch_type = item.get('type', 'None')
-                    
-                    file_results.append([
-                        self.main_line,
-                        self.variant,
+                    patch_class = item.get('patchClass', '')
+                    file_results.append((
+                        main_line,
+                        variant,
                         pr,
                         file_path,
                         item.get('PrLink', ''),
                         item.get('destLOC', 0),
                         item.get('patchPath', ''),
                         item.get('patchLOC', 0),
-                        patch_type,
+                        item.get('type', 'None'),
                         item.get('similarityRatio', 0.0),
-                        item.get('patchClass', ''),
-                        is_interesting
-                    ])
+                        patch_class,
+                        1 if patch_class == CLASS_PATCH_APPLIED else 0,
+                    ))
 
                 # PR-level result (use first result for link)
                 if file_data['result']:
                     pr_class = self.pr_classifications[pr]['class']
-                    pr_interesting = 1 if pr_class == CLASS_PATCH_APPLIED else 0
-                    patch_results.append([
-                        self.main_line,
-                        self.variant,
+                    patch_results.append((
+                        main_line,
+                        variant,
                         pr,
                         file_data['result'][0].get('PrLink', ''),
                         pr_class,
-                        pr_interesting
-                    ])
-
-        columns_files = ['GitHub', 'ChatGPT', 'Pull Request', 'File Path', 'PR Link',
-                        'ChatGPT LOC', 'GitHub Patch Path', 'GitHub LOC', 'Operation',
-                        'Similarity (%)', 'File Classification', 'Interesting']
-        columns_patches = ['GitHub', 'ChatGPT', 'Pull Request', 'PR Link',
-                          'Patch Classification', 'Interesting']
+                        1 if pr_class == CLASS_PATCH_APPLIED else 0,
+                    ))
 
-        self.df_files_classes = pd.DataFrame(file_results, columns=columns_files)
-        self.df_files_classes = self.df_files_classes.sort_values(
-            by=['Pull Request', 'Interesting'], ascending=False)
+        self.df_files_classes = pd.DataFrame.from_records(file_results, columns=FILE_COLUMNS).astype(FILE_DTYPES)
+        self.df_files_classes.sort_values(by=['Pull Request', 'Interesting'], ascending=False,
+                                          ignore_index=True, inplace=True, kind='stable')
 
-        self.df_patch_classes = pd.DataFrame(patch_results, columns=columns_patches)
-        self.df_patch_classes = self.df_patch_classes.sort_values(
-            by='Interesting', ascending=False)
+        self.df_patch_classes = pd.DataFrame.from_records(patch_results, columns=PATCH_COLUMNS).astype(PATCH_DTYPES)
+        self.df_patch_classes.sort_values(by='Interesting', ascending=False,
+                                          ignore_index=True, inplace=True, kind='stable')
 
     def print_results(self) -> None:
         """Print classification results in human-readable format."""
@@ -622,26 +920,16 @@ class PatchTrack:
         """Generate and display visualization plots for results."""
         self.logger.info(f'Generating plots for {self.main_line} -> {self.variant}...')
 
-        class_counts: Dict[str, int] = {
-            CLASS_PATCH_APPLIED: 0,
-            CLASS_PATCH_NOT_APPLIED: 0,
-            CLASS_CANNOT_CLASSIFY: 0,
-            CLASS_NOT_EXISTING: 0,
-            CLASS_ERROR: 0
-        }
-
-        for pr in self.pr_classifications:
-            pr_class = self.pr_classifications[pr].get('class', '')
-            if pr_class in class_counts:
-                class_counts[pr_class] += 1
-
+        # pr_classifications holds one aggregated class per PR, as produced by the aggregator
+        counts = Counter(pr_data['class'] for pr_data in self.pr_classifications.values())
         totals_list = [
-            class_counts[CLASS_PATCH_APPLIED],
-            class_counts[CLASS_PATCH_NOT_APPLIED],
-            class_counts[CLASS_NOT_EXISTING],
-            class_counts[CLASS_CANNOT_CLASSIFY],
-            class_counts[CLASS_ERROR]
+            counts[pr_class]
+            for pr_class in (aggregator.CLASS_PATCH_APPLIED, aggregator.CLASS_PATCH_NOT_APPLIED,
+                             aggregator.CLASS_NOT_EXISTING, aggregator.CLASS_CANNOT_CLASSIFY,
+                             aggregator.CLASS_ERROR)
         ]
 
+        from . import analysis
+
         analysis.all_class_bar(totals_list, True)
         
\ No newline at end of file
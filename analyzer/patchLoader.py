@@ -4,10 +4,16 @@ The PatchLoader class loads and processes patch files (unified diff format),
 builds hash lists using n-grams, and tracks added/removed lines.
 """
 
+import io
 import os
 import re
+import sys
 import time
-from typing import Dict, List, Tuple
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from . import common
 from . import helpers
@@ -15,6 +21,57 @@ from . import helpers
 # Magic number constants
 MIN_FILE_EXT_TYPE = 2  # Minimum supported file extension type index
 MAX_FILE_EXT_TYPE = 40  # Maximum supported file extension type index
+VALID_FILE_EXT_TYPES = frozenset(range(MIN_FILE_EXT_TYPE, MAX_FILE_EXT_TYPE))  # Supported file extension type indices
+PATCH_FILE_CHUNKSIZE = 4  # Patch files handed to a worker per task
+READ_WORKERS = 4  # Threads reading patch files ahead of the serial parser
+LINE_CACHE_SIZE = 4096  # Distinct added/removed lines memoized per patch file
+
+_PATCH_SUFFIX_REGEX = re.compile(r'\.patch$')
+
+# Single-pass HTML escaping for the original diff lines
+_HTML_ESCAPE_TABLE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+
+def _read_patch_lines(file_path: str) -> List[str]:
+    """Read all lines of a patch file, keeping their line endings."""
+    with open(file_path, 'r') as f:
+        return f.readlines()
+
+
+def _read_ahead(file_paths: Iterable[str], max_workers: int = READ_WORKERS) -> Iterator[Tuple[str, List[str]]]:
+    """Yield (file_path, lines) in order, reading the next files on a thread pool.
+
+    At most `max_workers` reads are in flight, so only a few files beyond
+    the one being parsed are held in memory.
+    """
+    paths = iter(file_paths)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque((path, executor.submit(_read_patch_lines, path)) for path in islice(paths, max_workers))
+        while pending:
+            file_path, future = pending.popleft()
+            lines = future.result()
+            for path in islice(paths, 1):
+                pending.append((path, executor.submit(_read_patch_lines, path)))
+            yield file_path, lines
+
+
+def _load_patch_file(file_path: str, patch_type: str, file_ext: int, ngram_size: int) -> Tuple:
+    """Process one patch file in a worker process.
+
+    Args:
+        file_path: Path to the patch file.
+        patch_type: 'buggy' or 'patch'.
+        file_ext: File extension type index.
+        ngram_size: The parent's `common.ngram_size`, which spawned workers
+            would otherwise not see.
+
+    Returns:
+        Tuple of (patch_list, only_removed, only_added, hashed_ngrams) for the file.
+    """
+    common.ngram_size = ngram_size
+    loader = PatchLoader()
+    loader._process_patch_file(file_path, patch_type, file_ext)
+    return loader._patch_list, loader._only_removed, loader._only_added, loader._hashed_ngrams
 
 
 class PatchLoader:
@@ -24,17 +81,26 @@ class PatchLoader:
         """Initialize the PatchLoader with empty data structures."""
         self._patch_list: List[common.PatchInfo] = []
         self._npatch: int = 0
+        # patch_hashes of every hashed hunk; the hash -> ngram map is built from
+        # them only when hashes() is called
+        self._hashed_ngrams: List[List[Tuple[str, List[int]]]] = []
         self._hashes: Dict[int, str] = {}
+        self._nhashed: int = 0
         self._only_removed: List[List[str]] = []
         self._only_added: List[List[str]] = []
+        # (tokens, ngram_size) -> (hash_list, patch_hashes) of hunks already hashed
+        self._hunk_cache: Dict[Tuple[Tuple[str, ...], int], Tuple[List[int], List[Tuple[str, List[int]]]]] = {}
 
-    def traverse(self, patch_path: str, patch_type: str, file_ext: int) -> int:
+    def traverse(self, patch_path: str, patch_type: str, file_ext: int, max_workers: Optional[int] = None) -> int:
         """Traverse patch files and process them.
 
         Args:
             patch_path: Path to a patch file or directory.
             patch_type: Type of patch ('buggy' or 'patch').
             file_ext: File extension type index.
+            max_workers: Worker processes for a directory of patches. Serial
+                when None or 1; callers already running inside a process
+                pool should keep the default.
 
         Returns:
             The number of patches processed.
@@ -43,34 +109,88 @@ class PatchLoader:
 
         if os.path.isfile(patch_path):
             common.verbose_print(f'  [-] {patch_path}: {file_ext}')
-            if MIN_FILE_EXT_TYPE <= file_ext < MAX_FILE_EXT_TYPE:
+            if file_ext in VALID_FILE_EXT_TYPES:
                 self._process_patch_file(patch_path, patch_type, file_ext)
         elif os.path.isdir(patch_path):
-            for root, dirs, files in os.walk(patch_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    common.verbose_print(f'  [-] {file_path}: {file_ext}')
-                    if MIN_FILE_EXT_TYPE <= file_ext < MAX_FILE_EXT_TYPE:
-                        self._process_patch_file(file_path, patch_type, file_ext)
-                        if patch_type == 'buggy':
-                            self.important_hashes = []
+            file_paths = list(helpers.iter_files(patch_path))
+            for file_path in file_paths:
+                common.verbose_print(f'  [-] {file_path}: {file_ext}')
+            if file_ext in VALID_FILE_EXT_TYPES and file_paths:
+                if max_workers is not None and max_workers > 1 and len(file_paths) > 1:
+                    self._process_patch_files_parallel(file_paths, patch_type, file_ext, max_workers)
+                elif len(file_paths) > 1:
+                    # File reads release the GIL, so the next files are read while one is parsed
+                    for file_path, lines in _read_ahead(file_paths):
+                        self._process_patch_file(file_path, patch_type, file_ext, lines)
+                else:
+                    self._process_patch_file(file_paths[0], patch_type, file_ext)
+                if patch_type == 'buggy':
+                    self.important_hashes = []
 
         self._npatch = len(self._patch_list)
         elapsed_time = time.time() - start_time
         return self._npatch
 
-    def _process_patch_file(self, patch_path: str, patch_type: str, file_type: int) -> None:
+    def traverse_buffer(
+        self, buf: Union[str, bytes], patch_type: str, file_ext: int, patch_path: str = '<buffer>.patch'
+    ) -> int:
+        """Process a patch held in memory, as `traverse` does for a single file.
+
+        Args:
+            buf: Patch text; bytes are decoded as UTF-8.
+            patch_type: Type of patch ('buggy' or 'patch').
+            file_ext: File extension type index.
+            patch_path: Name recorded in each PatchInfo.file_path.
+
+        Returns:
+            The number of patches processed.
+        """
+        if isinstance(buf, bytes):
+            buf = buf.decode('utf-8')
+        if file_ext in VALID_FILE_EXT_TYPES:
+            # newline=None translates line endings like reading the file in text mode
+            lines = io.StringIO(buf, newline=None).readlines()
+            self._process_patch_file(patch_path, patch_type, file_ext, lines)
+
+        self._npatch = len(self._patch_list)
+        return self._npatch
+
+    def _process_patch_files_parallel(self, file_paths: List[str], patch_type: str, file_ext: int, max_workers: int) -> None:
+        """Process patch files in a process pool and merge results in file order.
+
+        Args:
+            file_paths: Patch files to process.
+            patch_type: 'buggy' or 'patch'.
+            file_ext: File extension type index.
+            max_workers: Maximum number of worker processes.
+        """
+        n = len(file_paths)
+        with ProcessPoolExecutor(max_workers=min(max_workers, n)) as executor:
+            loaded = executor.map(
+                _load_patch_file, file_paths, [patch_type] * n, [file_ext] * n,
+                [common.ngram_size] * n, chunksize=PATCH_FILE_CHUNKSIZE
+            )
+            for patch_list, only_removed, only_added, hashed_ngrams in loaded:
+                self._patch_list.extend(patch_list)
+                self._only_removed.extend(only_removed)
+                self._only_added.extend(only_added)
+                self._hashed_ngrams.extend(hashed_ngrams)
+
+    def _process_patch_file(
+        self, patch_path: str, patch_type: str, file_type: int, lines: Optional[Iterable[str]] = None
+    ) -> None:
         """Route patch processing based on type.
 
         Args:
             patch_path: Path to the patch file.
             patch_type: 'buggy' or 'patch'.
             file_type: File extension type index.
+            lines: Lines of the file when already read; streamed from patch_path otherwise.
         """
         if patch_type == 'buggy':
-            self._process_buggy(patch_path, file_type)
+            self._process_buggy(patch_path, file_type, lines)
         elif patch_type == 'patch':
-            self._process_patch(patch_path, file_type)
+            self._process_patch(patch_path, file_type, lines)
 
     def _add_patch_from_diff(
         self,
@@ -93,48 +213,50 @@ class PatchLoader:
             diff_orig_lines: Original formatted lines for display.
             file_type: File extension type index.
         """
-        diff_norm_lines = self._normalize(''.join(diff_lines), file_type).split()
-
-        if len(diff_norm_lines) >= common.ngram_size:
-            path = f'[{patch_filename}] {diff_file} #{diff_cnt}'
-            hash_list, patch_hashes = self._build_hash_list(diff_norm_lines)
-            self._patch_list.append(
-                common.PatchInfo(
-                    path, file_type, ''.join(diff_orig_lines),
-                    diff_norm_lines, hash_list, patch_hashes, common.ngram_size
-                )
-            )
-        else:
-            # Adjust ngram_size if diff is too short
-            common.ngram_size = len(diff_norm_lines)
-            path = f'[{patch_filename}] {diff_file} #{diff_cnt}'
-            hash_list, patch_hashes = self._build_hash_list(diff_norm_lines)
-            self._patch_list.append(
-                common.PatchInfo(
-                    path, file_type, ''.join(diff_orig_lines),
-                    diff_norm_lines, hash_list, patch_hashes, common.ngram_size
-                )
+        # split() already treats every WHITESPACE_REGEX character as a separator,
+        # so collapsing whitespace first would not change the tokens
+        diff_norm_lines = helpers.remove_comment(''.join(diff_lines).lower(), file_type).split()
+
+        # Shrink the n-gram size for hunks shorter than the configured size
+        ngram_size = min(common.ngram_size, len(diff_norm_lines))
+        path = f'[{patch_filename}] {diff_file} #{diff_cnt}'
+        # Identical hunks (e.g. shared context in buggy/patch pairs) reuse their hashes
+        cache_key = (tuple(diff_norm_lines), ngram_size)
+        cached = self._hunk_cache.get(cache_key)
+        if cached is None:
+            cached = self._hunk_cache[cache_key] = self._build_hash_list(diff_norm_lines, ngram_size)
+        hash_list, patch_hashes = cached
+        self._patch_list.append(
+            common.PatchInfo(
+                path, file_type, ''.join(diff_orig_lines),
+                diff_norm_lines, hash_list, patch_hashes, ngram_size
             )
+        )
 
-    def _process_buggy(self, patch_path: str, file_type: int) -> None:
+    def _process_buggy(self, patch_path: str, file_type: int, lines: Optional[Iterable[str]] = None) -> None:
         """Process a 'buggy' patch file (removed lines).
 
         Args:
             patch_path: Path to the patch file.
             file_type: File extension type index.
+            lines: Lines of the file when already read; streamed from patch_path otherwise.
         """
-        patch_filename = os.path.basename(patch_path)
-        with open(patch_path, 'r') as f:
-            patch_lines = f.readlines()
+        if lines is None:
+            with open(patch_path, 'r') as f:
+                return self._process_buggy(patch_path, file_type, f)
 
-        diff_file = re.sub(r'\.patch$', '', patch_path)
+        patch_filename = os.path.basename(patch_path)
+        diff_file = _PATCH_SUFFIX_REGEX.sub('', patch_path)
         diff_cnt = 0
         diff_buggy_lines = []
         diff_orig_lines = []
         removed_lines = []
 
-        for line in patch_lines:
-            if line.startswith('@@'):
+        line_cache: Dict[str, List[str]] = {}
+        for line in lines:
+            # Dispatch on the first character; only '@@' needs a second look
+            tag = line[:1]
+            if tag == '@' and line[1:2] == '@':
                 if diff_buggy_lines:
                     self._add_patch_from_diff(
                         patch_filename, diff_file, diff_cnt,
@@ -144,23 +266,20 @@ class PatchLoader:
                     diff_orig_lines.clear()
 
                 if removed_lines:
-                    for removed in removed_lines:
-                        removed_norm = self._normalize(removed, file_type).split()
-                        self._only_removed.append(removed_norm)
+                    self._only_removed.extend(self._normalize_lines(removed_lines, file_type, line_cache))
                     removed_lines.clear()
 
                 diff_cnt += 1
 
-            elif line.startswith('-'):
-                diff_buggy_lines.append(line[1:])
-                diff_orig_lines.append('<font color="#AA0000">')
-                diff_orig_lines.append(line.replace('<', '&lt;').replace('>', '&gt;'))
-                diff_orig_lines.append('</font>')
-                removed_lines.append(line[1:])
+            elif tag == '-':
+                body = line[1:]
+                diff_buggy_lines.append(body)
+                diff_orig_lines.append(f'<font color="#AA0000">{line.translate(_HTML_ESCAPE_TABLE)}</font>')
+                removed_lines.append(body)
 
-            elif line.startswith(' '):
+            elif tag == ' ':
                 diff_buggy_lines.append(line[1:])
-                diff_orig_lines.append(line.replace('<', '&lt;').replace('>', '&gt;'))
+                diff_orig_lines.append(line.translate(_HTML_ESCAPE_TABLE))
 
         # Process final diff hunk if any
         if diff_buggy_lines:
@@ -170,29 +289,32 @@ class PatchLoader:
             )
 
             if removed_lines:
-                for removed in removed_lines:
-                    removed_norm = self._normalize(removed, file_type).split()
-                    self._only_removed.append(removed_norm)
+                self._only_removed.extend(self._normalize_lines(removed_lines, file_type, line_cache))
 
-    def _process_patch(self, patch_path: str, file_type: int) -> None:
+    def _process_patch(self, patch_path: str, file_type: int, lines: Optional[Iterable[str]] = None) -> None:
         """Process a 'patch' file (added lines).
 
         Args:
             patch_path: Path to the patch file.
             file_type: File extension type index.
+            lines: Lines of the file when already read; streamed from patch_path otherwise.
         """
-        patch_filename = os.path.basename(patch_path)
-        with open(patch_path, 'r') as f:
-            patch_lines = f.readlines()
+        if lines is None:
+            with open(patch_path, 'r') as f:
+                return self._process_patch(patch_path, file_type, f)
 
-        diff_file = re.sub(r'\.patch$', '', patch_path)
+        patch_filename = os.path.basename(patch_path)
+        diff_file = _PATCH_SUFFIX_REGEX.sub('', patch_path)
         diff_cnt = 0
         diff_patch_lines = []
         diff_orig_lines = []
         added_lines = []
 
-        for line in patch_lines:
-            if line.startswith('@@'):
+        line_cache: Dict[str, List[str]] = {}
+        for line in lines:
+            # Dispatch on the first character; only '@@' needs a second look
+            tag = line[:1]
+            if tag == '@' and line[1:2] == '@':
                 if diff_patch_lines:
                     self._add_patch_from_diff(
                         patch_filename, diff_file, diff_cnt,
@@ -202,23 +324,20 @@ class PatchLoader:
                     diff_orig_lines.clear()
 
                 if added_lines:
-                    for added in added_lines:
-                        added_norm = self._normalize(added, file_type).split()
-                        self._only_added.append(added_norm)
+                    self._only_added.extend(self._normalize_lines(added_lines, file_type, line_cache))
                     added_lines.clear()
 
                 diff_cnt += 1
 
-            elif line.startswith('+'):
-                diff_patch_lines.append(line[1:])
-                diff_orig_lines.append('<font color="#00AA00">')
-                diff_orig_lines.append(line.replace('<', '&lt;').replace('>', '&gt;'))
-                diff_orig_lines.append('</font>')
-                added_lines.append(line[1:])
+            elif tag == '+':
+                body = line[1:]
+                diff_patch_lines.append(body)
+                diff_orig_lines.append(f'<font color="#00AA00">{line.translate(_HTML_ESCAPE_TABLE)}</font>')
+                added_lines.append(body)
 
-            elif line.startswith(' '):
+            elif tag == ' ':
                 diff_patch_lines.append(line[1:])
-                diff_orig_lines.append(line.replace('<', '&lt;').replace('>', '&gt;'))
+                diff_orig_lines.append(line.translate(_HTML_ESCAPE_TABLE))
 
         # Process final diff hunk if any
         if diff_patch_lines:
@@ -228,9 +347,7 @@ class PatchLoader:
             )
 
             if added_lines:
-                for added in added_lines:
-                    added_norm = self._normalize(added, file_type).split()
-                    self._only_added.append(added_norm)
+                self._only_added.extend(self._normalize_lines(added_lines, file_type, line_cache))
 
     def _normalize(self, patch: str, file_ext: int) -> str:
         """Normalize patch content by removing comments and collapsing whitespace.
@@ -244,37 +361,62 @@ class PatchLoader:
         """
         source = patch.lower()
         source = helpers.remove_comment(source, file_ext)
-        source = re.sub(common.WHITESPACE_REGEX, ' ', source).strip()
+        source = common.WHITESPACE_REGEX.sub(' ', source).strip()
         return source
 
-    def _build_hash_list(self, diff_norm_lines: List[str]) -> Tuple[List[int], List[Tuple[str, List[int]]]]:
-        """Build n-gram hash list from normalized diff lines.
+    def _normalize_lines(
+        self, lines: List[str], file_ext: int, line_cache: Optional[Dict[str, List[str]]] = None
+    ) -> List[List[str]]:
+        """Normalize and tokenize each added/removed line.
+
+        Comments are removed line by line, so a comment opener on one line
+        never swallows the next.
 
         Args:
-            diff_norm_lines: Normalized lines split by whitespace.
+            lines: Raw diff lines without their +/- prefix.
+            file_ext: File extension type index.
+            line_cache: Token lists of lines seen earlier in the same file;
+                only lines missing from it are normalized, and repeated lines
+                share one token list.
 
         Returns:
-            Tuple of (hash_list, patch_hashes) where hash_list contains hashes
-            and patch_hashes contains (original_ngram, hash_list) tuples.
+            One token list per line, equal to `self._normalize(line, file_ext).split()`.
         """
-        hash_list = []
-        patch_hashes = []
+        if line_cache is not None:
+            missing = [line for line in dict.fromkeys(lines) if line not in line_cache]
+            if len(line_cache) + len(missing) > LINE_CACHE_SIZE:
+                line_cache.clear()
+                missing = list(dict.fromkeys(lines))
+            if missing:
+                line_cache.update(zip(missing, self._normalize_lines(missing, file_ext)))
+            return [line_cache[line] for line in lines]
+
+        return [helpers.remove_comment(line.lower(), file_ext).split() for line in lines]
+
+    def _build_hash_list(
+        self, diff_norm_lines: List[str], ngram_size: Optional[int] = None
+    ) -> Tuple[array, List[Tuple[str, List[int]]]]:
+        """Build n-gram hash list from normalized diff lines.
 
-        for i in range(len(diff_norm_lines) - common.ngram_size + 1):
-            ngram = ' '.join(diff_norm_lines[i:i + common.ngram_size])
-            fnv1a = common.fnv1a_hash(ngram)
-            djb2 = common.djb2_hash(ngram)
-            sdbm = common.sdbm_hash(ngram)
+        Args:
+            diff_norm_lines: Normalized lines split by whitespace.
+            ngram_size: Tokens per n-gram; defaults to `common.ngram_size`.
 
-            hash_list.append(fnv1a)
-            hash_list.append(djb2)
-            hash_list.append(sdbm)
-            patch_hashes.append((ngram, [fnv1a, djb2, sdbm]))
+        Returns:
+            Tuple of (hash_list, patch_hashes) where hash_list is a flat
+            unsigned 64-bit array of three hashes per n-gram and patch_hashes
+            contains (original_ngram, hash_list) tuples.
+        """
+        if ngram_size is None:
+            ngram_size = common.ngram_size
 
-            self._hashes[fnv1a] = ngram
-            self._hashes[djb2] = ngram
-            self._hashes[sdbm] = ngram
+        ngram_hashes = common.rolling_ngram_hashes(diff_norm_lines, ngram_size)
+        # Interned, so n-grams repeated across hunks share one string in hashes()
+        ngrams = map(sys.intern, common.ngram_texts(diff_norm_lines, ngram_size, ' '))
+        hash_list = array('Q', chain.from_iterable(ngram_hashes))
+        patch_hashes = [(ngram, list(hash_triple)) for ngram, hash_triple in zip(ngrams, ngram_hashes)]
 
+        self._hashed_ngrams.append(patch_hashes)
         return hash_list, patch_hashes
 
     def items(self) -> List[common.PatchInfo]:
@@ -286,7 +428,11 @@ class PatchLoader:
         return len(self._patch_list)
 
     def hashes(self) -> Dict[int, str]:
-        """Get mapping of hash to ngram."""
+        """Get mapping of hash to ngram, extended with hunks hashed since the last call."""
+        hashes = self._hashes
+        for patch_hashes in self._hashed_ngrams[self._nhashed:]:
+            hashes.update((h, ngram) for ngram, hash_triple in patch_hashes for h in hash_triple)
+        self._nhashed = len(self._hashed_ngrams)
         return self._hashes
 
     def added(self) -> List[List[str]]:
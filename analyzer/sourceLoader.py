@@ -6,22 +6,73 @@ against patches.
 """
 
 import os
-import sys
 import time
-from typing import Any, Dict, List, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
 
 from . import common
 from . import helpers
 
-try:
-    import bitarray
-except ImportError as err:
-    print(err)
-    sys.exit(-1)
-
 # Magic number constants
 MIN_FILE_EXT_TYPE = 2  # Minimum supported file extension type index
 MAX_FILE_EXT_TYPE = 40  # Maximum supported file extension type index
+VALID_FILE_EXT_TYPES = frozenset(range(MIN_FILE_EXT_TYPE, MAX_FILE_EXT_TYPE))  # Supported file extension type indices
+NGRAM_CACHE_SIZE = 64  # Number of normalized sources whose n-gram hashes are memoized
+NORMALIZE_CACHE_SIZE = 64  # Number of raw sources whose normalized text is memoized
+WORD_BITS = common.BLOOM_WORD_BITS  # Bloom filter bits per packed uint64 word
+WORD_SHIFT = common.BLOOM_WORD_SHIFT  # log2(WORD_BITS): shift from bit index to word index
+
+# Deletes the characters matched by common.WHITESPACE_REGEX and lowercases
+# ASCII letters in the same pass
+_COMPACT_LOWER_TABLE = str.maketrans(
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz', '\t\x0b\x0c\r '
+)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_source(source: str, file_ext: int) -> str:
+    """Remove comments and whitespace from a source, memoized on its text.
+
+    The same source is traversed once for the buggy and once for the patched
+    hunks of a file, so its normalized form is computed only once.
+
+    Args:
+        source: The source code as a string.
+        file_ext: File extension type index.
+
+    Returns:
+        Normalized source (lowercase, no comments, minimal whitespace).
+    """
+    source_no_comments = helpers.remove_comments(source, file_ext)
+    # Remove whitespaces except newlines and lowercase ASCII in one pass
+    source_compact = source_no_comments.translate(_COMPACT_LOWER_TABLE)
+    # Non-ASCII letters still need full Unicode lowercasing
+    return source_compact if source_compact.isascii() else source_compact.lower()
+
+
+@lru_cache(maxsize=NGRAM_CACHE_SIZE)
+def _ngram_hashes(source_norm_lines: str, ngram_size: int, bloom_size: int) -> Tuple[Tuple[str, ...], np.ndarray]:
+    """Compute masked rolling hashes for every n-gram of a source.
+
+    The same normalized source is queried once per patch pair, so results are
+    memoized on the normalized text. The returned array is shared between
+    callers and must not be modified.
+
+    Args:
+        source_norm_lines: Normalized source code.
+        ngram_size: Number of tokens per n-gram.
+        bloom_size: Bloom filter size (power of two) used to mask the hashes.
+
+    Returns:
+        Tuple of (ngrams, hashes) where hashes is an (n, 3) int64 array of Bloom filter indices.
+    """
+    tokens = source_norm_lines.split()
+    hashes = np.array(common.rolling_ngram_hashes(tokens, ngram_size), dtype=np.int64).reshape(-1, 3)
+    hashes &= bloom_size - 1
+    ngrams = tuple(common.ngram_texts(tokens, ngram_size))
+    return ngrams, hashes
 
 
 class SourceLoader:
@@ -31,18 +82,29 @@ class SourceLoader:
     builds Bloom filters, and detects matches against known patches.
     """
 
-    def __init__(self) -> None:
-        """Initialize the SourceLoader with empty data structures."""
+    def __init__(self, record_source_hashes: Optional[bool] = None) -> None:
+        """Initialize the SourceLoader with empty data structures.
+
+        Args:
+            record_source_hashes: Whether to keep every source n-gram and its
+                hashes for `source_hashes()`; defaults to `common.record_source_hashes`.
+        """
+        if record_source_hashes is None:
+            record_source_hashes = common.record_source_hashes
+        self._record_source_hashes: bool = record_source_hashes
         self._patch_list: List[Any] = []
         self._npatch: int = 0
         self._source_list: List[Any] = []
         self._nsource: int = 0
         self._match_dict: Dict[int, Any] = {}
         self._nmatch: int = 0
-        self._bit_vector: bitarray.bitarray = bitarray.bitarray(common.bloomfilter_size)
-        self._results: Dict[int, Dict[str, Any]] = {}
+        self._bit_vector: np.ndarray = np.zeros(common.bloomfilter_size // WORD_BITS, dtype=np.uint64)
+        # Latest (hash_list, Bloom test result per hash) for each patch
+        self._patch_matches: Dict[int, Tuple[Any, np.ndarray]] = {}
         self._source_hashes: List[Tuple[str, List[int]]] = []
         self._patch_hashes: List[Any] = []
+        # Smallest n-gram size among the patches of the current traverse()
+        self._min_ngram_size: int = 0
 
     def traverse(self, source_path: str, patch: Any, file_ext: int) -> int:
         """Traverse source files and query against patches.
@@ -59,18 +121,22 @@ class SourceLoader:
         start_time = time.time()
         self._patch_list = patch.items()
         self._npatch = patch.length()
+        self._min_ngram_size = min((p.ngram_size for p in self._patch_list), default=0)
+        if not self._npatch:
+            # Nothing to match against, so sources are not even read
+            common.verbose_print('[+] 0 possible matches ... no patches\n')
+            return 0
 
+        is_valid_ext = file_ext in VALID_FILE_EXT_TYPES
         if os.path.isfile(source_path):
             common.verbose_print(f'  [-] {source_path}: {file_ext}')
-            if MIN_FILE_EXT_TYPE <= file_ext < MAX_FILE_EXT_TYPE:
+            if is_valid_ext:
                 self._process(source_path, file_ext)
         elif os.path.isdir(source_path):
-            for root, dirs, files in os.walk(source_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    common.verbose_print(f'  [-] {file_path}: {file_ext}')
-                    if MIN_FILE_EXT_TYPE <= file_ext < MAX_FILE_EXT_TYPE:
-                        self._process(file_path, file_ext)
+            for file_path in helpers.iter_files(source_path):
+                common.verbose_print(f'  [-] {file_path}: {file_ext}')
+                if is_valid_ext:
+                    self._process(file_path, file_ext)
 
         elapsed_time = time.time() - start_time
         common.verbose_print(f'[+] {self._nmatch} possible matches ... {elapsed_time:.1f}s\n')
@@ -86,6 +152,13 @@ class SourceLoader:
         with open(source_path, 'r') as source_file:
             source_orig_lines = source_file.read()
 
+        # Normalizing only deletes text, so a source with fewer raw tokens than
+        # the smallest n-gram cannot match; notebooks are excluded because
+        # decoding their JSON can add whitespace
+        if magic_ext != common.FileExt.ipynb and len(source_orig_lines.split()) < self._min_ngram_size:
+            common.verbose_print('Warning: source too short for n-gram analysis')
+            return
+
         source_norm_lines = self._normalize(source_orig_lines, magic_ext)
         self._query_bloomfilter(source_norm_lines, magic_ext)
 
@@ -99,11 +172,7 @@ class SourceLoader:
         Returns:
             Normalized source (lowercase, no comments, minimal whitespace).
         """
-        source_no_comments = helpers.remove_comments(source, file_ext)
-        # Remove whitespaces except newlines
-        source_compact = common.WHITESPACE_REGEX.sub("", source_no_comments)
-        # Convert to lowercase
-        return source_compact.lower()
+        return _normalize_source(source, file_ext)
 
     def _query_bloomfilter(self, source_norm_lines: str, magic_ext: int) -> None:
         """Query Bloom filter against source to find patch matches.
@@ -115,37 +184,68 @@ class SourceLoader:
             magic_ext: File extension type index.
         """
         tokens = source_norm_lines.split()
-
-        for patch_id in range(0, self._npatch):
-            if len(tokens) < common.ngram_size:
+        batch_size = int(common.bloomfilter_size / common.min_mn_ratio) + 1
+        patch_list = self._patch_list
+        npatch = self._npatch
+        record_source_hashes = self._record_source_hashes
+
+        patch_id = 0
+        while patch_id < npatch:
+            # Consecutive patches with the same n-gram size share one filter
+            ngram_size = patch_list[patch_id].ngram_size
+            run_end = patch_id + 1
+            while run_end < npatch and patch_list[run_end].ngram_size == ngram_size:
+                run_end += 1
+            run = range(patch_id, run_end)
+            patch_id = run_end
+
+            if len(tokens) < ngram_size:
                 common.verbose_print('Warning: source too short for n-gram analysis')
-                return
-
-            common.ngram_size = self._patch_list[patch_id][6]
-            self._bit_vector.setall(0)
-            num_ngram = len(tokens) - common.ngram_size + 1
-            num_ngram_processed = 0
-
-            # Build Bloom filter from n-grams
-            for i in range(0, num_ngram):
-                if num_ngram_processed > common.bloomfilter_size / common.min_mn_ratio:
-                    # Reset and re-check against old hashes
-                    self._check_bloom_match(patch_id)
-                    num_ngram_processed = 0
-                    self._bit_vector.setall(0)
-
-                ngram = ''.join(tokens[i : i + common.ngram_size])
-                hash1 = common.fnv1a_hash(ngram) & (common.bloomfilter_size - 1)
-                hash2 = common.djb2_hash(ngram) & (common.bloomfilter_size - 1)
-                hash3 = common.sdbm_hash(ngram) & (common.bloomfilter_size - 1)
-                self._bit_vector[hash1] = 1
-                self._bit_vector[hash2] = 1
-                self._bit_vector[hash3] = 1
-                num_ngram_processed += 1
-                self._source_hashes.append([ngram, [hash1, hash2, hash3]])
-
-            # Final check against patch hashes
-            self._check_patch_hashes(patch_id)
+                continue
+
+            self._bit_vector.fill(0)
+
+            # Build Bloom filter from n-grams; it is reset after every batch of
+            # batch_size n-grams, re-checking the old hashes first
+            ngrams, hashes = _ngram_hashes(source_norm_lines, ngram_size, common.bloomfilter_size)
+            for start in range(0, len(hashes), batch_size):
+                if start:
+                    for run_patch_id in run:
+                        self._check_bloom_match(run_patch_id)
+                    self._bit_vector.fill(0)
+                self._set_bits(hashes[start:start + batch_size].ravel())
+
+            if record_source_hashes:
+                source_hashes = [[ngram, hash_triple] for ngram, hash_triple in zip(ngrams, hashes.tolist())]
+            for run_patch_id in run:
+                if record_source_hashes:
+                    self._source_hashes.extend(source_hashes)
+
+                # Final check against patch hashes
+                self._check_patch_hashes(run_patch_id)
+
+    def _set_bits(self, hashes: np.ndarray) -> None:
+        """Set the Bloom filter bits for a batch of masked hashes.
+
+        Args:
+            hashes: Bloom filter indices.
+        """
+        bits = np.left_shift(np.uint64(1), (hashes & (WORD_BITS - 1)).astype(np.uint64))
+        np.bitwise_or.at(self._bit_vector, hashes >> WORD_SHIFT, bits)
+
+    def _test_bits(self, hash_list: Any) -> np.ndarray:
+        """Test Bloom filter membership for a batch of hashes.
+
+        Hashes are masked to the filter size, so unmasked patch hashes can be
+        passed directly.
+
+        Args:
+            hash_list: Sequence of hash values.
+
+        Returns:
+            Boolean array, True where the hash's bit is set.
+        """
+        return common.bloom_probe_batch(hash_list, self._bit_vector)
 
     def _check_bloom_match(self, patch_id: int) -> None:
         """Check if old patch hashes match current Bloom filter.
@@ -153,13 +253,12 @@ class SourceLoader:
         Args:
             patch_id: The patch identifier.
         """
-        hash_list_old = self._patch_list[patch_id].get('old_norm_lines', [])
-        is_match = True
-        for h in hash_list_old:
-            if not self._bit_vector[h]:
-                is_match = False
-                break
-        if is_match:
+        hash_list_old = self._patch_list[patch_id].old_norm_lines
+        # An empty probe is vacuously all set and would match every source
+        if not len(hash_list_old):
+            return
+
+        if self._test_bits(hash_list_old).all():
             if patch_id not in self._match_dict:
                 self._match_dict[patch_id] = []
             self._match_dict[patch_id].append(self._nsource)
@@ -172,23 +271,10 @@ class SourceLoader:
             patch_id: The patch identifier.
         """
         hash_list = self._patch_list[patch_id].hash_list
-        i = 0
-        seq = 0
-        for h in hash_list:
-            if i == 3:
-                i = 0
-                seq += 1
+        if not len(hash_list):
+            return
 
-            if patch_id not in self._match_dict:
-                self._match_dict[patch_id] = {}
-
-            if seq not in self._match_dict[patch_id]:
-                self._match_dict[patch_id][seq] = {}
-
-            is_match = bool(self._bit_vector[h])
-            self._results[h] = {'Match': is_match}
-            self._match_dict[patch_id][seq][h] = is_match
-            i += 1
+        self._patch_matches[patch_id] = (hash_list, self._test_bits(hash_list))
 
     def items(self) -> List[Any]:
         """Return the source list."""
@@ -199,13 +285,27 @@ class SourceLoader:
         return self._nsource
 
     def match_items(self) -> Dict[int, Any]:
-        """Return the match dictionary."""
-        return self._match_dict
+        """Return the match dictionary.
+
+        Per-hash results are kept as flat boolean arrays and expanded here
+        into ``{patch_id: {seq: {hash: matched}}}`` with three hashes per seq.
+        """
+        match_dict = dict(self._match_dict)
+        for patch_id, (hash_list, matches) in self._patch_matches.items():
+            patch_dict: Dict[int, Dict[int, bool]] = {}
+            setdefault = patch_dict.setdefault
+            for i, (h, is_match) in enumerate(zip(hash_list, matches.tolist())):
+                setdefault(i // 3, {})[h] = is_match
+            match_dict[patch_id] = patch_dict
+        return match_dict
 
     def results(self) -> Dict[int, Dict[str, Any]]:
-        """Return the results dictionary."""
-        return self._results
+        """Return the results dictionary, mapping each patch hash to its match."""
+        results: Dict[int, Dict[str, Any]] = {}
+        for hash_list, matches in self._patch_matches.values():
+            results.update({h: {'Match': is_match} for h, is_match in zip(hash_list, matches.tolist())})
+        return results
 
     def source_hashes(self) -> List[Tuple[str, List[int]]]:
-        """Return the source hashes list."""
+        """Return the source hashes list (empty unless recording was enabled)."""
         return self._source_hashes
\ No newline at end of file
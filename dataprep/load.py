@@ -1,13 +1,23 @@
 import zipfile
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def extract_zip(zip_path, extract_to):
+# Maximum number of archive members extracted at once
+MAX_EXTRACT_WORKERS = 8
+
+def extract_zip(zip_path, extract_to, max_workers=MAX_EXTRACT_WORKERS):
     """
     Extracts a ZIP file to a specified folder.
 
+    Members are inflated and written on a thread pool (zlib releases the
+    GIL); each worker thread reads through its own ZipFile handle since a
+    single handle is not safe to share.
+
     Args:
     zip_path (str): The path to the ZIP file.
     extract_to (str): The directory to extract the files to.
+    max_workers (int): Maximum number of members extracted concurrently.
 
     Returns:
     None
@@ -18,6 +28,34 @@ def extract_zip(zip_path, extract_to):
 
     # Open the zip file
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        # Extract all the contents into the directory
-        zip_ref.extractall(extract_to)
-    print(f"Files extracted to {extract_to}")
\ No newline at end of file
+        members = zip_ref.infolist()
+        # Create directory entries up front so workers only write files
+        for member in members:
+            if member.is_dir():
+                zip_ref.extract(member, extract_to)
+
+    files = [member for member in members if not member.is_dir()]
+    if files:
+        local = threading.local()
+        handles = []
+        handles_lock = threading.Lock()
+
+        def _extract(member):
+            zip_file = getattr(local, 'zip_file', None)
+            if zip_file is None:
+                zip_file = local.zip_file = zipfile.ZipFile(zip_path, 'r')
+                with handles_lock:
+                    handles.append(zip_file)
+            try:
+                zip_file.extract(member, extract_to)
+            except FileExistsError:
+                # Another worker created the same parent directory first
+                zip_file.extract(member, extract_to)
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+                list(executor.map(_extract, files))
+        finally:
+            for zip_file in handles:
+                zip_file.close()
+    print(f"Files extracted to {extract_to}")
@@ -0,0 +1,16 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connection pool sizing for api.github.com
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 100
+
+def create_session():
+    # Shared session so requests reuse keep-alive TLS connections; transient
+    # gateway errors are retried with exponential backoff
+    session = requests.Session()
+    retries = Retry(total=5, backoff_factor=1, status_forcelist=[502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retries)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+@dataclass(slots=True)
+class PullRequest:
+    """A pull request sharing ChatGPT conversations.
+
+    Kept as a slotted record while collecting; `to_dict()` gives the
+    output JSON layout.
+    """
+    url: str
+    author: Optional[str]
+    repo_name: str
+    number: int
+    title: str
+    body: Optional[str]
+    created_at: str
+    closed_at: Optional[str]
+    merged_at: Optional[str]
+    updated_at: str
+    state: str
+    chatgpt_sharing: List[Any]
+
+    def _head(self):
+        return {
+            "Type": "pull request",
+            "URL": self.url,
+            "Author": self.author,
+            "RepoName": self.repo_name,
+            "Number": self.number,
+            "Title": self.title,
+            "Body": self.body,
+            "CreatedAt": self.created_at,
+            "ClosedAt": self.closed_at,
+            "MergedAt": self.merged_at,
+            "UpdatedAt": self.updated_at,
+            "State": self.state,
+        }
+
+    def to_dict(self):
+        result = self._head()
+        result["ChatgptSharing"] = self.chatgpt_sharing
+        return result
+
+@dataclass(slots=True)
+class PullRequestDetail(PullRequest):
+    """A pull request with the change statistics of the PR API."""
+    additions: Optional[int]
+    deletions: Optional[int]
+    changed_files: Optional[int]
+    commits_total_count: Optional[int]
+
+    def to_dict(self):
+        result = self._head()
+        result["Additions"] = self.additions
+        result["Deletions"] = self.deletions
+        result["ChangedFiles"] = self.changed_files
+        result["CommitsTotalCount"] = self.commits_total_count
+        result["ChatgptSharing"] = self.chatgpt_sharing
+        return result
@@ -0,0 +1,53 @@
+import threading
+import time
+from pathlib import Path
+
+# GitHub's documented limit for an authenticated token
+REQUESTS_PER_HOUR = 5000
+
+class TokenBucket:
+    """Client-side rate limiter for one GitHub token.
+
+    Holds up to `capacity` requests and refills continuously at
+    `refill_rate` requests per second, so requests are spread out before
+    GitHub has to answer with a 403.
+    """
+
+    def __init__(self, capacity=REQUESTS_PER_HOUR, refill_rate=REQUESTS_PER_HOUR / 3600):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def headroom(self):
+        # Requests currently available without waiting
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+    def acquire(self):
+        # Take one request, sleeping until the bucket has refilled enough
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.refill_rate
+            time.sleep(wait)
+
+def acquire_token(buckets):
+    # Pick the token with the most headroom and take one request from it
+    token = max(buckets, key=lambda t: buckets[t].headroom())
+    buckets[token].acquire()
+    return token
+
+def load_tokens(token_file):
+    # One GitHub token per line; blank lines are ignored
+    return [token for token in Path(token_file).read_text().splitlines() if token]
@@ -2,13 +2,49 @@ import requests
 import time
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-def token_generator(tokens):
+from _http import create_session
+from _models import PullRequest
+from _tokens import TokenBucket, acquire_token, load_tokens
 
-    # Define a generator function to yield tokens one at a time
-    for token in tokens:
-        yield token
+try:
+    import ijson
+except ImportError:
+    # ijson is optional; search pages are parsed whole without it
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; output falls back to the stdlib encoder
+    orjson = None
+
+# Maximum number of PR comment pages fetched at once
+MAX_COMMENT_WORKERS = 10
+
+# The search API returns at most 1000 results, i.e. 10 pages of 100
+MAX_SEARCH_PAGES = 10
+
+# Regular expression pattern to match shared links
+SHARE_REGEX = re.compile(r"https://chat\.openai\.com/share/[a-zA-Z0-9-]{36}")
+
+# Literal every shared link contains; texts without it skip the regex scan
+SHARE_LITERAL = "chat.openai.com/share/"
+
+def fetch_comments(session, comments_url, buckets, headers_by_token):
+    # Fetch the review comments of one PR; returns the parsed list, or the
+    # exception raised so the caller can report it in order
+    try:
+        token = acquire_token(buckets)
+        res = session.get(comments_url, headers=headers_by_token[token])
+        # Raise an exception for other HTTP errors
+        res.raise_for_status()
+        # Parse the JSON response
+        return res.json()
+    except Exception as e:
+        return e
 
 def search_pull_requests(keyword, github_token, since=None):
 
@@ -21,155 +57,154 @@ def search_pull_requests(keyword, github_token, since=None):
     
     print(url)
     
-    # Regular expression pattern to match shared links
-    pattern = r"https:\/\/chat\.openai\.com\/share\/[a-zA-Z0-9-]{36}"
-    
+    # One rate limiter per token; requests go to the token with most headroom
+    buckets = {token: TokenBucket() for token in github_token}
+    # Request headers are fixed per token, so build them once
+    headers_by_token = {
+        token: {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+        for token in github_token
+    }
+
+    session = create_session()
+
     merged_prs = []
     pull_requests = []
     result={}
-    while True:
-        try:
-            token_iter = token_generator(github_token)
-            token = next(token_iter)
-            headers = {
-                "Authorization": f"token {token}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-            params = {
-                "per_page": per_page
-            }
-            # Make a GET request to the GitHub search API
-            response = requests.get(url, headers=headers, params=params)
-            # print(response.json())
+    # Pages are requested by number instead of following the Link header
+    params = {
+        "per_page": per_page,
+        "page": 1
+    }
+    try:
+        while True:
+            try:
+                token = acquire_token(buckets)
+                headers = headers_by_token[token]
+                # Make a GET request to the GitHub search API
+                response = session.get(url, headers=headers, params=params, stream=ijson is not None)
             
-            # Check if the response status code indicates rate limiting
-            if response.status_code == 403 and 'X-RateLimit-Remaining' in response.headers:
-                # Extract rate limit information from response headers
-                limit = int(response.headers['X-RateLimit-Limit'])
-                remaining = int(response.headers['X-RateLimit-Remaining'])
-                reset_time = int(response.headers['X-RateLimit-Reset'])
-                time_to_reset = reset_time - int(time.time())
+                # Check if the response status code indicates rate limiting
+                if response.status_code == 403 and 'X-RateLimit-Remaining' in response.headers:
+                    # Extract rate limit information from response headers
+                    limit = int(response.headers['X-RateLimit-Limit'])
+                    remaining = int(response.headers['X-RateLimit-Remaining'])
+                    reset_time = int(response.headers['X-RateLimit-Reset'])
+                    time_to_reset = reset_time - int(time.time())
                 
-                # If rate limit exceeded, wait until reset time and retry
-                if remaining == 0:
-                    print(f"Rate limit exceeded. Waiting {time_to_reset} seconds until reset...")
-                    time.sleep(time_to_reset)
-                    continue
+                    # If rate limit exceeded, wait until reset time and retry
+                    if remaining == 0:
+                        print(f"Rate limit exceeded. Waiting {time_to_reset} seconds until reset...")
+                        response.close()
+                        time.sleep(time_to_reset)
+                        continue
                 
-            # Raise an exception for other HTTP errors
-            response.raise_for_status()
-            
-            # Parse the JSON response
-            data = response.json()
+                # Raise an exception for other HTTP errors
+                response.raise_for_status()
             
-            # Extract relevant information about the pull requests
-            # result = {}
-            # pull_requests = []
-
-            for item in data.get('items', []):
-                print(f"\t {item.get('html_url')}")
-                body_text = item.get('body')
-                matches = []
-                if body_text:
-                    # Apply the regular expression to identify matches
-                    match = re.findall(pattern, body_text)
-                    # print(item.get('html_url'))
-                    # continue
-                    matches.extend(match)
-
-                # # search PR review comments for 
-                # print("\t\t process pr comments")
-                # # while True:
-                # # header_two = {
-                # #             "Authorization": f"token {token}"
-                # #             }
-                try:
-                    token = next(token_iter)
-                    comments_url = f"{item.get('pull_request').get('url')}/comments?per_page=100"
-                    res = requests.get(comments_url, headers=headers)
+                # Parse the JSON response, streaming the items out of the body
+                # instead of decoding the whole page object first
+                if ijson is not None:
+                    response.raw.decode_content = True
+                    items = list(ijson.items(response.raw, 'items.item', use_float=True))
+                else:
+                    items = response.json().get('items', [])
+
+                # Fetch the review comments of every PR on the page concurrently
+                comments_urls = [f"{item.get('pull_request').get('url')}/comments?per_page=100" for item in items]
+                with ThreadPoolExecutor(max_workers=MAX_COMMENT_WORKERS) as executor:
+                    comments_results = list(executor.map(lambda u: fetch_comments(session, u, buckets, headers_by_token), comments_urls))
+
+                for item, comments_url, comments_data in zip(items, comments_urls, comments_results):
+                    # Bind the nested objects once per item
+                    pr_sub = item.get('pull_request') or {}
+                    user = item.get('user') or {}
+                    html_url = item.get('html_url')
+                    merged_at = pr_sub.get('merged_at')
+                    print(f"\t {html_url}")
+                    body_text = item.get('body')
+                    matches = []
+                    if body_text and SHARE_LITERAL in body_text:
+                        # Apply the regular expression to identify matches
+                        match = SHARE_REGEX.findall(body_text)
+                        matches.extend(match)
+
+                    # search PR review comments for shared links
                     print(f"\t\t {comments_url}")
-                    # Raise an exception for other HTTP errors
-                    res.raise_for_status()
-                    # Parse the JSON response
-                    comments_data = res.json()
-                    if len(comments_data) == 0:
-                        continue
-                    for element in comments_data:
-                        if not element.get('body'):
+                    if isinstance(comments_data, Exception):
+                        print("Error while fetching PR comments: ", comments_data)
+                    else:
+                        if len(comments_data) == 0:
                             continue
-                        comment_body = element.get('body')
-                        mt = re.findall(pattern, comment_body)
-                        matches.extend(mt)
-                        # print(matches)
-                except Exception as e:
-                    print("Iterated over all tokens. Recreating generator and starting again.")
-                    token_iter = token_generator(github_token)  # Recreate the token generator
-                # Check if there are more pages of results
-                # if 'next' in res.links:
-                #     comments_url  = res.links['next']['url']  # Get the URL of the next page
-                # else:
-                #     print("\t\t DONE processing pr comments")
-                #     break  # No more pages, exit the loop
-
-                if item.get('pull_request').get('merged_at') is None:
-                    state = item.get('state').upper() 
-                else:
-                    state = "MERGED"
-                    merged_prs.append(item.get('html_url'))         
-
-                pull_request = {
-                    "Type": "pull request",
-                    "URL": item.get('html_url'),
-                    "Author": item.get('user').get('login'),
-                    "RepoName": item.get('repository_url').split('/repos/')[-1],
-                    "Number": item.get('number'),
-                    "Title": item.get('title'),
-                    "Body": body_text,
-                    "CreatedAt": item.get('created_at'),
-                    "ClosedAt": item.get('closed_at'),
-                    "MergedAt": item.get('pull_request').get('merged_at'),
-                    "UpdatedAt": item.get('updated_at'),
-                    "State": state,
-                    "ChatgptSharing": matches
-                }
-                pull_requests.append(pull_request)
-            # Check if there are more pages of results
-            if 'next' in response.links:
-                url = response.links['next']['url']  # Get the URL of the next page
-                print(url)
-            else:
-                break  # No more pages, exit the loop
-        except requests.exceptions.RequestException as e:
-            print("Error while trying to fetch GitHub data: ", e)
-            continue
-        except StopIteration:
-            print("Iterated over all tokens. Recreating generator and starting again.")
-            token_iter = token_generator(github_token)  # Recreate the token generator
-        
-        result["Sources"] = pull_requests
+                        for element in comments_data:
+                            if not element.get('body'):
+                                continue
+                            comment_body = element.get('body')
+                            if SHARE_LITERAL not in comment_body:
+                                continue
+                            mt = SHARE_REGEX.findall(comment_body)
+                            matches.extend(mt)
+
+                    if merged_at is None:
+                        state = item.get('state').upper() 
+                    else:
+                        state = "MERGED"
+                        merged_prs.append(html_url)         
+
+                    pull_request = PullRequest(
+                        url=html_url,
+                        author=user.get('login'),
+                        repo_name=item.get('repository_url').split('/repos/')[-1],
+                        number=item.get('number'),
+                        title=item.get('title'),
+                        body=body_text,
+                        created_at=item.get('created_at'),
+                        closed_at=item.get('closed_at'),
+                        merged_at=merged_at,
+                        updated_at=item.get('updated_at'),
+                        state=state,
+                        chatgpt_sharing=matches
+                    )
+                    pull_requests.append(pull_request)
+                # A short page is the last one; the search API stops after MAX_SEARCH_PAGES
+                if len(items) < per_page or params["page"] >= MAX_SEARCH_PAGES:
+                    break  # No more pages, exit the loop
+                params["page"] += 1
+                print(f"{url}&page={params['page']}")
+            except requests.exceptions.RequestException as e:
+                print("Error while trying to fetch GitHub data: ", e)
+                continue
+
+        result["Sources"] = [pull_request.to_dict() for pull_request in pull_requests]
+    finally:
+        session.close()
     return result, merged_prs
 
 
-#"""
- #   Read from list
-#"""
-token_file = 'tokens.txt'
-token_file = '../../../../PaReco/tokens.txt'
+def main():
+    #"""
+    #   Read from list
+    #"""
+    token_file = 'tokens.txt'
+    token_file = '../../../../PaReco/tokens.txt'
 
-token_list = []
-with open(token_file, 'r') as f:
-    for line in f.readlines():
-        token_list.append(line.strip('\n'))
-# print(token_list)
-        
-github_token = token_list
-# print(github_token[0])
+    github_token = load_tokens(token_file)
 
-keyword = "https://chat.openai.com/share/"
-since_date = datetime(2023,10,13)
-pull_requests, merged_prs = search_pull_requests(keyword, github_token,since_date)
+    keyword = "https://chat.openai.com/share/"
+    since_date = datetime(2023,10,13)
+    pull_requests, merged_prs = search_pull_requests(keyword, github_token,since_date)
 
-with open("merged_pr_15_02_2024.json", "w") as outfile: 
-    json.dump(merged_prs, outfile)
-    
-print("Total Merged PRs: ", len(merged_prs))
+    if orjson is not None:
+        with open("merged_pr_15_02_2024.json", "wb") as outfile:
+            outfile.write(orjson.dumps(merged_prs))
+    else:
+        with open("merged_pr_15_02_2024.json", "w") as outfile:
+            json.dump(merged_prs, outfile)
+
+    print("Total Merged PRs: ", len(merged_prs))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,156 @@
 import requests
 import json
-from bs4 import BeautifulSoup
 import re
 import pandas as pd
 import sys
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
 
+from _http import create_session
+from _models import PullRequestDetail
+from _tokens import TokenBucket, acquire_token, load_tokens
 
-def token_generator(tokens):
-    for token in tokens:
-        yield token
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; output falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    # msgspec is optional; share pages are decoded with the stdlib json module
+    msgspec = None
+
+# Regex extracting the JSON payload of the <script id="__NEXT_DATA__"> tag
+NEXT_DATA_REGEX = re.compile(rb'<script[^>]*\bid="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL)
+
+# Regex matching a fenced code block and its programming language
+CODE_BLOCK_REGEX = re.compile(r'\s*```(\w+)\n\s*(.*?)\s*```', re.DOTALL)
+
+# Maximum number of PR detail requests in flight
+MAX_PR_WORKERS = 20
+
+if msgspec is not None:
+    # Only the fields read from a share page's __NEXT_DATA__; everything else
+    # is skipped by the decoder instead of being built into dicts
+    class _Content(msgspec.Struct):
+        parts: list = []
+
+    class _Message(msgspec.Struct):
+        content: _Content
+
+    class _Entry(msgspec.Struct):
+        message: Optional[_Message] = None
+
+    class _ServerData(msgspec.Struct):
+        title: str
+        linear_conversation: List[_Entry]
+
+    class _ServerResponse(msgspec.Struct):
+        data: _ServerData
+
+    class _PageProps(msgspec.Struct):
+        serverResponse: _ServerResponse
+
+    class _Props(msgspec.Struct):
+        pageProps: _PageProps
+
+    class _NextData(msgspec.Struct):
+        props: _Props
+
+    NEXT_DATA_DECODER = msgspec.json.Decoder(_NextData)
+
+
+def parse_share_page(gpt_html):
+    # Return the title of a shared conversation and the text of its messages,
+    # skipping the first two (system) entries
+    if msgspec is not None:
+        data = NEXT_DATA_DECODER.decode(gpt_html).props.pageProps.serverResponse.data
+        return data.title, [entry.message.content.parts[0] for entry in data.linear_conversation[2:]]
+    data = json.loads(gpt_html)['props']['pageProps']['serverResponse']['data']
+    return data['title'], [entry["message"]["content"]["parts"][0] for entry in data["linear_conversation"][2:]]
+
+
+def fetch_pr(session, pr, buckets, headers_by_token):
+    # Fetch one PR's API detail; returns the parsed JSON, or the
+    # RequestException raised so the caller can report it in order
+    try:
+        token = acquire_token(buckets)
+        # Make a GET request to the GitHub search API
+        response = session.get(pr, headers=headers_by_token[token])
+        # Raise an exception for other HTTP errors
+        response.raise_for_status()
+        # Parse the JSON response
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        return e
 
     
 def scrape_html_file(github_token):
-    # Define the regex pattern to match the code block and programming language
-    extract_code = r'\s*```(\w+)\n\s*(.*?)\s*```'
-
-    data = pd.read_csv('labels_02_15_2024.csv')
-    prs = list(data['PR_API'])
-    gpt_links = list(data['ChatGPT_Link'])
-    count = 0
+    # Only the PR API URL and the shared ChatGPT link are used
+    labels = pd.read_csv(
+        'labels_02_15_2024.csv',
+        usecols=['PR_API', 'ChatGPT_Link'],
+        dtype={'PR_API': str, 'ChatGPT_Link': str}
+    )
+    rows = list(labels.itertuples(index=False, name=None))
+
+    # One rate limiter per token; requests go to the token with most headroom
+    buckets = {token: TokenBucket() for token in github_token}
+    # Request headers are fixed per token, so build them once
+    headers_by_token = {token: {"Authorization": f"token {token}"} for token in github_token}
     
+    session = create_session()
+
     pull_requests = []
     result={}
-    for pr in prs:
-        sharing = {}
-        conversations = []
-
-        count = count + 1
-        try:
-            token_iter = token_generator(github_token)
-            token = next(token_iter)
-            headers = {
-                "Authorization": f"token {token}",
-            }
-            # Make a GET request to the GitHub search API
-            response = requests.get(pr, headers=headers)
-            # Raise an exception for other HTTP errors
-            response.raise_for_status()
-            # Parse the JSON response
-            data = response.json()
-            # print(data.get('state'))
-            # sys.exit()
-            # for item in data:
-            if data.get('merged_at') is None:
-                state = data.get('state').upper() 
-            else:
-                state = "MERGED"      
-            
-            # Read the HTML file
+    try:
+        # Fetch every PR's details concurrently, then process them in order
+        with ThreadPoolExecutor(max_workers=MAX_PR_WORKERS) as executor:
+            pr_details = list(executor.map(lambda row: fetch_pr(session, row[0], buckets, headers_by_token), rows))
+
+        for count, ((pr, gpt_link), data) in enumerate(zip(rows, pr_details), start=1):
+            sharing = {}
+            conversations = []
+
             try:
-                html_file = f'chat/{count}.html' 
-                with open(html_file, 'r', encoding='utf-8') as file:
-                    html_content = file.read()
-                # Parse the HTML content using BeautifulSoup
-                soup = BeautifulSoup(html_content, 'html.parser')
-
-                gpt_script = soup.find('script', id='__NEXT_DATA__')
-                gpt_html = gpt_script.get_text() if gpt_script else None
-                if gpt_html:
-                    gpt_data = json.loads(gpt_html)
-                    server_response = gpt_data['props']['pageProps']['serverResponse']
-
-                    # model_slug = server_response['data']['model']['slug']
-                    title = server_response['data']['title']
+                if isinstance(data, Exception):
+                    raise data
+                # Bind the fields used more than once
+                html_url = data.get('html_url')
+                merged_at = data.get('merged_at')
+                user = data.get('user') or {}
+                if merged_at is None:
+                    state = data.get('state').upper() 
+                else:
+                    state = "MERGED"      
+            
+                # Read the HTML file
+                try:
+                    html_file = f'chat/{count}.html' 
+                    with open(html_file, 'rb') as file:
+                        html_content = file.read()
+                    # Pull the __NEXT_DATA__ JSON out directly instead of parsing the whole page
+                    gpt_script = NEXT_DATA_REGEX.search(html_content)
+                    gpt_html = gpt_script.group(1) if gpt_script else None
+                    if gpt_html:
+                        # model_slug = server_response['data']['model']['slug']
+                        title, parts = parse_share_page(gpt_html)
                     
-                    sharing['Title'] = title
-                    sharing['URL'] = gpt_links[count-1]
-                    sharing['Status'] = 200
+                        sharing['Title'] = title
+                        sharing['URL'] = gpt_link
+                        sharing['Status'] = 200
 
-                    temp = {}
-                    for index, message in enumerate(server_response["data"]["linear_conversation"]):
-                        if index > 1:
+                        temp = {}
+                        for index, part in enumerate(parts, start=2):
                             if index % 2 == 0:
-                                # prompt = message["message"]["content"]["parts"][0]
-                                # print(f'Prompt: {message["message"]["content"]["parts"][0]}')
-                                temp['Prompt'] = message["message"]["content"]["parts"][0]
+                                # print(f'Prompt: {part}')
+                                temp['Prompt'] = part
                             else:
-                                # answer = message["message"]["content"]["parts"][0]
-                                # print(f'Answer: {message["message"]["content"]["parts"][0]}')
+                                # print(f'Answer: {part}')
                                 # Find all matches in the text
-                                matches = re.findall(extract_code, message["message"]["content"]["parts"][0], re.DOTALL)
+                                matches = CODE_BLOCK_REGEX.findall(part)
                                 ListOfCode = []
                                 if matches:
                                     for match in matches:
@@ -89,7 +160,7 @@ def scrape_html_file(github_token):
                                             "Content": code.strip()
                                         }
                                         ListOfCode.append(coded)
-                                temp['Answer'] = message["message"]["content"]["parts"][0]
+                                temp['Answer'] = part
                                 temp['ListOfCode'] = ListOfCode
 
                                 conversations.append(temp)
@@ -97,61 +168,62 @@ def scrape_html_file(github_token):
                                 print(f"ListOfCode: {ListOfCode}")
                                 print("\n........................................\n")
                                 temp = {}
-                sharing['Conversations'] = conversations
-            except Exception as e:
-                # If chat gpt link is 404, skip the PR
-                print(e)
+                    sharing['Conversations'] = conversations
+                except Exception as e:
+                    # If chat gpt link is 404, skip the PR
+                    print(e)
+                    continue
+
+                temp_sharing = []
+                temp_sharing.append(sharing)
+                pull_request = PullRequestDetail(
+                    url=html_url,
+                    author=user.get('login'),
+                    repo_name=html_url.split('/')[-4],
+                    number=data.get('number'),
+                    title=data.get('title'),
+                    body=data.get('body'),
+                    created_at=data.get('created_at'),
+                    closed_at=data.get('closed_at'),
+                    merged_at=merged_at,
+                    updated_at=data.get('updated_at'),
+                    state=state,
+                    chatgpt_sharing=temp_sharing,
+                    additions=data.get('additions'),
+                    deletions=data.get('deletions'),
+                    changed_files=data.get('changed_files'),
+                    commits_total_count=data.get('commits')
+                )
+                pull_requests.append(pull_request)
+
+            except requests.exceptions.RequestException as e:
+                print("Error while trying to fetch GitHub data: ", e)
                 continue
+    finally:
+        session.close()
 
-            temp_sharing = []
-            temp_sharing.append(sharing)
-            pull_request = {
-                "Type": "pull request",
-                "URL": data.get('html_url'),
-                "Author": data.get('user').get('login'),
-                "RepoName": data.get('html_url').split('/')[-4],
-                "Number": data.get('number'),
-                "Title": data.get('title'),
-                "Body": data.get('body'),
-                "CreatedAt": data.get('created_at'),
-                "ClosedAt": data.get('closed_at'),
-                "MergedAt": data.get('merged_at'),
-                "UpdatedAt": data.get('updated_at'),
-                "State": state,
-                "Additions": data.get('additions'),
-                "Deletions": data.get('deletions'),
-                "ChangedFiles": data.get('changed_files'),
-                "CommitsTotalCount": data.get('commits'),
-                "ChatgptSharing": temp_sharing
-            }
-            pull_requests.append(pull_request)
-
-        except requests.exceptions.RequestException as e:
-            print("Error while trying to fetch GitHub data: ", e)
-            continue
-        except StopIteration:
-            print("Iterated over all tokens. Recreating generator and starting again.")
-            token_iter = token_generator(github_token)  # Recreate the token generator
-
-    # print(len(prs)
-    result["Sources"] = pull_requests
+    # print(len(rows)
+    result["Sources"] = [pull_request.to_dict() for pull_request in pull_requests]
     return result
 
-#"""
- #   Read from list
-#"""
-token_file = 'tokens.txt'
-token_file = '../../../../../PaReco/tokens.txt'
-
-token_list = []
-with open(token_file, 'r') as f:
-    for line in f.readlines():
-        token_list.append(line.strip('\n'))
-# print(token_list)
-        
-github_token = token_list
-
-pull_requests = scrape_html_file(github_token)
-# Convert and write JSON object to file
-with open("complete/02_18_2024_manual_pr_sharing.json", "w") as outfile: 
-    json.dump(pull_requests, outfile)
\ No newline at end of file
+def main():
+    #"""
+    #   Read from list
+    #"""
+    token_file = 'tokens.txt'
+    token_file = '../../../../../PaReco/tokens.txt'
+
+    github_token = load_tokens(token_file)
+
+    pull_requests = scrape_html_file(github_token)
+    # Convert and write JSON object to file
+    if orjson is not None:
+        with open("complete/02_18_2024_manual_pr_sharing.json", "wb") as outfile:
+            outfile.write(orjson.dumps(pull_requests))
+    else:
+        with open("complete/02_18_2024_manual_pr_sharing.json", "w") as outfile:
+            json.dump(pull_requests, outfile)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import datetime
 
+# Year substituted for the {year} placeholder; computed once per process
+_CURRENT_YEAR = str(datetime.date.today().year)
+
 def on_config(config):
     # Replace the placeholder {year} with the current year
-    if config.copyright:
-        config.copyright = config.copyright.replace("{year}", str(datetime.date.today().year))
-    return config
\ No newline at end of file
+    if config.copyright and "{year}" in config.copyright:
+        config.copyright = config.copyright.replace("{year}", _CURRENT_YEAR)
+    return config
@@ -6,6 +6,34 @@ import os
 from pathlib import Path
 
 
+# Templates for the multi-file fixtures, formatted per file index
+PATCH_TEMPLATE = """--- a/file{i}.py
++++ b/file{i}.py
+@@ -1,5 +1,6 @@
+ def func{i}():
+     x = {i}
+-    return x
++    return x * 2
++    return x * 3
+"""
+
+SOURCE_TEMPLATE = """# Source file {i}
+def func{i}():
+    x = {i}
+    return x * 2
+"""
+
+
+def _write_files(directory, files):
+    """Write {name: text} into directory with raw os.open/os.write calls."""
+    for name, content in files.items():
+        fd = os.open(os.path.join(directory, name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, content.encode())
+        finally:
+            os.close(fd)
+
+
 @pytest.fixture
 def temp_dir():
     """Provide a temporary directory for test files."""
@@ -13,6 +41,14 @@ def temp_dir():
         yield tmpdir
 
 
+@pytest.fixture
+def diff_buffer():
+    """Encode diff text for PatchLoader.traverse_buffer."""
+    def _make(diff_content):
+        return diff_content.encode("utf-8")
+    return _make
+
+
 @pytest.fixture
 def sample_patch_file(temp_dir):
     """Create a sample unified diff patch file for testing."""
@@ -55,45 +91,29 @@ def world():
     return source_path
 
 
-@pytest.fixture
-def sample_patch_directory(temp_dir):
-    """Create a directory with multiple patch files."""
-    patch_dir = os.path.join(temp_dir, "patches")
-    os.makedirs(patch_dir, exist_ok=True)
-    
+@pytest.fixture(scope="session")
+def sample_patch_directory(tmp_path_factory):
+    """Create a directory with multiple patch files, shared by the whole session.
+
+    Tests must not modify it.
+    """
+    patch_dir = tmp_path_factory.mktemp("patches")
+
     # Create multiple patch files
-    for i in range(3):
-        patch_content = f"""--- a/file{i}.py
-+++ b/file{i}.py
-@@ -1,5 +1,6 @@
- def func{i}():
-     x = {i}
--    return x
-+    return x * 2
-+    return x * 3
-"""
-        patch_path = os.path.join(patch_dir, f"patch{i}.patch")
-        with open(patch_path, "w") as f:
-            f.write(patch_content)
-    
-    return patch_dir
+    _write_files(patch_dir, {f"patch{i}.patch": PATCH_TEMPLATE.format(i=i) for i in range(3)})
 
+    return str(patch_dir)
+
+
+@pytest.fixture(scope="session")
+def sample_source_directory(tmp_path_factory):
+    """Create a directory with multiple source files, shared by the whole session.
+
+    Tests must not modify it.
+    """
+    src_dir = tmp_path_factory.mktemp("src")
 
-@pytest.fixture
-def sample_source_directory(temp_dir):
-    """Create a directory with multiple source files."""
-    src_dir = os.path.join(temp_dir, "src")
-    os.makedirs(src_dir, exist_ok=True)
-    
     # Create multiple source files
-    for i in range(3):
-        source_content = f"""# Source file {i}
-def func{i}():
-    x = {i}
-    return x * 2
-"""
-        src_path = os.path.join(src_dir, f"file{i}.py")
-        with open(src_path, "w") as f:
-            f.write(source_content)
-    
-    return src_dir
+    _write_files(src_dir, {f"file{i}.py": SOURCE_TEMPLATE.format(i=i) for i in range(3)})
+
+    return str(src_dir)
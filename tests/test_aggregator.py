@@ -58,6 +58,16 @@ def test_final_class_basic_and_missing_fields():
     assert pr_res['totals']['total_ERROR'] >= 1
 
 
+def test_final_class_counts_pipeline_labels():
+    items = [make_pr_item('proj', c) for c in ('NOT EXISTING', 'NE', 'OTHER EXT', 'CC', 'UNKNOWN')]
+    result_dict = [{'pr': {'fileA': {'result': items[:3]}, 'fileB': {'result': items[3:]}}}]
+    pr_res = aggregator.final_class(result_dict)[0]['pr']
+    assert pr_res['totals'] == {
+        'total_PA': 0, 'total_NE': 2, 'total_CC': 2, 'total_PN': 0, 'total_ERROR': 0
+    }
+    assert pr_res['class'] in (aggregator.CLASS_NOT_EXISTING, aggregator.CLASS_CANNOT_CLASSIFY)
+
+
 def test_count_all_classifications_counts():
     pr_classes = [
         {'p1': {'class': aggregator.CLASS_PATCH_APPLIED}},
@@ -84,3 +94,18 @@ def test_read_totals_uses_totals_dir(tmp_path, monkeypatch):
 
     loaded = aggregator.read_totals(repo_file, mainline)
     assert loaded == data
+
+
+def test_read_totals_cached_until_modified(tmp_path, monkeypatch):
+    monkeypatch.setattr(aggregator, 'TOTALS_DIR', str(tmp_path))
+    path = tmp_path / "r_owner_repo_totals.pkl"
+    with open(path, 'wb') as f:
+        pickle.dump({'v': 1}, f)
+
+    first = aggregator.read_totals('r', 'owner/repo')
+    assert aggregator.read_totals('r', 'owner/repo') is first
+
+    with open(path, 'wb') as f:
+        pickle.dump({'v': 2}, f)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000_000))
+    assert aggregator.read_totals('r', 'owner/repo') == {'v': 2}
@@ -108,8 +108,9 @@ def test_process_patch_monkeypatched(monkeypatch):
             return True
 
     class DummySource:
-        def __init__(self):
+        def __init__(self, record_source_hashes=None):
             self.traversed = False
+            self.record_source_hashes = record_source_hashes
 
         def traverse(self, dst_path, patch, file_ext):
             self.traversed = True
@@ -122,4 +123,5 @@ def test_process_patch_monkeypatched(monkeypatch):
     p, s = classifier.process_patch('patchpath', 'dstpath', 'type', 'py')
     assert isinstance(p, DummyPatch)
     assert isinstance(s, DummySource)
+    assert s.record_source_hashes is True
     assert common.ngram_size == constant.NGRAM_SIZE
@@ -8,7 +8,8 @@ Tests the common module including:
 """
 
 import pytest
-from analyzer import common
+from array import array
+from analyzer import common, constant
 
 
 class TestHashFunctions:
@@ -36,6 +37,19 @@ class TestHashFunctions:
         result = common.fnv1a_hash("")
         assert isinstance(result, int)
 
+    def test_fnv1a_hash_matches_reference(self):
+        """Test FNV-1a matches the per-code-point reference for ASCII and non-ASCII input."""
+        def reference(string):
+            hash_value = 2166136261
+            for c in string:
+                hash_value ^= ord(c)
+                hash_value = (hash_value * 16777619) & 0xFFFFFFFF
+            return hash_value
+
+        for text in ("", "a", "hello_world", "caf\u00e9", "\u20ac\u4e2d", "x" * 300):
+            common.fnv1a_hash.cache_clear()
+            assert common.fnv1a_hash(text) == reference(text)
+
     def test_fnv1a_hash_special_characters(self):
         """Test FNV-1a hash handles special characters."""
         result = common.fnv1a_hash("!@#$%^&*()")
@@ -85,6 +99,14 @@ class TestHashFunctions:
         result = common.sdbm_hash("")
         assert isinstance(result, int)
 
+    def test_hash_functions_memoized(self):
+        """Test repeated inputs are served from the hash caches."""
+        for hash_func in (common.fnv1a_hash, common.djb2_hash, common.sdbm_hash):
+            hash_func.cache_clear()
+            first = hash_func("memoized_ngram")
+            assert hash_func("memoized_ngram") == first
+            assert hash_func.cache_info().hits >= 1
+
     def test_hash_functions_produce_different_values_for_same_input(self):
         """Test that different hash functions produce different values."""
         test_str = "ngram_test"
@@ -95,6 +117,106 @@ class TestHashFunctions:
         assert not (h1 == h2 and h2 == h3)
 
 
+class TestRollingNgramHashes:
+    """Test rolling_ngram_hashes() n-gram hashing."""
+
+    def _direct(self, tokens):
+        hashes = []
+        for base, modulus in common.ROLLING_HASH_PARAMS:
+            value = 0
+            for token in tokens:
+                value = (value * base + common.fnv1a_hash(token)) % modulus
+            hashes.append(value)
+        return tuple(hashes)
+
+    def test_matches_direct_polynomial(self):
+        """Test every rolled window equals the hash computed from scratch."""
+        tokens = ['int', 'x', '=', 'foo(', 'y', ')', ';', 'x']
+        result = common.rolling_ngram_hashes(tokens, 3)
+        assert result == [self._direct(tokens[i:i + 3]) for i in range(len(tokens) - 2)]
+
+    def test_same_ngram_same_hash(self):
+        """Test equal n-grams hash equally regardless of position."""
+        result = common.rolling_ngram_hashes(['a', 'b', 'c', 'a', 'b'], 2)
+        assert result[0] == result[3]
+        assert result[0] != result[1]
+
+    def test_short_input(self):
+        """Test inputs shorter than the n-gram size produce no hashes."""
+        assert common.rolling_ngram_hashes(['a'], 2) == []
+        assert common.rolling_ngram_hashes([], 1) == []
+
+    def test_kernel_matches_python(self):
+        """Test the uint64 kernel (run uncompiled) agrees with the int path."""
+        import numpy as np
+        tokens = ['int', 'x', '=', 'foo(', 'y', ')', ';', 'x', '{', '}']
+        values = np.array([common.fnv1a_hash(t) for t in tokens], dtype=np.uint64)
+        params = np.array(common.ROLLING_HASH_PARAMS, dtype=np.uint64)
+        for n in (1, 4):
+            out = np.empty((len(tokens) - n + 1, len(params)), dtype=np.uint64)
+            common._rolling_hash_columns(values, n, params, out)
+            assert [tuple(row) for row in out.tolist()] == [self._direct(tokens[i:i + n]) for i in range(len(out))]
+
+    def test_fnv1a_kernel_matches_fnv1a_hash(self):
+        """Test the batch FNV-1a kernel (run uncompiled) agrees with fnv1a_hash."""
+        import numpy as np
+        from itertools import accumulate
+        tokens = ['int', 'x', '', 'foo(', 'caf\u00e9', '\u20ac']
+        codes = np.array([ord(c) for c in ''.join(tokens)], dtype=np.uint64)
+        offsets = np.array(list(accumulate(map(len, tokens), initial=0)), dtype=np.int64)
+        out = np.empty(len(tokens), dtype=np.uint64)
+        common._fnv1a_columns(codes, offsets, out)
+        assert out.tolist() == [common.fnv1a_hash(t) for t in tokens]
+
+    def test_fnv1a_kernel_golden_vectors(self):
+        """Test the batch kernel against fnv1a_hash on random strings."""
+        import random
+        import numpy as np
+        from itertools import accumulate
+        rng = random.Random(0)
+        tokens = [''.join(chr(rng.randrange(1, 0x3000)) for _ in range(rng.randrange(40)))
+                  for _ in range(100)]
+        codes = np.array([ord(c) for c in ''.join(tokens)], dtype=np.uint64)
+        offsets = np.array(list(accumulate(map(len, tokens), initial=0)), dtype=np.int64)
+        out = np.empty(len(tokens), dtype=np.uint64)
+        common._fnv1a_columns(codes, offsets, out)
+        assert out.tolist() == [common.fnv1a_hash(t) for t in tokens]
+
+
+class TestBloomProbeBatch:
+    """Test bloom_probe_batch() vectorized Bloom filter lookups."""
+
+    def test_bloom_probe_batch_matches_scalar(self):
+        """Test the vectorized probe agrees with a per-hash bit test."""
+        import random
+        import numpy as np
+        rng = random.Random(0)
+        size = 1024
+        bit_vector = np.zeros(size // common.BLOOM_WORD_BITS, dtype=np.uint64)
+        for index in rng.sample(range(size), 100):
+            bit_vector[index // 64] |= np.uint64(1 << (index % 64))
+        hashes = [rng.randrange(1 << 32) for _ in range(500)]
+        expected = [bool(int(bit_vector[(h % size) // 64]) >> (h % 64) & 1) for h in hashes]
+        assert common.bloom_probe_batch(hashes, bit_vector).tolist() == expected
+
+
+class TestNgramTexts:
+    """Test ngram_texts() n-gram slicing."""
+
+    @pytest.mark.parametrize('sep', ['', ' '])
+    def test_matches_join(self, sep):
+        """Test every n-gram equals joining its token window."""
+        tokens = ['int', 'x', '=', 'foo(', 'y', ')', ';']
+        for n in (1, 3, len(tokens)):
+            expected = [sep.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+            assert common.ngram_texts(tokens, n, sep) == expected
+
+    def test_short_input(self):
+        """Test inputs shorter than the n-gram size produce no n-grams."""
+        assert common.ngram_texts(['a'], 2) == []
+        assert common.ngram_texts(['a', 'b'], 0) == ['', '', '']
+
+
 class TestFileExt:
     """Test FileExt class for file type constants."""
 
@@ -112,14 +234,13 @@ class TestFileExt:
         assert isinstance(common.FileExt.JavaScript, int)
 
     def test_fileext_values_are_unique(self):
-        """Test that FileExt values are unique."""
-        fileext_dict = {
-            k: v for k, v in vars(common.FileExt).items()
-            if not k.startswith('_')
-        }
-        values = list(fileext_dict.values())
-        # Check uniqueness
-        assert len(values) == len(set(values))
+        """Test that FileExt values are unique.
+
+        FileExt is a @unique IntEnum, so duplicates would also fail at import;
+        aliases would be missing from iteration, hence the __members__ check.
+        """
+        values = [member.value for member in common.FileExt]
+        assert len(values) == len(set(values)) == len(common.FileExt.__members__)
 
     def test_fileext_python_value(self):
         """Test Python file extension constant."""
@@ -176,19 +297,20 @@ class TestNamedTuples:
             file_ext=5,
             orig_lines="print('hello')",
             norm_lines=["print", "hello"],
-            hash_list=[123, 456, 789],
+            hash_list=array('Q', [123, 456, 789]),
             patch_hashes=[("hello", [123, 456, 789])],
             ngram_size=1
         )
         assert patch.file_path == "test.py"
         assert patch.file_ext == 5
         assert patch.ngram_size == 1
+        assert patch.old_norm_lines == ()
 
     def test_patchinfo_fields(self):
         """Test PatchInfo has correct fields."""
         fields = common.PatchInfo._fields
         expected = ('file_path', 'file_ext', 'orig_lines', 'norm_lines',
-                   'hash_list', 'patch_hashes', 'ngram_size')
+                   'hash_list', 'patch_hashes', 'ngram_size', 'old_norm_lines')
         assert fields == expected
 
     def test_sourceinfo_creation(self):
@@ -267,6 +389,35 @@ class TestRegularExpressions:
         result = common.WHITESPACE_REGEX.sub('', 'a b\nc d')
         assert '\n' in result
 
+    def test_comment_markers_fastpath(self):
+        """Test the COMMENT_MARKERS fast path matches running every comment regex."""
+        from analyzer import helpers
+        samples = [
+            'int x = a / b;', 'return "a" + \'b\';', 'if (x) {', '}', 'y = 1; // note',
+            'z = 2; /* block */', 'echo "hi" # comment', 'done', '   ', '',
+            'SELECT 1 -- note', '<p>x</p> <!-- c -->', '=begin\ndoc\n=end', 'a: b',
+        ]
+        for file_ext in common.COMMENT_MARKERS:
+            steps = helpers._get_comment_patterns()[file_ext]
+            for line in samples:
+                expected = line
+                for step, regex_pattern in steps:
+                    expected = step(expected, regex_pattern)
+                assert helpers.remove_comment(line, file_ext) == expected
+
+    def test_strip_ws_matches_spaces_and_tabs(self):
+        """Test strip_ws deletes spaces and tabs."""
+        assert common.strip_ws('a   b\t\tc') == 'abc'
+
+    def test_strip_ws_preserves_newlines(self):
+        """Test strip_ws preserves newlines."""
+        assert common.strip_ws('a b\nc d') == 'ab\ncd'
+
+    def test_strip_ws_matches_whitespace_regex(self):
+        """Test strip_ws agrees with WHITESPACE_REGEX."""
+        text = ' a\x0b\x0cb \r\n\t c '
+        assert common.strip_ws(text) == common.WHITESPACE_REGEX.sub('', text)
+
 
 class TestHTMLEscapeDict:
     """Test HTML escape character mapping."""
@@ -295,6 +446,16 @@ class TestHTMLEscapeDict:
         """Test apostrophe escape mapping."""
         assert common.HTML_ESCAPE_DICT['\''] == '&apos;'
 
+    def test_html_escape_translate_matches_dict(self):
+        """Test html_escape agrees with a per-character HTML_ESCAPE_DICT lookup."""
+        import random
+        rng = random.Random(0)
+        alphabet = 'ab <>&"\'\n\u00e9'
+        for _ in range(20):
+            text = ''.join(rng.choice(alphabet) for _ in range(1024))
+            expected = ''.join(common.HTML_ESCAPE_DICT.get(c, c) for c in text)
+            assert common.html_escape(text) == expected
+
 
 class TestVerbosePrint:
     """Test verbose_print utility function."""
@@ -312,3 +473,16 @@ class TestVerbosePrint:
     def test_verbose_print_with_empty_string(self):
         """Test verbose_print handles empty string."""
         common.verbose_print("")
+
+    def test_set_verbose_rebinds_verbose_print(self, capsys):
+        """Test set_verbose switches verbose_print between printing and no-op."""
+        try:
+            common.set_verbose(True)
+            assert common.verbose_mode is True
+            common.verbose_print("shown")
+            common.set_verbose(False)
+            assert common.verbose_mode is False
+            common.verbose_print("hidden")
+        finally:
+            common.set_verbose(constant.VERBOSE_MODE)
+        assert capsys.readouterr().out == "shown\n"
@@ -8,6 +8,7 @@ Tests the constants module including:
 """
 
 import pytest
+from collections.abc import Mapping
 from analyzer import constant
 
 
@@ -62,11 +63,16 @@ class TestAnalysisParameters:
 class TestExtensionsMapping:
     """Test EXTENSIONS dictionary and mappings."""
 
-    def test_extensions_is_dict(self):
-        """Test EXTENSIONS is a dictionary."""
-        assert isinstance(constant.EXTENSIONS, dict)
+    def test_extensions_is_mapping(self):
+        """Test EXTENSIONS is a non-empty mapping."""
+        assert isinstance(constant.EXTENSIONS, Mapping)
         assert len(constant.EXTENSIONS) > 0
 
+    def test_extensions_is_read_only(self):
+        """Test EXTENSIONS cannot be modified by callers."""
+        with pytest.raises(TypeError):
+            constant.EXTENSIONS["python"] = "pyw"
+
     def test_python_extension(self):
         """Test Python extension mapping."""
         assert constant.EXTENSIONS.get("python") == "py"
@@ -167,22 +173,22 @@ class TestPublicAPI:
 
     def test_all_exports_github_constants(self):
         """Test GitHub URL constants are exported."""
-        assert "GITHUB_API_BASE_URL" in constant.__all__
-        assert "GITHUB_BASE_URL" in constant.__all__
-        assert "GITHUB_RAW_URL" in constant.__all__
+        assert "GITHUB_API_BASE_URL" in constant._ALL_SET
+        assert "GITHUB_BASE_URL" in constant._ALL_SET
+        assert "GITHUB_RAW_URL" in constant._ALL_SET
 
     def test_all_exports_analysis_parameters(self):
         """Test analysis parameters are exported."""
-        assert "NGRAM_SIZE" in constant.__all__
-        assert "CONTEXT_LINE" in constant.__all__
-        assert "VERBOSE_MODE" in constant.__all__
-        assert "BLOOMFILTER_SIZE" in constant.__all__
-        assert "MIN_MN_RATIO" in constant.__all__
+        assert "NGRAM_SIZE" in constant._ALL_SET
+        assert "CONTEXT_LINE" in constant._ALL_SET
+        assert "VERBOSE_MODE" in constant._ALL_SET
+        assert "BLOOMFILTER_SIZE" in constant._ALL_SET
+        assert "MIN_MN_RATIO" in constant._ALL_SET
 
     def test_all_exports_extensions_and_helper(self):
         """Test EXTENSIONS and get_extension are exported."""
-        assert "EXTENSIONS" in constant.__all__
-        assert "get_extension" in constant.__all__
+        assert "EXTENSIONS" in constant._ALL_SET
+        assert "get_extension" in constant._ALL_SET
 
     def test_all_exports_are_accessible(self):
         """Test all items in __all__ are actually accessible."""
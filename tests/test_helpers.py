@@ -9,6 +9,7 @@ Tests the helpers module including:
 
 import pytest
 import json
+import logging
 import os
 import tempfile
 from analyzer import helpers, common
@@ -100,6 +101,11 @@ class TestFileDirFunction:
         """Test file with no directory."""
         assert helpers.file_dir("file.py") == ""
 
+    def test_file_dir_root_level_path(self):
+        """Test a root-level path has an empty directory, unlike posixpath.dirname."""
+        assert helpers.file_dir("/file.py") == ""
+        assert helpers.file_name("/file.py") == "file.py"
+
     def test_file_dir_dotfile(self):
         """Test dotfile directory extraction."""
         result = helpers.file_dir(".gitignore")
@@ -170,6 +176,11 @@ class TestGetFileTypeFunction:
         """Test SQL file detection."""
         assert helpers.get_file_type("query.sql") == common.FileExt.SQL
 
+    def test_get_file_type_dotted_directory(self):
+        """Test dots in directory names do not affect detection."""
+        assert helpers.get_file_type("pkg.v2/Gemfile") == common.FileExt.GEMFILE
+        assert helpers.get_file_type("./requirements.txt") == common.FileExt.REQ_TXT
+
 
 class TestRemoveCommentPython:
     """Test remove_comment() for Python files."""
@@ -223,6 +234,28 @@ class TestRemoveCommentPython:
         except AttributeError:
             pytest.skip("PYTHON_REGEX not defined in common module")
 
+    def test_remove_comment_python_keeps_code_and_hash_in_strings(self):
+        """Test Python code and '#' inside string literals survive comment removal."""
+        source = 'x = 1  # comment\ny = "a # b"\n'
+        result = helpers.remove_comment(source, common.FileExt.Python)
+        assert result == 'x = 1  \ny = "a # b"\n'
+
+    def test_remove_comment_python_docstring_only(self):
+        """Test only statement-level strings are removed, not string values."""
+        source = 'def f():\n    """doc"""\n    return """value"""\n'
+        result = helpers.remove_comment(source, common.FileExt.Python)
+        assert result == 'def f():\n    \n    return """value"""\n'
+
+    def test_remove_comment_python_untokenizable_line(self):
+        """Test a lone line the tokenizer rejects falls back to the regexes."""
+        result = helpers.remove_comment('foo(a,', common.FileExt.Python)
+        assert result == 'foo(a,'
+
+    def test_remove_comment_python_unbalanced_fragment_keeps_code(self):
+        """Test the regex fallback strips '#' comments but keeps the code."""
+        result = helpers.remove_comment('x = foo(  # c', common.FileExt.Python)
+        assert result.split() == ['x', '=', 'foo(']
+
 
 class TestRemoveCommentJava:
     """Test remove_comment() for Java/C files."""
@@ -408,6 +441,20 @@ class TestTimingDecorator:
         result = multiply(5, y=3)
         assert result == 15
 
+    def test_timing_decorator_logs_at_debug(self, caplog):
+        """Test timing decorator logs the elapsed time only at DEBUG level."""
+        @helpers.timing
+        def noop():
+            return None
+
+        with caplog.at_level(logging.WARNING, logger=helpers.logger.name):
+            noop()
+        assert not caplog.records
+
+        with caplog.at_level(logging.DEBUG, logger=helpers.logger.name):
+            noop()
+        assert 'func: noop' in caplog.text
+
 
 class TestCountLOC:
     """Test count_loc() for line counting."""
@@ -448,6 +495,16 @@ class TestCountLOC:
         count = helpers.count_loc(file_path)
         assert count == 2
 
+    def test_count_loc_across_read_chunks(self, temp_dir, monkeypatch):
+        """Test lines spanning several read chunks are counted once."""
+        monkeypatch.setattr(helpers, "LOC_READ_CHUNK", 4)
+        file_path = os.path.join(temp_dir, "chunks.txt")
+        with open(file_path, "wb") as f:
+            f.write(b"line 1\r\nline 2\nline 3")
+
+        count = helpers.count_loc(file_path)
+        assert count == 3
+
 
 class TestPreserveNewlines:
     """Test _preserve_newlines() helper."""
@@ -483,3 +540,195 @@ class TestExtensionMapCoverage:
         """Test special files set is defined."""
         assert 'requirements.txt' in helpers._SPECIAL_FILES
         assert 'requirement.txt' in helpers._SPECIAL_FILES
+
+
+class TestConcurrentRequests:
+    """Test api_requests() concurrent wrapper."""
+
+    def test_api_requests_preserves_order(self, monkeypatch):
+        """Test responses come back in request order."""
+        monkeypatch.setattr(helpers, 'pooled_request', lambda url, pool, cache: [url, pool])
+        urls = [f'https://api.github.com/{i}' for i in range(20)]
+        result = helpers.api_requests(urls, 'pool')
+        assert result == [[url, 'pool'] for url in urls]
+
+    def test_api_requests_returns_exceptions(self, monkeypatch):
+        """Test a failing request yields its exception instead of raising."""
+        def fake(url, pool, cache):
+            if url == 'bad':
+                raise ValueError('boom')
+            return url
+        monkeypatch.setattr(helpers, 'pooled_request', fake)
+        result = helpers.api_requests(['ok', 'bad'], 'pool')
+        assert result[0] == 'ok'
+        assert isinstance(result[1], ValueError)
+
+    def test_api_requests_empty(self):
+        """Test no requests are made for an empty URL list."""
+        assert helpers.api_requests([], 'pool') == []
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b'[]', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class TestTokenPool:
+    """Test TokenPool rate-limit tracking and pooled_request() retries."""
+
+    def test_pick_best_prefers_highest_remaining(self):
+        """Test the token with the largest budget is chosen."""
+        pool = helpers.TokenPool(['a', 'b'])
+        reset = str(int(helpers.time()) + 3600)
+        pool.update('a', {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': reset})
+        pool.update('b', {'X-RateLimit-Remaining': '500', 'X-RateLimit-Reset': reset})
+        assert pool.pick_best() == 'b'
+
+    def test_update_ignores_missing_headers(self):
+        """Test responses without rate-limit headers leave the budget unknown."""
+        pool = helpers.TokenPool(['a', 'b'])
+        pool.block('b', 3600)
+        pool.update('b', {})
+        assert pool.pick_best() == 'a'
+
+    def test_acquire_waits_for_reset(self, monkeypatch):
+        """Test acquire sleeps until a budget resets when all tokens are exhausted."""
+        now = [1000.0]
+        monkeypatch.setattr(helpers, 'time', lambda: now[0])
+        slept = []
+
+        def fake_sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+        monkeypatch.setattr(helpers, 'sleep', fake_sleep)
+
+        pool = helpers.TokenPool(['a'])
+        pool.update('a', {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1030'})
+        assert pool.acquire() == 'a'
+        assert slept == [30.0]
+
+    def test_pooled_request_honors_retry_after(self, monkeypatch):
+        """Test a 403 with Retry-After moves the request to another token."""
+        used = []
+        responses = [FakeResponse(403, headers={'Retry-After': '60'}), FakeResponse(200, b'[1, 2]')]
+
+        def fake_get(url, headers):
+            used.append(headers['Authorization'])
+            return responses.pop(0)
+        monkeypatch.setattr(helpers.requests, 'get', fake_get)
+
+        pool = helpers.TokenPool(['a', 'b'])
+        assert helpers.pooled_request('url', pool) == [1, 2]
+        assert used == ['token a', 'token b']
+
+    def test_pooled_request_retry_after_http_date(self, monkeypatch):
+        """Test a Retry-After HTTP-date blocks the token until that time."""
+        monkeypatch.setattr(helpers, 'time', lambda: 784111717.0)
+        responses = [
+            FakeResponse(429, headers={'Retry-After': 'Sun, 06 Nov 1994 08:49:37 GMT'}),
+            FakeResponse(200, b'{}'),
+        ]
+        monkeypatch.setattr(helpers.requests, 'get', lambda url, headers: responses.pop(0))
+        blocked = []
+        pool = helpers.TokenPool(['a'])
+        monkeypatch.setattr(pool, 'block', lambda token, seconds: blocked.append((token, seconds)))
+
+        assert helpers.pooled_request('url', pool) == {}
+        assert blocked == [('a', 60.0)]
+
+    def test_pooled_request_unparsable_retry_after_backs_off(self, monkeypatch):
+        """Test an unparsable Retry-After falls back to exponential backoff."""
+        responses = [FakeResponse(503, headers={'Retry-After': 'soon'}), FakeResponse(200, b'{}')]
+        monkeypatch.setattr(helpers.requests, 'get', lambda url, headers: responses.pop(0))
+        slept = []
+        monkeypatch.setattr(helpers, 'sleep', slept.append)
+
+        assert helpers.pooled_request('url', helpers.TokenPool(['a'])) == {}
+        assert slept == [helpers.BACKOFF_BASE]
+
+    def test_pooled_request_backs_off_on_server_error(self, monkeypatch):
+        """Test 5xx responses are retried with exponential backoff."""
+        responses = [FakeResponse(502), FakeResponse(502), FakeResponse(200, b'{}')]
+        monkeypatch.setattr(helpers.requests, 'get', lambda url, headers: responses.pop(0))
+        slept = []
+        monkeypatch.setattr(helpers, 'sleep', slept.append)
+
+        assert helpers.pooled_request('url', helpers.TokenPool(['a'])) == {}
+        assert slept == [helpers.BACKOFF_BASE, helpers.BACKOFF_BASE * 2]
+
+    def test_pooled_request_revalidates_with_etag(self, tmp_path, monkeypatch):
+        """Test a cached URL is sent with If-None-Match and a 304 reuses the body."""
+        sent = []
+        responses = [FakeResponse(200, b'[1]', {'ETag': '"v1"'}), FakeResponse(304, b'')]
+
+        def fake_get(url, headers):
+            sent.append(headers.get('If-None-Match'))
+            return responses.pop(0)
+        monkeypatch.setattr(helpers.requests, 'get', fake_get)
+
+        cache = helpers.ResponseCache(str(tmp_path / 'cache' / 'gh.sqlite'))
+        pool = helpers.TokenPool(['a'])
+        assert helpers.pooled_request('url', pool, cache) == [1]
+        assert helpers.pooled_request('url', pool, cache) == [1]
+        assert sent == [None, '"v1"']
+        cache.close()
+
+
+class TestResponseCache:
+    """Test ResponseCache SQLite storage."""
+
+    def test_get_missing_url(self, tmp_path):
+        """Test unknown URLs are not cached."""
+        cache = helpers.ResponseCache(str(tmp_path / 'gh.sqlite'))
+        assert cache.get('url') is None
+        cache.close()
+
+    def test_set_then_get(self, tmp_path):
+        """Test stored responses persist across connections."""
+        path = str(tmp_path / 'gh.sqlite')
+        cache = helpers.ResponseCache(path)
+        cache.set('url', '"v1"', b'{}')
+        cache.close()
+        assert helpers.ResponseCache(path).get('url') == ('"v1"', b'{}')
+
+    def test_no_file_until_used(self, tmp_path):
+        """Test creating a cache does not create the database."""
+        helpers.ResponseCache(str(tmp_path / 'gh.sqlite'))
+        assert not (tmp_path / 'gh.sqlite').exists()
+
+
+class TestWriteFiles:
+    """Test write_files() concurrent writer."""
+
+    def test_writes_utf8_in_order(self, tmp_path):
+        """Test every file is written and reported as successful."""
+        files = [(str(tmp_path / f'patch-{i}.py'), f'# {i} é') for i in range(10)]
+        assert helpers.write_files(files) == [None] * 10
+        assert (tmp_path / 'patch-3.py').read_bytes() == '# 3 é'.encode('utf-8')
+
+    def test_reports_failures(self, tmp_path):
+        """Test a failed write yields its exception without stopping the rest."""
+        files = [(str(tmp_path / 'missing' / 'a.py'), 'x'), (str(tmp_path / 'b.py'), 'y')]
+        errors = helpers.write_files(files)
+        assert isinstance(errors[0], OSError)
+        assert errors[1] is None
+        assert (tmp_path / 'b.py').read_text() == 'y'
+
+
+class TestIterFiles:
+    """Test iter_files() directory walking."""
+
+    def test_matches_os_walk(self, tmp_path):
+        """Test files are yielded in top-down os.walk order."""
+        (tmp_path / "b").mkdir()
+        (tmp_path / "b" / "c").mkdir()
+        for rel in ("x.txt", "b/y.txt", "b/c/z.txt", "b/w.txt"):
+            (tmp_path / rel).write_text("")
+        expected = [os.path.join(root, f) for root, _, files in os.walk(str(tmp_path)) for f in files]
+        assert list(helpers.iter_files(str(tmp_path))) == expected
+
+    def test_empty_directory(self, tmp_path):
+        """Test an empty directory yields nothing."""
+        assert list(helpers.iter_files(str(tmp_path))) == []
@@ -2,10 +2,10 @@ import os
 import tempfile
 from pathlib import Path
 
+import pandas as pd
 import pytest
 
-from analyzer.main import PatchTrack, DEFAULT_DATA_DIR
-from analyzer import common
+from analyzer.main import PatchTrack, PullRequestRef, DEFAULT_DATA_DIR
 
 
 def test_patchtrack_init_and_setters():
@@ -44,6 +44,13 @@ def test_read_file_and_compare(tmp_path):
     assert 0 < ratio <= 1
 
 
+def test_read_file_translates_newlines(tmp_path):
+    pt = PatchTrack([])
+    p = tmp_path / "crlf.txt"
+    p.write_bytes(b"a\r\nb\rc\n\xe9")
+    assert pt.read_file(str(p)) == "a\nb\nc\n\xe9"
+
+
 def test__process_missing_chatgpt_dir_fields():
     pt = PatchTrack([])
     res = pt._process_missing_chatgpt_dir('5', 'owner/repo', 'some/path')
@@ -84,16 +91,15 @@ def test_classify_missing_chatgpt_dir_creates_not_existing(tmp_path, monkeypatch
 
     pt = PatchTrack([])
     pt.set_repo_dir_files(base_dir)
+    # Keep persisted results out of the working tree
+    pt.set_main_dir_results((tmp_path / 'classified').as_posix() + '/')
 
-    # Prevent writing pickle in classify (create attribute if missing)
-    monkeypatch.setattr(common, 'pickleFile', lambda *a, **k: None, raising=False)
-
-    # Patch aggregator.final_class to accept dict input (main.classify passes a dict)
+    # Patch aggregator.final_class; classify passes its documented [{pr_id: files}, ...] input
     from analyzer import aggregator
 
     def fake_final(result_dict):
         # return a list of dicts keyed by PR id
-        return [{p: {'class': aggregator.CLASS_NOT_EXISTING}} for p in result_dict.keys()]
+        return [{p: {'class': aggregator.CLASS_NOT_EXISTING}} for entry in result_dict for p in entry]
 
     monkeypatch.setattr(aggregator, 'final_class', fake_final)
 
@@ -109,3 +115,376 @@ def test_classify_missing_chatgpt_dir_creates_not_existing(tmp_path, monkeypatch
     first_key = keys[0]
     results = pt.result_dict[pr][first_key]['result']
     assert results[0]['patchClass'] == 'NOT EXISTING'
+
+
+def test_compare_text_with_patch_length_bound_short_circuit():
+    pt = PatchTrack([])
+    # upper bound 2*1/11 is far below the threshold, so the bound is returned
+    ratio = pt.compare_text_with_patch('a', 'a' * 10)
+    assert ratio == pytest.approx(2 / 11)
+
+    # with no threshold the exact SequenceMatcher ratio is computed
+    assert pt.compare_text_with_patch('a', 'a' * 10, threshold=0.0) == pytest.approx(2 / 11)
+    assert pt.compare_text_with_patch('', '') == 1.0
+
+
+def test_compare_text_with_patch_fast_and_difflib():
+    import difflib
+    from analyzer import main
+
+    pt = PatchTrack([])
+    text, patch = 'def foo(x):\n    return x + 1\n', 'def foo(y):\n    return y + 1\n'
+    exact = difflib.SequenceMatcher(None, text, patch).ratio()
+    assert pt.compare_text_with_patch(text, patch, use_fast=False) == pytest.approx(exact)
+    # LCS similarity is never below the Ratcliff-Obershelp ratio
+    assert exact <= pt.compare_text_with_patch(text, patch) <= 1.0
+    if main.Indel is None:
+        assert pt.compare_text_with_patch(text, patch) == pytest.approx(exact)
+
+
+def test_visualize_results_counts_each_pr_once(monkeypatch):
+    from analyzer import analysis
+
+    pt = PatchTrack([])
+    pt.pr_classifications = {
+        '1': {'class': 'PA'},
+        '2': {'class': 'PN'},
+        '3': {'class': 'ERROR'},
+        '4': {'class': 'NE'},
+    }
+
+    captured = {}
+    monkeypatch.setattr(analysis, 'all_class_bar', lambda height, *a, **k: captured.setdefault('height', height))
+
+    pt.visualize_results()
+    # order: PA, PN, NE, CC, ERROR
+    assert captured['height'] == [1, 1, 1, 0, 1]
+
+
+def test_get_projects_reads_sharings(tmp_path):
+    import json
+
+    sharing = {
+        'Sources': [
+            {'URL': 'https://github.com/o/r/pull/1', 'State': 'MERGED'},
+            {'URL': 'https://github.com/o/r/pull/2', 'State': 'OPEN'},
+            {'URL': 'https://github.com/o/s/pull/3', 'State': 'MERGED'},
+        ]
+    }
+    (tmp_path / 'a_pr_sharings.json').write_text(json.dumps(sharing))
+
+    pt = PatchTrack([])
+    pt.data_dir = str(tmp_path)
+    df, projects, merged_prs = pt._get_projects()
+
+    assert merged_prs == ['https://github.com/o/r/pull/1', 'https://github.com/o/s/pull/3']
+    assert projects == ['https://github.com/o/r', 'https://github.com/o/s']
+    assert list(df['site']) == ['a_pr_sharings.json'] * 3
+    assert list(df['State']) == ['MERGED', 'OPEN', 'MERGED']
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_get_projects_without_ijson(tmp_path, monkeypatch, use_orjson):
+    import json
+    from analyzer import main
+
+    monkeypatch.setattr(main, 'ijson', None)
+    if not use_orjson:
+        monkeypatch.setattr(main, 'orjson', None)
+    elif main.orjson is None:
+        pytest.skip('orjson not installed')
+    sharing = {'Sources': [{'URL': 'https://github.com/o/r/pull/1', 'State': 'MERGED', 'Extra': 1}]}
+    (tmp_path / 'a_pr_sharings.json').write_text(json.dumps(sharing))
+
+    pt = PatchTrack([])
+    pt.data_dir = str(tmp_path)
+    df, projects, merged_prs = pt._get_projects()
+
+    assert merged_prs == ['https://github.com/o/r/pull/1']
+    # only the fields used downstream are kept
+    assert list(df.columns) == [*main.SOURCE_FIELDS, 'site']
+
+
+def test_fetch_github_data_writes_patches(tmp_path, monkeypatch):
+    from analyzer import helpers
+
+    def fake_pooled_request(url, pool, cache):
+        if '/pulls/2/' in url:
+            raise ValueError('not found')
+        return [{'patch': '@@ -1 +1 @@\n+x', 'status': 'modified'}]
+
+    monkeypatch.setattr(helpers, 'pooled_request', fake_pooled_request)
+
+    pt = PatchTrack(['tok'])
+    pt.set_repo_dir_files(tmp_path.as_posix() + '/')
+    prs = [PullRequestRef('o/r', '1', 'https://github.com/o/r/pull/1'),
+           PullRequestRef('o/r', '2', 'https://github.com/o/r/pull/2')]
+    pair, pair_project = pt._fetch_github_data(prs, [], pt.token_pool)
+
+    assert pair_project == {'1': 'o/r', '2': 'o/r'}
+    files = pair['1']['o/r']
+    assert files[0]['status'] == 'modified'
+    with open(files[0]['filepath']) as f:
+        assert f.read() == '@@ -1 +1 @@\n+x'
+    # a failed request leaves the PR without files
+    assert pair['2'] == {}
+
+    # a second run reuses the stored patches together with their statuses
+    monkeypatch.setattr(helpers, 'pooled_request', lambda url, pool, cache: pytest.fail('refetched'))
+    reused, _ = pt._fetch_github_data(prs[:1], [], pt.token_pool)
+    assert reused['1']['o/r'] == files
+
+
+def test_classify_pr_after_fetch_sees_only_patches(tmp_path, monkeypatch):
+    from analyzer import helpers
+
+    monkeypatch.setattr(helpers, 'pooled_request',
+                        lambda url, pool, cache: [{'patch': '@@ -1 +1 @@\n+x = 1', 'status': 'added'}])
+    pt = PatchTrack(['tok'])
+    pt.set_repo_dir_files(tmp_path.as_posix() + '/')
+    pt._fetch_github_data([PullRequestRef('o/r', '1', 'https://github.com/o/r/pull/1')], [], pt.token_pool)
+    assert os.listdir(tmp_path / 'o' / 'r' / '1' / 'github') == ['patch-1.patch']
+
+    chatgpt = tmp_path / 'o' / 'r' / '1' / 'chatgpt'
+    chatgpt.mkdir()
+    (chatgpt / 'patch-1.py').write_text('x = 1\n')
+    result = pt._classify_pr('1', 'o/r')
+    patch_paths = [item['patchPath'] for text in result.values() for item in text['result']]
+    assert [os.path.basename(path) for path in patch_paths] == ['patch-1.patch']
+
+
+def test_fetch_github_data_reuses_patches_on_disk(tmp_path, monkeypatch):
+    from analyzer import helpers
+
+    def fail(*args):
+        raise AssertionError('unexpected request')
+
+    monkeypatch.setattr(helpers, 'pooled_request', fail)
+    storage = tmp_path / 'o' / 'r' / '1' / 'github'
+    storage.mkdir(parents=True)
+    for idx in (1, 2, 10):
+        (storage / f'patch-{idx}.patch').write_text('+x')
+
+    pt = PatchTrack(['tok'])
+    pt.set_repo_dir_files(tmp_path.as_posix() + '/')
+    pair, _ = pt._fetch_github_data(
+        [PullRequestRef('o/r', '1', 'https://github.com/o/r/pull/1')], [], pt.token_pool)
+
+    paths = [item['filepath'] for item in pair['1']['o/r']]
+    assert [os.path.basename(p) for p in paths] == ['patch-1.patch', 'patch-2.patch', 'patch-10.patch']
+
+
+def test_filter_projects_matches_prs_to_projects(monkeypatch):
+    from analyzer import helpers
+
+    def fake_api_requests(urls, pool, cache=None):
+        if 'commits' in urls[0]:
+            return [[{}] * 100 if '/o/r/' in url else [] for url in urls]
+        return [[{'state': 'APPROVED'}] for _ in urls]
+
+    monkeypatch.setattr(helpers, 'api_requests', fake_api_requests)
+    pt = PatchTrack([])
+    merged = ['https://github.com/o/r/pull/1', 'https://github.com/o/s/pull/2',
+              'https://github.com/o/r/pull/3', 'https://github.com/o/r/pull/1']
+    project_filter, projects_clean, prs_clean = pt._filter_projects(
+        ['https://github.com/o/r', 'https://github.com/o/s'], merged)
+
+    assert project_filter == ['https://github.com/o/r']
+    assert prs_clean == [PullRequestRef('o/r', '1', 'https://github.com/o/r/pull/1'),
+                         PullRequestRef('o/r', '3', 'https://github.com/o/r/pull/3')]
+    assert projects_clean == ['https://github.com/o/r']
+
+
+def test_fetch_chatgpt_data_writes_merged_sources(tmp_path):
+    from analyzer import main
+
+    code = {'Type': 'python', 'Content': 'print(1)'}
+    sharing = [{'Conversations': [{'ListOfCode': [code, code]}]}]
+    df = pd.DataFrame.from_records([
+        {'URL': 'https://github.com/o/r/pull/1', 'State': 'MERGED', 'RepoName': 'o/r', 'Number': 1, 'ChatgptSharing': sharing},
+        {'URL': 'https://github.com/o/r/pull/2', 'State': 'OPEN', 'RepoName': 'o/r', 'Number': 2, 'ChatgptSharing': sharing},
+    ], columns=[*main.SOURCE_FIELDS, 'site'])
+
+    pt = PatchTrack([])
+    pt.set_repo_dir_files(tmp_path.as_posix() + '/')
+    skipped = pt._fetch_chatgpt_data(df, [PullRequestRef('o/r', '1', 'https://github.com/o/r/pull/1'),
+                                          PullRequestRef('o/r', '2', 'https://github.com/o/r/pull/2')])
+
+    assert skipped == []
+    assert sorted(os.listdir(tmp_path / 'o' / 'r' / '1' / 'chatgpt')) == ['patch-1.py', 'patch-2.py']
+    assert not (tmp_path / 'o' / 'r' / '2').exists()
+
+    # a rerun overwrites the same patches instead of appending new ones
+    pt._fetch_chatgpt_data(df, [PullRequestRef('o/r', '1', 'https://github.com/o/r/pull/1')])
+    assert sorted(os.listdir(tmp_path / 'o' / 'r' / '1' / 'chatgpt')) == ['patch-1.py', 'patch-2.py']
+
+
+def test_classify_parallel_matches_serial(tmp_path, monkeypatch):
+    from analyzer import aggregator
+
+    monkeypatch.setattr(PatchTrack, 'save_results', lambda *args, **kwargs: None)
+    monkeypatch.setattr(aggregator, 'final_class', lambda result_dict: [])
+    monkeypatch.setattr(aggregator, 'count_all_classifications', lambda classes: {})
+    for pr in ('1', '2', '3'):
+        github = tmp_path / 'o' / 'r' / pr / 'github'
+        github.mkdir(parents=True)
+        (github / 'patch-1.patch').write_text('+x')
+    pairs = {'1': 'o/r', '2': 'o/r', '3': 'o/r'}
+
+    serial = PatchTrack([])
+    serial.set_repo_dir_files(tmp_path.as_posix() + '/')
+    serial.classify(pairs, max_workers=1)
+
+    parallel = PatchTrack([])
+    parallel.set_repo_dir_files(tmp_path.as_posix() + '/')
+    parallel.classify(pairs, max_workers=2)
+
+    assert parallel.result_dict == serial.result_dict
+    assert list(parallel.result_dict) == ['1', '2', '3']
+
+
+def test_classify_pr_counts_each_file_once(tmp_path, monkeypatch):
+    from collections import Counter
+    from analyzer import helpers
+
+    base = tmp_path / 'o' / 'r' / '1'
+    (base / 'chatgpt').mkdir(parents=True)
+    (base / 'github').mkdir()
+    for idx in (1, 2, 3):
+        (base / 'chatgpt' / f'patch-{idx}.py').write_text('x = 1\n')
+        (base / 'github' / f'patch-{idx}.patch').write_text('+x = 1\n')
+
+    calls = Counter()
+    real_count_loc = helpers.count_loc
+
+    def counting(path):
+        calls[path] += 1
+        return real_count_loc(path)
+
+    monkeypatch.setattr(helpers, 'count_loc', counting)
+    pt = PatchTrack([])
+    pt.set_repo_dir_files(tmp_path.as_posix() + '/')
+    monkeypatch.setattr(pt, '_process_patch_pair', lambda *args: None)
+    result = pt._classify_pr('1', 'o/r')
+
+    assert len(calls) == 6 and set(calls.values()) == {1}
+    entries = [item for text in result.values() for item in text['result']]
+    assert len(entries) == 9
+    assert all(item['patchLOC'] == 1 for item in entries)
+
+
+def test_build_pr_project_pairs_skips_files_and_missing_dir(tmp_path):
+    (tmp_path / 'o' / 'r' / '5' / 'github').mkdir(parents=True)
+    (tmp_path / 'o' / 'r' / 'notes.txt').write_text('')
+    (tmp_path / 'README').write_text('')
+
+    pt = PatchTrack([])
+    pt.set_repo_dir_files(tmp_path.as_posix() + '/')
+    assert pt.build_pr_project_pairs() == [{'5': 'o/r'}]
+
+    pt.set_repo_dir_files((tmp_path / 'missing').as_posix() + '/')
+    assert pt.build_pr_project_pairs() == []
+
+
+def _classified_tracker(tmp_path):
+    pt = PatchTrack([])
+    pt.set_main_dir_results((tmp_path / 'classified').as_posix() + '/')
+    pt.result_dict = {'1': {'a.py': {'result': [
+        {'patchClass': 'PA', 'PrLink': 'link1', 'destLOC': 3, 'patchLOC': 2, 'similarityRatio': 0.5}]}}}
+    pt.pr_classifications = {'1': {'class': 'PA', 'totals': {'total_PA': 1}, 'project': ''}}
+    return pt
+
+
+def test_save_results_writes_parquet_and_sidecar(tmp_path):
+    import json
+
+    pt = _classified_tracker(tmp_path)
+    pt.save_results({'PA': 1}, 1.5)
+
+    base = tmp_path / 'classified' / '_GitHub_results'
+    files = pd.read_parquet(f'{base}_files.parquet')
+    patches = pd.read_parquet(f'{base}_patches.parquet', columns=['Pull Request', 'Patch Classification'])
+    assert list(files['File Classification']) == ['PA']
+    assert patches.to_dict('records') == [{'Pull Request': '1', 'Patch Classification': 'PA'}]
+    with open(f'{base}.json') as f:
+        sidecar = json.load(f)
+    assert sidecar['counts'] == {'PA': 1} and sidecar['duration'] == 1.5
+    assert sidecar['pr_classifications']['1']['class'] == 'PA'
+
+
+def test_save_results_legacy_pickle(tmp_path):
+    import pickle
+
+    pt = _classified_tracker(tmp_path)
+    pt.save_results({'PA': 1}, 1.5, legacy_pickle=True)
+
+    with open(tmp_path / 'classified' / '_GitHub_results.pkl', 'rb') as f:
+        result_dict, pr_classifications, counts, duration = pickle.load(f)
+    assert result_dict == pt.result_dict
+    assert counts == {'PA': 1} and duration == 1.5
+
+
+def test_create_dataframes_columns_and_dtypes(tmp_path):
+    from analyzer import main
+
+    pt = _classified_tracker(tmp_path)
+    pt.result_dict['2'] = {'b.py': {'result': [{'patchClass': 'PN', 'PrLink': 'link2'}]}}
+    pt.pr_classifications['2'] = {'class': 'PN'}
+    pt.create_dataframes()
+
+    files = pt.df_files_classes
+    assert list(files.columns) == main.FILE_COLUMNS
+    assert files['File Classification'].dtype == 'category'
+    assert files['Interesting'].dtype == 'int8'
+    assert list(files['Pull Request']) == ['2', '1']
+    assert files.iloc[1][['PR Link', 'ChatGPT LOC', 'GitHub LOC', 'Operation', 'Similarity (%)']].tolist() == [
+        'link1', 3, 2, 'None', 0.5]
+    assert list(pt.df_patch_classes['Patch Classification']) == ['PA', 'PN']
+    assert list(pt.df_patch_classes.index) == [0, 1]
+
+
+def test_classify_pr_unsupported_extension_single_row(tmp_path, monkeypatch):
+    base = tmp_path / 'o' / 'r' / '1'
+    (base / 'chatgpt').mkdir(parents=True)
+    (base / 'github').mkdir()
+    (base / 'chatgpt' / 'patch-1.txt').write_text('notes\n')
+    for idx in (1, 2):
+        (base / 'github' / f'patch-{idx}.patch').write_text('+x\n')
+
+    pt = PatchTrack([])
+    pt.set_repo_dir_files(tmp_path.as_posix() + '/')
+
+    def fail(*args):
+        raise AssertionError('unsupported files must not be compared')
+
+    monkeypatch.setattr(pt, '_process_patch_pair', fail)
+    result = pt._classify_pr('1', 'o/r')
+
+    rows = result[os.path.join(str(base / 'chatgpt'), 'patch-1.txt')]['result']
+    assert len(rows) == 1
+    assert rows[0]['patchClass'] == 'OTHER EXT'
+    assert rows[0]['destLOC'] == 1
+
+
+def test_fetch_github_data_follows_file_pages(tmp_path, monkeypatch):
+    from analyzer import helpers, main
+
+    requested = []
+
+    def fake_pooled_request(url, pool, cache):
+        requested.append(url)
+        page = int(url.split('page=')[1].split('&')[0])
+        count = {1: main.PR_FILES_PER_PAGE, 2: 5}.get(page, 0) if '/pulls/1/' in url else 2
+        return [{'patch': f'+{page}', 'status': 'added'} for _ in range(count)]
+
+    monkeypatch.setattr(helpers, 'pooled_request', fake_pooled_request)
+    pt = PatchTrack(['tok'])
+    pt.set_repo_dir_files(tmp_path.as_posix() + '/')
+    prs = [PullRequestRef('o/r', '1', 'https://github.com/o/r/pull/1'),
+           PullRequestRef('o/r', '2', 'https://github.com/o/r/pull/2')]
+    pair, _ = pt._fetch_github_data(prs, [], pt.token_pool)
+
+    assert len(pair['1']['o/r']) == main.PR_FILES_PER_PAGE + 5
+    assert len(pair['2']['o/r']) == 2
+    # only the PR with a full first page asks for a second one
+    assert len(requested) == 3
@@ -8,6 +8,7 @@ Tests the PatchLoader class including:
 """
 
 import pytest
+from array import array
 import os
 import tempfile
 from analyzer import patchLoader, common
@@ -62,6 +63,39 @@ class TestPatchLoaderTraverse:
         assert isinstance(result, int)
         assert result >= 0
 
+    def test_traverse_directory_parallel_matches_serial(self, sample_patch_directory):
+        """Test a process pool loads the same patches in the same order."""
+        serial = patchLoader.PatchLoader()
+        serial.traverse(sample_patch_directory, "patch", 5)
+        parallel = patchLoader.PatchLoader()
+        parallel.traverse(sample_patch_directory, "patch", 5, max_workers=2)
+        assert parallel.items() == serial.items()
+        assert parallel.added() == serial.added()
+        assert parallel.hashes() == serial.hashes()
+
+    def test_read_ahead_bounds_reads_in_flight(self, temp_dir, monkeypatch):
+        """Test read-ahead yields files in order with at most max_workers reads ahead."""
+        paths = []
+        for i in range(10):
+            path = os.path.join(temp_dir, f"{i}.patch")
+            with open(path, "w") as f:
+                f.write(f"+line {i}\n")
+            paths.append(path)
+        started = []
+        read_patch_lines = patchLoader._read_patch_lines
+        monkeypatch.setattr(patchLoader, "_read_patch_lines", lambda path: started.append(path) or read_patch_lines(path))
+
+        for consumed, (path, lines) in enumerate(patchLoader._read_ahead(paths, max_workers=2), start=1):
+            assert path == paths[consumed - 1]
+            assert lines == [f"+line {consumed - 1}\n"]
+            assert len(started) <= consumed + 2
+
+    def test_traverse_single_file_streams_lines(self, sample_patch_file, monkeypatch):
+        """Test a single patch file is iterated directly rather than read whole."""
+        monkeypatch.setattr(patchLoader, "_read_patch_lines", lambda path: pytest.fail("file read whole"))
+        loader = patchLoader.PatchLoader()
+        assert loader.traverse(sample_patch_file, "patch", 5) > 0
+
     def test_traverse_invalid_file_ext(self, sample_patch_file):
         """Test traverse with invalid file extension type."""
         loader = patchLoader.PatchLoader()
@@ -93,6 +127,45 @@ class TestPatchLoaderTraverse:
         result = loader.traverse(sample_patch_file, "patch", 3)
         assert isinstance(result, int)
 
+    def test_short_hunk_does_not_shrink_later_hunks(self, temp_dir, monkeypatch):
+        """Test a short hunk's n-gram size stays local to that hunk."""
+        monkeypatch.setattr(common, 'ngram_size', 3)
+        patch_path = os.path.join(temp_dir, "short.patch")
+        with open(patch_path, "w") as f:
+            f.write("@@ -1 +1 @@\n+x\n@@ -5,1 +5,1 @@\n+a b c d\n")
+        loader = patchLoader.PatchLoader()
+        loader.traverse(patch_path, "patch", 3)
+        assert [p.ngram_size for p in loader.items()] == [1, 3]
+        assert common.ngram_size == 3
+
+    def test_identical_hunks_hashed_once(self, temp_dir, monkeypatch):
+        """Test repeated hunks reuse the cached hash lists."""
+        patch_path = os.path.join(temp_dir, "repeat.patch")
+        with open(patch_path, "w") as f:
+            f.write("@@ -1 +1 @@\n+a b c d\n@@ -9 +9 @@\n+a  b c d\n")
+        loader = patchLoader.PatchLoader()
+        calls = []
+        build = loader._build_hash_list
+        monkeypatch.setattr(loader, '_build_hash_list', lambda *args: calls.append(args) or build(*args))
+        loader.traverse(patch_path, "patch", 3)
+        first, second = loader.items()
+        assert len(calls) == 1
+        assert first.hash_list == second.hash_list
+        assert first.file_path != second.file_path
+
+    def test_traverse_escapes_html_in_orig_lines(self, temp_dir):
+        """Test original diff lines are HTML-escaped and colored."""
+        patch_path = os.path.join(temp_dir, "escape.patch")
+        with open(patch_path, "w") as f:
+            f.write("@@ -1,2 +1,2 @@\n if (a < b && c > d) {\n+    x = y;\n")
+        loader = patchLoader.PatchLoader()
+        loader.traverse(patch_path, "patch", 3)
+        orig = loader.items()[0].orig_lines
+        assert orig == (
+            " if (a &lt; b &amp;&amp; c &gt; d) {\n"
+            '<font color="#00AA00">+    x = y;\n</font>'
+        )
+
 
 class TestPatchLoaderNormalize:
     """Test the _normalize() method."""
@@ -167,6 +240,37 @@ class TestPatchLoaderNormalize:
             raise
 
 
+class TestPatchLoaderNormalizeLines:
+    """Test the _normalize_lines() per-line tokenizer."""
+
+    @pytest.mark.parametrize("file_ext", [common.FileExt.Java, common.FileExt.Python, common.FileExt.JavaScript])
+    def test_matches_per_line_normalize(self, file_ext):
+        """Test tokens equal normalizing each line separately."""
+        lines = [
+            "    int X = 1; // Set X\n",
+            "/* open comment\n",
+            "\tclose */ y  =\tX;\n",
+            "\n",
+            "return FOO(a, b)",
+        ]
+        loader = patchLoader.PatchLoader()
+        expected = [loader._normalize(line, file_ext).split() for line in lines]
+        assert loader._normalize_lines(lines, file_ext) == expected
+
+    def test_line_cache_reuses_and_bounds(self, monkeypatch):
+        """Test cached lines match uncached ones and the cache is cleared when full."""
+        loader = patchLoader.PatchLoader()
+        monkeypatch.setattr(patchLoader, "LINE_CACHE_SIZE", 3)
+        cache = {}
+        first = loader._normalize_lines(["A b", "c", "A b"], common.FileExt.Java, cache)
+        assert first == [["a", "b"], ["c"], ["a", "b"]]
+        assert first[0] is first[2] and set(cache) == {"A b", "c"}
+
+        second = loader._normalize_lines(["d // x", "e", "c"], common.FileExt.Java, cache)
+        assert second == loader._normalize_lines(["d // x", "e", "c"], common.FileExt.Java)
+        assert set(cache) == {"d // x", "e", "c"}
+
+
 class TestPatchLoaderBuildHashList:
     """Test the _build_hash_list() method."""
 
@@ -174,7 +278,7 @@ class TestPatchLoaderBuildHashList:
         """Test build_hash_list with empty input."""
         loader = patchLoader.PatchLoader()
         hash_list, patch_hashes = loader._build_hash_list([])
-        assert hash_list == []
+        assert len(hash_list) == 0
         assert patch_hashes == []
 
     def test_build_hash_list_short(self):
@@ -183,7 +287,8 @@ class TestPatchLoaderBuildHashList:
         short_list = ["word1", "word2"]
         hash_list, patch_hashes = loader._build_hash_list(short_list)
         # Should handle gracefully
-        assert isinstance(hash_list, list)
+        assert isinstance(hash_list, array)
+        assert hash_list.typecode == 'Q'
         assert isinstance(patch_hashes, list)
 
     def test_build_hash_list_single_ngram(self):
@@ -224,7 +329,7 @@ class TestPatchLoaderBuildHashList:
         
         assert isinstance(result, tuple)
         assert len(result) == 2
-        assert isinstance(result[0], list)
+        assert isinstance(result[0], array)
         assert isinstance(result[1], list)
 
     def test_build_hash_list_hashes_are_integers(self):
@@ -302,10 +407,8 @@ class TestPatchLoaderGetters:
 class TestPatchLoaderUnifiedDiffParsing:
     """Test parsing of unified diff format."""
 
-    def test_parse_simple_unified_diff(self, temp_dir):
+    def test_parse_simple_unified_diff(self, diff_buffer):
         """Test parsing a simple unified diff patch."""
-        patch_file = os.path.join(temp_dir, "test.patch")
-        
         # Create a simple unified diff
         diff_content = """--- a/file.py
 +++ b/file.py
@@ -316,18 +419,13 @@ class TestPatchLoaderUnifiedDiffParsing:
  def world():
 """
         
-        with open(patch_file, "w") as f:
-            f.write(diff_content)
-        
         loader = patchLoader.PatchLoader()
-        result = loader.traverse(patch_file, "patch", 3)
+        result = loader.traverse_buffer(diff_buffer(diff_content), "patch", 3)
         # Should process without error
         assert isinstance(result, int)
 
-    def test_parse_multiple_hunks(self, temp_dir):
+    def test_parse_multiple_hunks(self, diff_buffer):
         """Test parsing patch with multiple hunks."""
-        patch_file = os.path.join(temp_dir, "multi.patch")
-        
         diff_content = """--- a/file.py
 +++ b/file.py
 @@ -1,2 +1,2 @@
@@ -338,17 +436,12 @@ class TestPatchLoaderUnifiedDiffParsing:
 +new line 2
 """
         
-        with open(patch_file, "w") as f:
-            f.write(diff_content)
-        
         loader = patchLoader.PatchLoader()
-        result = loader.traverse(patch_file, "patch", 3)
+        result = loader.traverse_buffer(diff_buffer(diff_content), "patch", 3)
         assert isinstance(result, int)
 
-    def test_parse_context_lines(self, temp_dir):
+    def test_parse_context_lines(self, diff_buffer):
         """Test parsing patch with context lines (unchanged)."""
-        patch_file = os.path.join(temp_dir, "context.patch")
-        
         diff_content = """--- a/file.py
 +++ b/file.py
 @@ -1,5 +1,5 @@
@@ -360,17 +453,12 @@ class TestPatchLoaderUnifiedDiffParsing:
  unchanged line 4
 """
         
-        with open(patch_file, "w") as f:
-            f.write(diff_content)
-        
         loader = patchLoader.PatchLoader()
-        result = loader.traverse(patch_file, "patch", 3)
+        result = loader.traverse_buffer(diff_buffer(diff_content), "patch", 3)
         assert isinstance(result, int)
 
-    def test_parse_only_additions(self, temp_dir):
+    def test_parse_only_additions(self, diff_buffer):
         """Test parsing patch with only additions."""
-        patch_file = os.path.join(temp_dir, "additions.patch")
-        
         diff_content = """--- a/file.py
 +++ b/file.py
 @@ -1,2 +1,4 @@
@@ -380,17 +468,12 @@ class TestPatchLoaderUnifiedDiffParsing:
 +line 4
 """
         
-        with open(patch_file, "w") as f:
-            f.write(diff_content)
-        
         loader = patchLoader.PatchLoader()
-        result = loader.traverse(patch_file, "patch", 3)
+        result = loader.traverse_buffer(diff_buffer(diff_content), "patch", 3)
         assert isinstance(result, int)
 
-    def test_parse_only_deletions(self, temp_dir):
+    def test_parse_only_deletions(self, diff_buffer):
         """Test parsing patch with only deletions."""
-        patch_file = os.path.join(temp_dir, "deletions.patch")
-        
         diff_content = """--- a/file.py
 +++ b/file.py
 @@ -1,4 +1,2 @@
@@ -400,21 +483,31 @@ class TestPatchLoaderUnifiedDiffParsing:
 -line 4
 """
         
-        with open(patch_file, "w") as f:
-            f.write(diff_content)
-        
         loader = patchLoader.PatchLoader()
-        result = loader.traverse(patch_file, "patch", 3)
+        result = loader.traverse_buffer(diff_buffer(diff_content), "patch", 3)
         assert isinstance(result, int)
 
 
+    @pytest.mark.parametrize("patch_type", ["buggy", "patch"])
+    def test_traverse_buffer_matches_file(self, sample_patch_file, patch_type):
+        """Test parsing from memory gives the same patches as reading the file."""
+        with open(sample_patch_file, "rb") as f:
+            buf = f.read().replace(b"\n", b"\r\n")
+        from_file = patchLoader.PatchLoader()
+        from_file.traverse(sample_patch_file, patch_type, 3)
+        from_buffer = patchLoader.PatchLoader()
+        from_buffer.traverse_buffer(buf, patch_type, 3, patch_path=sample_patch_file)
+
+        assert from_buffer.items() == from_file.items()
+        assert from_buffer.added() == from_file.added()
+        assert from_buffer.removed() == from_file.removed()
+
+
 class TestPatchLoaderBuggyVsPatch:
     """Test different patch type handling."""
 
-    def test_buggy_type_extraction(self, temp_dir):
+    def test_buggy_type_extraction(self, diff_buffer):
         """Test buggy patch extracts removed lines."""
-        patch_file = os.path.join(temp_dir, "buggy.patch")
-        
         diff_content = """--- a/file.py
 +++ b/file.py
 @@ -1,2 +1,1 @@
@@ -422,19 +515,14 @@ class TestPatchLoaderBuggyVsPatch:
  kept line
 """
         
-        with open(patch_file, "w") as f:
-            f.write(diff_content)
-        
         loader = patchLoader.PatchLoader()
-        loader.traverse(patch_file, "buggy", 3)
+        loader.traverse_buffer(diff_buffer(diff_content), "buggy", 3)
         # Buggy type should track removed lines
         removed = loader.removed()
         assert isinstance(removed, list)
 
-    def test_patch_type_extraction(self, temp_dir):
+    def test_patch_type_extraction(self, diff_buffer):
         """Test patch type extracts added lines."""
-        patch_file = os.path.join(temp_dir, "patch.patch")
-        
         diff_content = """--- a/file.py
 +++ b/file.py
 @@ -1,1 +1,2 @@
@@ -442,11 +530,8 @@ class TestPatchLoaderBuggyVsPatch:
 +added line
 """
         
-        with open(patch_file, "w") as f:
-            f.write(diff_content)
-        
         loader = patchLoader.PatchLoader()
-        loader.traverse(patch_file, "patch", 3)
+        loader.traverse_buffer(diff_buffer(diff_content), "patch", 3)
         # Patch type should track added lines
         added = loader.added()
         assert isinstance(added, list)
@@ -514,6 +599,25 @@ class TestPatchLoaderHashMapping:
             assert len(ngram) > 0
 
 
+    def test_hashes_built_on_demand(self):
+        """Test the map picks up hunks hashed after an earlier call."""
+        loader = patchLoader.PatchLoader()
+        _, first = loader._build_hash_list(["a", "b", "c"], 2)
+        assert loader._hashes == {}
+        assert set(loader.hashes().values()) == {"a b", "b c"}
+        loader._build_hash_list(["c", "d"], 2)
+        hashes = loader.hashes()
+        assert set(hashes.values()) == {"a b", "b c", "c d"}
+        assert all(hashes[h] == ngram for ngram, triple in first for h in triple)
+
+    def test_repeated_ngrams_share_one_string(self):
+        """Test the same n-gram from different hunks is one interned string."""
+        loader = patchLoader.PatchLoader()
+        _, first = loader._build_hash_list(["x", "y"], 2)
+        _, second = loader._build_hash_list(["z", "x", "y"], 2)
+        assert first[0][0] is second[1][0]
+
+
 class TestPatchLoaderEdgeCases:
     """Test edge cases and error handling."""
 
@@ -7,29 +7,36 @@ Tests the SourceLoader class including:
 """
 
 import os
+from array import array
+
+import numpy as np
 import pytest
 from analyzer import sourceLoader, common, helpers
 
 
+@pytest.fixture(autouse=True)
+def clear_normalize_cache():
+    # Tests swap helpers.remove_comments, so memoized normalizations must not leak between them
+    sourceLoader._normalize_source.cache_clear()
+    yield
+    sourceLoader._normalize_source.cache_clear()
+
+
 class MockPatchEntry:
     def __init__(self, ngram_size, hash_indices, old_norm_lines=None):
         # build tuple-like indexed access: (file_path, file_ext, orig_lines, norm_lines, hash_list, patch_hashes, ngram_size)
         self._tuple = ("/tmp/file.java", 3, "orig", ["word"], hash_indices, [], ngram_size)
-        self.hash_list = hash_indices
-        self._old_norm_lines = old_norm_lines or []
+        self.hash_list = array('Q', hash_indices)
+        self.ngram_size = ngram_size
+        self.old_norm_lines = old_norm_lines or []
 
     def __getitem__(self, idx):
         return self._tuple[idx]
 
-    def get(self, key, default=None):
-        if key == 'old_norm_lines':
-            return self._old_norm_lines
-        return default
-
 
 class MockPatch:
     def __init__(self, entries):
-        self._entries = entries
+        self._entries = tuple(entries)
 
     def items(self):
         return self._entries
@@ -37,6 +44,9 @@ class MockPatch:
     def length(self):
         return len(self._entries)
 
+    def __len__(self):
+        return len(self._entries)
+
 
 def setup_helpers_remove_comments(monkeypatch):
     # helpers has remove_comment (singular). Provide remove_comments to avoid AttributeError.
@@ -99,6 +109,23 @@ def test_query_bloomfilter_detects_match(tmp_path, monkeypatch):
     assert all(h in results for h in [h1, h2, h3])
 
 
+def test_short_source_skips_normalization(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(helpers, 'remove_comments', lambda s, ext: calls.append(s) or s)
+
+    source_file = tmp_path / "short.java"
+    source_file.write_text("only two")
+
+    loader = sourceLoader.SourceLoader()
+    loader.traverse(str(source_file), MockPatch([MockPatchEntry(ngram_size=3, hash_indices=[1, 2, 3])]),
+                    common.FileExt.Java)
+    assert calls == []
+
+    loader.traverse(str(source_file), MockPatch([MockPatchEntry(ngram_size=2, hash_indices=[1, 2, 3])]),
+                    common.FileExt.Java)
+    assert calls == ["only two"]
+
+
 def test_short_source_no_analysis(tmp_path, monkeypatch):
     setup_helpers_remove_comments(monkeypatch)
     monkeypatch.setattr(helpers, 'remove_comments', lambda s, ext: s)
@@ -151,3 +178,129 @@ def test_source_hashes_populated(tmp_path, monkeypatch):
 
     # source_hashes should be a list (may be empty depending on normalization)
     assert isinstance(loader.source_hashes(), list)
+
+
+def test_bloom_bits_set_for_every_ngram(monkeypatch):
+    setup_helpers_remove_comments(monkeypatch)
+    monkeypatch.setattr(helpers, 'remove_comments', lambda s, ext: s)
+
+    source = "alpha beta gamma delta"
+    tokens = source.split()
+    expected = common.rolling_ngram_hashes(tokens, 2)
+
+    entry = MockPatchEntry(ngram_size=2, hash_indices=[])
+    loader = sourceLoader.SourceLoader(record_source_hashes=True)
+    loader._patch_list = [entry]
+    loader._npatch = 1
+    loader._query_bloomfilter(source, common.FileExt.Java)
+
+    mask = common.bloomfilter_size - 1
+    for triple in expected:
+        assert loader._test_bits(triple).all()
+    assert [h for _, h in loader.source_hashes()] == [[h & mask for h in triple] for triple in expected]
+    set_bits = sum(bin(int(word)).count('1') for word in loader._bit_vector)
+    assert 0 < set_bits <= 3 * len(expected)
+
+
+def test_check_patch_hashes_masks_unmasked_hashes(monkeypatch):
+    loader = sourceLoader.SourceLoader()
+    mask = common.bloomfilter_size - 1
+    present = [5, 64, mask]
+    loader._set_bits(np.array(present, dtype=np.int64))
+
+    # Patch hashes are full-width; only their low bits select the filter bit
+    hash_list = [h + common.bloomfilter_size for h in present] + [6, 7, 65]
+    loader._patch_list = [MockPatchEntry(ngram_size=1, hash_indices=hash_list)]
+    loader._check_patch_hashes(0)
+
+    results = loader.results()
+    assert [results[h]['Match'] for h in hash_list] == [True, True, True, False, False, False]
+    stored_hashes, matches = loader._patch_matches[0]
+    assert stored_hashes is loader._patch_list[0].hash_list
+    assert matches.dtype == np.bool_ and matches.tolist() == [True, True, True, False, False, False]
+    assert sorted(loader.match_items()[0]) == [0, 1]
+    assert all(loader.match_items()[0][0].values())
+
+
+@pytest.mark.parametrize("source", ["Int X\t= 1;\r\n  Return  Y;\n", "ÀB c\x0b\x0cD\n", ""])
+def test_normalize_matches_regex_lower(source, monkeypatch):
+    monkeypatch.setattr(helpers, 'remove_comments', lambda s, ext: s)
+    loader = sourceLoader.SourceLoader()
+    expected = common.WHITESPACE_REGEX.sub("", source).lower()
+    assert loader._normalize(source, common.FileExt.Java) == expected
+
+
+def test_filter_built_once_per_ngram_size_run(monkeypatch):
+    monkeypatch.setattr(helpers, 'remove_comments', lambda s, ext: s)
+    source = "a b c d e"
+    entries = [MockPatchEntry(ngram_size=n, hash_indices=[1, 2, 3]) for n in (2, 2, 3, 2)]
+    loader = sourceLoader.SourceLoader(record_source_hashes=True)
+    loader._patch_list = entries
+    loader._npatch = len(entries)
+
+    builds = []
+    set_bits = loader._set_bits
+    monkeypatch.setattr(loader, '_set_bits', lambda hashes: builds.append(len(hashes)) or set_bits(hashes))
+    loader._query_bloomfilter(source, common.FileExt.Java)
+
+    # runs: [2, 2], [3], [2]
+    assert builds == [12, 9, 12]
+    assert len(loader.source_hashes()) == 4 + 4 + 3 + 4
+    assert sorted(loader.match_items()) == [0, 1, 2, 3]
+
+
+def test_source_hashes_not_recorded_by_default(monkeypatch):
+    monkeypatch.setattr(helpers, 'remove_comments', lambda s, ext: s)
+    loader = sourceLoader.SourceLoader()
+    loader._patch_list = [MockPatchEntry(ngram_size=1, hash_indices=[1, 2, 3])]
+    loader._npatch = 1
+    loader._query_bloomfilter("a b c", common.FileExt.Java)
+    assert loader.source_hashes() == []
+    assert 0 in loader.match_items()
+
+
+def test_batched_filter_rechecks_real_patch_info(monkeypatch):
+    # A small filter forces several batches, so old_norm_lines is read from a real PatchInfo
+    monkeypatch.setattr(common, 'bloomfilter_size', 128)
+    monkeypatch.setattr(common, 'min_mn_ratio', 32)
+    loader = sourceLoader.SourceLoader()
+    hashes = [h & 127 for h in common.rolling_ngram_hashes(['t0'], 1)[0]]
+    patch = common.PatchInfo('p', common.FileExt.Java, '', ['t0'], hashes, [], 1, old_norm_lines=hashes)
+    loader._patch_list = [patch]
+    loader._npatch = 1
+    loader._query_bloomfilter(' '.join(f't{i}' for i in range(12)), common.FileExt.Java)
+    assert loader._match_dict == {0: [0]}
+
+
+def test_batched_filter_skips_empty_old_norm_lines(monkeypatch):
+    # A patch without old_norm_lines must not match on every batch reset
+    monkeypatch.setattr(common, 'bloomfilter_size', 128)
+    monkeypatch.setattr(common, 'min_mn_ratio', 32)
+    loader = sourceLoader.SourceLoader()
+    hashes = [h & 127 for h in common.rolling_ngram_hashes(['zz'], 1)[0]]
+    patch = common.PatchInfo('p', common.FileExt.Java, '', ['zz'], hashes, [], 1)
+    loader._patch_list = [patch]
+    loader._npatch = 1
+    loader._query_bloomfilter(' '.join(f't{i}' for i in range(12)), common.FileExt.Java)
+    assert loader._match_dict == {}
+    assert loader._nmatch == 0
+
+
+def test_normalize_memoized_across_loaders(monkeypatch):
+    calls = []
+    monkeypatch.setattr(helpers, 'remove_comments', lambda s, ext: calls.append(s) or s)
+    first = sourceLoader.SourceLoader()._normalize("A b\n", common.FileExt.Java)
+    second = sourceLoader.SourceLoader()._normalize("A b\n", common.FileExt.Java)
+    assert first == second == "ab\n"
+    assert calls == ["A b\n"]
+
+
+def test_traverse_without_patches_reads_nothing(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(helpers, 'remove_comments', lambda s, ext: calls.append(s) or s)
+    source_file = tmp_path / "a.java"
+    source_file.write_text("a b c d e f")
+
+    loader = sourceLoader.SourceLoader()
+    assert loader.traverse(str(source_file), MockPatch([]), common.FileExt.Java) == 0
+    assert calls == []